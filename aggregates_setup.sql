@@ -0,0 +1,172 @@
+-- Attendance Aggregates Setup
+-- Incrementally maintained aggregate tables for summary and analytics reads.
+-- Run after attendance_system_setup.sql, then populate existing data with:
+--   python manage.py rebuild-stats
+USE attendance_system;
+
+-- Per-student lifetime counters
+-- Kept in step with attendance by the triggers below, inside the same
+-- transaction as each mark. Rows are created on a student's first mark.
+CREATE TABLE IF NOT EXISTS student_attendance_stats (
+    student_id INT PRIMARY KEY,
+    total INT NOT NULL DEFAULT 0,
+    present INT NOT NULL DEFAULT 0,
+    absent INT NOT NULL DEFAULT 0,
+    late INT NOT NULL DEFAULT 0,
+    updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP ON UPDATE CURRENT_TIMESTAMP,
+    FOREIGN KEY (student_id) REFERENCES students(id) ON DELETE CASCADE
+) ENGINE=InnoDB;
+
+-- Triggers are single statements so this file also runs through run_setup.py.
+-- Sessions that bulk load attendance can SET @skip_attendance_aggregates = 1
+-- and rebuild afterwards. Deleting attendance rows does not decrement the
+-- counters (archival keeps lifetime totals). Use rebuild-stats after manual deletes.
+DROP TRIGGER IF EXISTS trg_attendance_stats_insert;
+CREATE TRIGGER trg_attendance_stats_insert AFTER INSERT ON attendance
+FOR EACH ROW
+    INSERT INTO student_attendance_stats (student_id, total, present, absent, late)
+    SELECT NEW.student_id, 1, NEW.status = 'Present', NEW.status = 'Absent', NEW.status = 'Late'
+    FROM DUAL
+    WHERE @skip_attendance_aggregates IS NULL
+    ON DUPLICATE KEY UPDATE
+        total = total + 1,
+        present = present + (NEW.status = 'Present'),
+        absent = absent + (NEW.status = 'Absent'),
+        late = late + (NEW.status = 'Late');
+
+DROP TRIGGER IF EXISTS trg_attendance_stats_update;
+CREATE TRIGGER trg_attendance_stats_update AFTER UPDATE ON attendance
+FOR EACH ROW
+    UPDATE student_attendance_stats
+    SET present = present - (OLD.status = 'Present') + (NEW.status = 'Present'),
+        absent = absent - (OLD.status = 'Absent') + (NEW.status = 'Absent'),
+        late = late - (OLD.status = 'Late') + (NEW.status = 'Late')
+    WHERE student_id = NEW.student_id
+      AND OLD.status <> NEW.status
+      AND @skip_attendance_aggregates IS NULL;
+
+-- Per-(date, period, subject, faculty) counters for daily analysis
+CREATE TABLE IF NOT EXISTS daily_period_rollup (
+    date DATE NOT NULL,
+    period INT NOT NULL,
+    subject VARCHAR(100) NOT NULL,
+    faculty_id INT NOT NULL,
+    present INT NOT NULL DEFAULT 0,
+    absent INT NOT NULL DEFAULT 0,
+    late INT NOT NULL DEFAULT 0,
+    updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP ON UPDATE CURRENT_TIMESTAMP,
+    PRIMARY KEY (date, period, subject, faculty_id)
+) ENGINE=InnoDB;
+
+DROP TRIGGER IF EXISTS trg_daily_rollup_insert;
+CREATE TRIGGER trg_daily_rollup_insert AFTER INSERT ON attendance
+FOR EACH ROW
+    INSERT INTO daily_period_rollup (date, period, subject, faculty_id, present, absent, late)
+    SELECT NEW.date, NEW.period, NEW.subject, NEW.faculty_id,
+           NEW.status = 'Present', NEW.status = 'Absent', NEW.status = 'Late'
+    FROM DUAL
+    WHERE @skip_attendance_aggregates IS NULL
+    ON DUPLICATE KEY UPDATE
+        present = present + (NEW.status = 'Present'),
+        absent = absent + (NEW.status = 'Absent'),
+        late = late + (NEW.status = 'Late');
+
+-- An update moves the row's count from its old key/status to the new one
+DROP TRIGGER IF EXISTS trg_daily_rollup_update_old;
+CREATE TRIGGER trg_daily_rollup_update_old AFTER UPDATE ON attendance
+FOR EACH ROW
+    UPDATE daily_period_rollup
+    SET present = present - (OLD.status = 'Present'),
+        absent = absent - (OLD.status = 'Absent'),
+        late = late - (OLD.status = 'Late')
+    WHERE date = OLD.date AND period = OLD.period
+      AND subject = OLD.subject AND faculty_id = OLD.faculty_id
+      AND NOT (OLD.status <=> NEW.status AND OLD.subject <=> NEW.subject
+               AND OLD.faculty_id <=> NEW.faculty_id AND OLD.date <=> NEW.date
+               AND OLD.period <=> NEW.period)
+      AND @skip_attendance_aggregates IS NULL;
+
+DROP TRIGGER IF EXISTS trg_daily_rollup_update_new;
+CREATE TRIGGER trg_daily_rollup_update_new AFTER UPDATE ON attendance
+FOR EACH ROW
+    INSERT INTO daily_period_rollup (date, period, subject, faculty_id, present, absent, late)
+    SELECT NEW.date, NEW.period, NEW.subject, NEW.faculty_id,
+           NEW.status = 'Present', NEW.status = 'Absent', NEW.status = 'Late'
+    FROM DUAL
+    WHERE NOT (OLD.status <=> NEW.status AND OLD.subject <=> NEW.subject
+               AND OLD.faculty_id <=> NEW.faculty_id AND OLD.date <=> NEW.date
+               AND OLD.period <=> NEW.period)
+      AND @skip_attendance_aggregates IS NULL
+    ON DUPLICATE KEY UPDATE
+        present = present + (NEW.status = 'Present'),
+        absent = absent + (NEW.status = 'Absent'),
+        late = late + (NEW.status = 'Late');
+
+-- Finished daily analyses for past dates, so they are served without
+-- touching attendance. Any write to that date, or any roster change,
+-- drops the cached copy, which is rebuilt on the next request.
+CREATE TABLE IF NOT EXISTS daily_report_cache (
+    date DATE PRIMARY KEY,
+    payload MEDIUMTEXT NOT NULL,
+    built_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP ON UPDATE CURRENT_TIMESTAMP
+) ENGINE=InnoDB;
+
+DROP TRIGGER IF EXISTS trg_daily_report_cache_insert;
+CREATE TRIGGER trg_daily_report_cache_insert AFTER INSERT ON attendance
+FOR EACH ROW
+    DELETE FROM daily_report_cache WHERE date = NEW.date AND @skip_attendance_aggregates IS NULL;
+
+DROP TRIGGER IF EXISTS trg_daily_report_cache_update;
+CREATE TRIGGER trg_daily_report_cache_update AFTER UPDATE ON attendance
+FOR EACH ROW
+    DELETE FROM daily_report_cache WHERE date IN (OLD.date, NEW.date);
+
+DROP TRIGGER IF EXISTS trg_daily_report_cache_student_insert;
+CREATE TRIGGER trg_daily_report_cache_student_insert AFTER INSERT ON students
+FOR EACH ROW
+    DELETE FROM daily_report_cache;
+
+DROP TRIGGER IF EXISTS trg_daily_report_cache_student_update;
+CREATE TRIGGER trg_daily_report_cache_student_update AFTER UPDATE ON students
+FOR EACH ROW
+    DELETE FROM daily_report_cache;
+
+DROP TRIGGER IF EXISTS trg_daily_report_cache_student_delete;
+CREATE TRIGGER trg_daily_report_cache_student_delete AFTER DELETE ON students
+FOR EACH ROW
+    DELETE FROM daily_report_cache;
+
+-- Row counts for the dashboard, so it never has to COUNT(*) a table
+CREATE TABLE IF NOT EXISTS table_counts (
+    name VARCHAR(64) PRIMARY KEY,
+    row_count BIGINT NOT NULL DEFAULT 0
+) ENGINE=InnoDB;
+
+DROP TRIGGER IF EXISTS trg_table_counts_students_insert;
+CREATE TRIGGER trg_table_counts_students_insert AFTER INSERT ON students
+FOR EACH ROW
+    INSERT INTO table_counts (name, row_count) VALUES ('students', 1)
+    ON DUPLICATE KEY UPDATE row_count = row_count + 1;
+
+DROP TRIGGER IF EXISTS trg_table_counts_students_delete;
+CREATE TRIGGER trg_table_counts_students_delete AFTER DELETE ON students
+FOR EACH ROW
+    UPDATE table_counts SET row_count = row_count - 1 WHERE name = 'students';
+
+INSERT INTO table_counts (name, row_count)
+SELECT 'students', COUNT(*) FROM students
+ON DUPLICATE KEY UPDATE row_count = VALUES(row_count);
+
+-- Summary view now reads the counters instead of joining attendance
+CREATE OR REPLACE VIEW attendance_summary AS
+SELECT
+    s.id,
+    s.reg_no,
+    s.name,
+    COALESCE(st.present, 0) as total_present,
+    COALESCE(st.absent, 0) as total_absent,
+    COALESCE(st.late, 0) as total_late,
+    COALESCE(st.total, 0) as total_classes,
+    ROUND((st.present * 100.0 / NULLIF(st.total, 0)), 2) as attendance_percentage
+FROM students s
+LEFT JOIN student_attendance_stats st ON st.student_id = s.id;
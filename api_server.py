@@ -5,18 +5,29 @@ Handles all attendance operations, analytics, and data retrieval
 from flask import Flask, request, jsonify
 from flask_cors import CORS
 from db_config_new import DatabaseConfig
+from attendance_manager import AttendanceManager
+from attendance_stats import AttendanceStats
+from write_behind import get_write_behind_queue
+from pagination import InvalidCursorError, decode_cursor, parse_limit, split_page
+from streaming import stream_rows, streaming_json_response
+from cache import faculty_cache, invalidate_roster, roster_cache
+from table_versions import conditional
+import serialization
+import metrics
+from live_feed import event_stream_response, get_live_feed, publish_marks
 from datetime import datetime, date
-import logging
+from logger_config import logger
 
 app = Flask(__name__)
 CORS(app)  # Enable CORS for frontend communication
+serialization.init_app(app)  # Fast JSON encoding and response compression
+metrics.init_app(app, 'api_server')  # Request timings and /metrics
 
-# Configure logging
-logging.basicConfig(
-    filename='attendance_api.log',
-    level=logging.INFO,
-    format='%(asctime)s - %(levelname)s - %(message)s'
-)
+# Start the write-behind queue (if enabled) so unflushed marks are replayed now
+try:
+    get_write_behind_queue()
+except Exception as e:
+    logger.error(f"Error starting write-behind queue: {e}")
 
 # Period timings configuration
 PERIOD_TIMINGS = {
@@ -37,41 +48,64 @@ def health_check():
     })
 
 @app.route('/api/students', methods=['GET'])
+@conditional('students')
 def get_students():
-    """Get all students"""
+    """Get one page of students ordered by name (?limit=&after=<next_cursor>)"""
     try:
-        query = "SELECT * FROM students ORDER BY name"
-        students = DatabaseConfig.execute_query(query, fetch=True)
+        limit = parse_limit(request.args.get('limit'))
+        after = request.args.get('after')
         
-        if students is not None:
-            # Convert date objects to strings
-            for student in students:
-                if isinstance(student.get('join_date'), date):
-                    student['join_date'] = student['join_date'].isoformat()
+        # Keyset pagination on (name, id) via idx_name
+        query = "SELECT * FROM students"
+        params = []
+        if after:
+            name, student_id = decode_cursor(after, 2)
+            query += " WHERE name > %s OR (name = %s AND id > %s)"
+            params.extend([name, name, student_id])
+        query += " ORDER BY name, id LIMIT %s"
+        params.append(limit + 1)
+        
+        def load():
+            rows = DatabaseConfig.execute_query(query, tuple(params), fetch=True)
+            if rows is None:
+                return None
+            return split_page(rows, limit, lambda student: [student['name'], student['id']])
+        
+        page = roster_cache.get_or_load(('api_page', limit, after), load)
+        
+        if page is not None:
+            students, next_cursor = page
             
             return jsonify({
                 'status': 'success',
                 'data': students,
-                'count': len(students)
+                'count': len(students),
+                'next_cursor': next_cursor
             })
         else:
             return jsonify({
                 'status': 'error',
                 'message': 'Failed to fetch students'
             }), 500
+    except InvalidCursorError as e:
+        return jsonify({
+            'status': 'error',
+            'message': str(e)
+        }), 400
     except Exception as e:
-        logging.error(f"Error fetching students: {e}")
+        logger.error(f"Error fetching students: {e}")
         return jsonify({
             'status': 'error',
             'message': str(e)
         }), 500
 
 @app.route('/api/faculty', methods=['GET'])
+@conditional('faculty')
 def get_faculty():
     """Get all faculty members"""
     try:
         query = "SELECT * FROM faculty ORDER BY name"
-        faculty = DatabaseConfig.execute_query(query, fetch=True)
+        faculty = faculty_cache.get_or_load('api_all', lambda: DatabaseConfig.execute_query(query, fetch=True))
         
         if faculty is not None:
             return jsonify({
@@ -85,7 +119,7 @@ def get_faculty():
                 'message': 'Failed to fetch faculty'
             }), 500
     except Exception as e:
-        logging.error(f"Error fetching faculty: {e}")
+        logger.error(f"Error fetching faculty: {e}")
         return jsonify({
             'status': 'error',
             'message': str(e)
@@ -109,113 +143,129 @@ def mark_attendance():
                 'message': 'Missing required fields'
             }), 400
         
-        # Insert attendance records
+        queue = get_write_behind_queue()
+        if queue is not None:
+            success_count, results = queue.submit([{
+                'student_id': record.get('student_id'),
+                'faculty_id': faculty_id,
+                'subject': subject,
+                'date': attendance_date,
+                'period': period,
+                'status': record.get('status')
+            } for record in attendance_records])
+            return jsonify({
+                'status': 'success',
+                'message': f'Attendance queued for {success_count} students',
+                'success_count': success_count,
+                'error_count': len(results) - success_count,
+                'queued': True
+            })
+        
+        # Upsert attendance records (one round trip per record)
         success_count = 0
         error_count = 0
+        inserted_count = 0
+        updated_count = 0
+        
+        changed = []
         
         for record in attendance_records:
             student_id = record.get('student_id')
             status = record.get('status')
             
-            # Check if attendance already exists
-            check_query = """
-                SELECT id FROM attendance 
-                WHERE student_id = %s AND date = %s AND period = %s
-            """
-            existing = DatabaseConfig.execute_query(
-                check_query, 
-                (student_id, attendance_date, period), 
-                fetch=True
+            result = DatabaseConfig.execute_query(
+                AttendanceManager.UPSERT_QUERY,
+                (student_id, faculty_id, subject, attendance_date, period, status)
             )
             
-            if existing:
-                # Update existing record
-                update_query = """
-                    UPDATE attendance 
-                    SET status = %s, faculty_id = %s, subject = %s
-                    WHERE student_id = %s AND date = %s AND period = %s
-                """
-                result = DatabaseConfig.execute_query(
-                    update_query,
-                    (status, faculty_id, subject, student_id, attendance_date, period)
-                )
-            else:
-                # Insert new record
-                insert_query = """
-                    INSERT INTO attendance (student_id, faculty_id, subject, date, period, status)
-                    VALUES (%s, %s, %s, %s, %s, %s)
-                """
-                result = DatabaseConfig.execute_query(
-                    insert_query,
-                    (student_id, faculty_id, subject, attendance_date, period, status)
-                )
-            
             if result is not None:
                 success_count += 1
+                outcome = AttendanceManager.upsert_outcome(result)
+                if outcome == AttendanceManager.OUTCOME_INSERTED:
+                    inserted_count += 1
+                else:
+                    updated_count += 1
+                if outcome != AttendanceManager.OUTCOME_UNCHANGED:
+                    changed.append({'student_id': student_id, 'faculty_id': faculty_id, 'subject': subject,
+                                    'date': attendance_date, 'period': period, 'status': status})
             else:
                 error_count += 1
         
+        publish_marks(changed)
+        
         return jsonify({
             'status': 'success',
             'message': f'Attendance marked successfully for {success_count} students',
             'success_count': success_count,
-            'error_count': error_count
+            'error_count': error_count,
+            'inserted_count': inserted_count,
+            'updated_count': updated_count
         })
         
     except Exception as e:
-        logging.error(f"Error marking attendance: {e}")
+        logger.error(f"Error marking attendance: {e}")
         return jsonify({
             'status': 'error',
             'message': str(e)
         }), 500
 
+DAILY_ATTENDANCE_QUERY = """
+    SELECT 
+        s.id,
+        s.reg_no,
+        s.name,
+        a.period,
+        a.status,
+        a.subject,
+        f.name as faculty_name
+    FROM students s
+    LEFT JOIN attendance a ON s.id = a.student_id AND a.date = %s
+    LEFT JOIN faculty f ON a.faculty_id = f.id
+    ORDER BY s.name, s.id, a.period
+"""
+
+def _group_daily_rows(rows):
+    """Group DAILY_ATTENDANCE_QUERY rows (ordered by student) into one item per student"""
+    current = None
+    for row in rows:
+        if current is None or current['id'] != row['id']:
+            if current is not None:
+                yield current
+            current = {
+                'id': row['id'],
+                'reg_no': row['reg_no'],
+                'name': row['name'],
+                'periods': {}
+            }
+        if row['period']:
+            current['periods'][row['period']] = {
+                'status': row['status'],
+                'subject': row['subject'],
+                'faculty': row['faculty_name']
+            }
+    if current is not None:
+        yield current
+
 @app.route('/api/attendance/daily', methods=['GET'])
+@conditional('students', 'faculty', date_from=lambda kwargs: request.args.get('date', date.today()))
 def get_daily_attendance():
-    """Get daily attendance summary"""
+    """Get daily attendance summary (?stream=1 streams the response)"""
     try:
         attendance_date = request.args.get('date', datetime.now().strftime('%Y-%m-%d'))
         
-        query = """
-            SELECT 
-                s.id,
-                s.reg_no,
-                s.name,
-                a.period,
-                a.status,
-                a.subject,
-                f.name as faculty_name
-            FROM students s
-            LEFT JOIN attendance a ON s.id = a.student_id AND a.date = %s
-            LEFT JOIN faculty f ON a.faculty_id = f.id
-            ORDER BY s.name, a.period
-        """
+        if request.args.get('stream') == '1':
+            return streaming_json_response(
+                {'status': 'success', 'date': attendance_date},
+                _group_daily_rows(stream_rows(DAILY_ATTENDANCE_QUERY, (attendance_date,)))
+            )
         
-        results = DatabaseConfig.execute_query(query, (attendance_date,), fetch=True)
+        results = DatabaseConfig.execute_query(DAILY_ATTENDANCE_QUERY, (attendance_date,), fetch=True)
         
         if results is not None:
-            # Organize data by student
-            students_data = {}
-            for row in results:
-                student_id = row['id']
-                if student_id not in students_data:
-                    students_data[student_id] = {
-                        'id': row['id'],
-                        'reg_no': row['reg_no'],
-                        'name': row['name'],
-                        'periods': {}
-                    }
-                
-                if row['period']:
-                    students_data[student_id]['periods'][row['period']] = {
-                        'status': row['status'],
-                        'subject': row['subject'],
-                        'faculty': row['faculty_name']
-                    }
-            
             return jsonify({
                 'status': 'success',
                 'date': attendance_date,
-                'data': list(students_data.values())
+                'data': list(_group_daily_rows(results))
             })
         else:
             return jsonify({
@@ -224,34 +274,29 @@ def get_daily_attendance():
             }), 500
             
     except Exception as e:
-        logging.error(f"Error fetching daily attendance: {e}")
+        logger.error(f"Error fetching daily attendance: {e}")
         return jsonify({
             'status': 'error',
             'message': str(e)
         }), 500
 
 @app.route('/api/attendance/analytics', methods=['GET'])
+@conditional('attendance', 'students')
 def get_attendance_analytics():
-    """Get overall attendance analytics"""
+    """Get overall attendance analytics (?stream=1 streams the response)"""
     try:
-        query = """
-            SELECT 
-                s.id,
-                s.reg_no,
-                s.name,
-                COUNT(CASE WHEN a.status = 'Present' THEN 1 END) as total_present,
-                COUNT(CASE WHEN a.status = 'Absent' THEN 1 END) as total_absent,
-                COUNT(CASE WHEN a.status = 'Late' THEN 1 END) as total_late,
-                COUNT(a.id) as total_classes,
-                ROUND((COUNT(CASE WHEN a.status = 'Present' THEN 1 END) * 100.0 / 
-                       NULLIF(COUNT(a.id), 0)), 2) as attendance_percentage
-            FROM students s
-            LEFT JOIN attendance a ON s.id = a.student_id
-            GROUP BY s.id, s.reg_no, s.name
-            ORDER BY s.name
-        """
+        # Served from student_attendance_stats: O(students), no scan of attendance
+        if request.args.get('stream') == '1':
+            return streaming_json_response(
+                {'status': 'success'},
+                (AttendanceStats.with_percentage(row) for row in stream_rows(AttendanceStats.SUMMARIES_QUERY))
+            )
         
-        results = DatabaseConfig.execute_query(query, fetch=True)
+        try:
+            results = AttendanceStats.get_all_summaries()
+        except Exception as e:
+            logger.error(f"Error reading attendance stats: {e}")
+            results = None
         
         if results is not None:
             return jsonify({
@@ -266,7 +311,7 @@ def get_attendance_analytics():
             }), 500
             
     except Exception as e:
-        logging.error(f"Error fetching analytics: {e}")
+        logger.error(f"Error fetching analytics: {e}")
         return jsonify({
             'status': 'error',
             'message': str(e)
@@ -297,6 +342,7 @@ def add_student():
         )
         
         if result is not None:
+            invalidate_roster()
             return jsonify({
                 'status': 'success',
                 'message': 'Student added successfully'
@@ -308,13 +354,75 @@ def add_student():
             }), 500
             
     except Exception as e:
-        logging.error(f"Error adding student: {e}")
+        logger.error(f"Error adding student: {e}")
         return jsonify({
             'status': 'error',
             'message': str(e)
         }), 500
 
+@app.route('/api/attendance/term_analytics', methods=['GET'])
+@conditional('attendance', 'students')
+def get_term_analytics():
+    """Get term-level analytics from the in-memory attendance cube"""
+    try:
+        from attendance_cube import get_attendance_cube
+        
+        start = request.args.get('start')
+        end = request.args.get('end')
+        start = datetime.strptime(start, '%Y-%m-%d').date() if start else None
+        end = datetime.strptime(end, '%Y-%m-%d').date() if end else None
+        
+        analytics = get_attendance_cube().analytics(start, end)
+        return jsonify({
+            'status': 'success',
+            'data': analytics
+        })
+    except ValueError:
+        return jsonify({
+            'status': 'error',
+            'message': 'Invalid date format. Use YYYY-MM-DD'
+        }), 400
+    except Exception as e:
+        logger.error(f"Error computing term analytics: {e}")
+        return jsonify({
+            'status': 'error',
+            'message': str(e)
+        }), 500
+
+@app.route('/api/attendance/live', methods=['GET'])
+def live_attendance():
+    """
+    Server-sent event stream of attendance changes
+    
+    ?view=analytics sends per-student counters as the snapshot;
+    ?view=daily&date=YYYY-MM-DD sends that day's grid. Afterwards only
+    'marks', 'stats' and 'resync' events follow.
+    """
+    feed = get_live_feed()
+    if feed is None:
+        return jsonify({
+            'status': 'error',
+            'message': 'Live feed is disabled'
+        }), 404
+    
+    view = request.args.get('view')
+    if view == 'analytics':
+        snapshot = lambda: {'view': 'analytics', 'data': AttendanceStats.get_all_summaries()}
+    elif view == 'daily':
+        attendance_date = request.args.get('date', datetime.now().strftime('%Y-%m-%d'))
+        snapshot = lambda: {
+            'view': 'daily',
+            'date': attendance_date,
+            'data': list(_group_daily_rows(
+                DatabaseConfig.execute_query(DAILY_ATTENDANCE_QUERY, (attendance_date,), fetch=True) or []))
+        }
+    else:
+        snapshot = None
+    
+    return event_stream_response(feed, snapshot, last_event_id=request.headers.get('Last-Event-ID'))
+
 @app.route('/api/periods', methods=['GET'])
+@conditional()
 def get_periods():
     """Get period timings"""
     return jsonify({
@@ -332,8 +440,11 @@ if __name__ == '__main__':
     print("   - POST /api/attendance/mark")
     print("   - GET  /api/attendance/daily")
     print("   - GET  /api/attendance/analytics")
+    print("   - GET  /api/attendance/term_analytics")
     print("   - POST /api/student/add")
+    print("   - GET  /api/attendance/live")
     print("   - GET  /api/periods")
+    print("For production use: python serve.py api_server --workers 4")
     print("\n✨ Press Ctrl+C to stop the server\n")
     
     app.run(debug=True, host='0.0.0.0', port=5000)
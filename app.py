@@ -3,17 +3,28 @@ Flask Web Application for Attendance Management System
 Integrates existing Python modules with beautiful web interface
 """
 
-from flask import Flask, render_template, request, jsonify, redirect, url_for
+import tempfile
+from flask import Flask, Response, render_template, request, jsonify, redirect, url_for, send_file, stream_with_context
 from flask_cors import CORS
 from datetime import date, datetime
 from student_manager import StudentManager
 from attendance_manager import AttendanceManager
 from faculty_manager import FacultyManager
+from attendance_stats import AttendanceStats
+from export_manager import ExportManager, ExportError
+from cache import cache_stats
+from table_versions import conditional
+from pagination import InvalidCursorError, parse_limit
+import serialization
+import metrics
 from db_config import DatabaseConfig
 from logger_config import logger
+from write_behind import get_write_behind_queue
 
 app = Flask(__name__)
 CORS(app)
+serialization.init_app(app)
+metrics.init_app(app, 'app')
 app.config['SECRET_KEY'] = 'attendance-system-secret-key-2025'
 
 # Test database connection on startup
@@ -25,26 +36,27 @@ try:
 except Exception as e:
     logger.error(f"Error testing database connection: {e}")
 
+# Start the write-behind queue (if enabled) so unflushed marks are replayed now
+try:
+    get_write_behind_queue()
+except Exception as e:
+    logger.error(f"Error starting write-behind queue: {e}")
+
 # ==================== WEB PAGES ====================
 
 @app.route('/')
 def index():
     """Dashboard / Home page"""
     try:
-        # Get quick stats
-        students = StudentManager.get_all_students()
-        today_attendance = AttendanceManager.get_attendance_by_date(date.today())
-        
-        stats = {
-            'total_students': len(students),
-            'today_attendance': len(today_attendance),
-            'today_date': date.today().strftime('%B %d, %Y')
-        }
+        # Maintained counters, not full student/attendance reads
+        stats = AttendanceStats.get_dashboard_counters()
+        stats['today_attendance'] = stats['today_marked']
+        stats['today_date'] = date.today().strftime('%B %d, %Y')
         
         return render_template('index.html', stats=stats)
     except Exception as e:
         logger.error(f"Error loading dashboard: {e}")
-        return render_template('index.html', stats={'total_students': 0, 'today_attendance': 0, 'today_date': date.today().strftime('%B %d, %Y')})
+        return render_template('index.html', stats={'total_students': 0, 'today_attendance': 0, 'periods_completed': 0, 'today_date': date.today().strftime('%B %d, %Y')})
 
 @app.route('/students')
 def students_page():
@@ -101,22 +113,26 @@ def add_student():
         }), 500
 
 @app.route('/api/students/list', methods=['GET'])
+@conditional('students')
 def list_students():
-    """Get all students"""
+    """Get one page of students (?limit=&after=<next_cursor>)"""
     try:
-        students = StudentManager.get_all_students()
-        
-        # Convert date objects to strings for JSON serialization
-        for student in students:
-            if 'join_date' in student and student['join_date']:
-                student['join_date'] = str(student['join_date'])
-            if 'created_at' in student and student['created_at']:
-                student['created_at'] = str(student['created_at'])
+        students, next_cursor = StudentManager.get_students_page(
+            limit=parse_limit(request.args.get('limit')),
+            after=request.args.get('after')
+        )
         
         return jsonify({
             'success': True,
-            'students': students
+            'students': students,
+            'next_cursor': next_cursor
         })
+    except InvalidCursorError as e:
+        return jsonify({
+            'success': False,
+            'message': str(e),
+            'students': []
+        }), 400
     except Exception as e:
         logger.error(f"Error in list_students API: {e}")
         return jsonify({
@@ -126,18 +142,13 @@ def list_students():
         }), 500
 
 @app.route('/api/students/<int:student_id>', methods=['GET'])
+@conditional('students')
 def get_student(student_id):
     """Get a specific student"""
     try:
         student = StudentManager.get_student_by_id(student_id)
         
         if student:
-            # Convert dates to strings
-            if 'join_date' in student and student['join_date']:
-                student['join_date'] = str(student['join_date'])
-            if 'created_at' in student and student['created_at']:
-                student['created_at'] = str(student['created_at'])
-            
             return jsonify({
                 'success': True,
                 'student': student
@@ -167,6 +178,22 @@ def mark_attendance():
         period = int(data.get('period', 1))
         status = data.get('status', 'Present')
         
+        queue = get_write_behind_queue()
+        if queue is not None:
+            accepted_count, results = queue.submit([{
+                'student_id': student_id,
+                'faculty_id': faculty_id,
+                'subject': subject,
+                'date': attendance_date,
+                'period': period,
+                'status': status
+            }])
+            return jsonify({
+                'success': accepted_count == 1,
+                'message': results[0]['message'],
+                'queued': accepted_count == 1
+            })
+        
         success, message = AttendanceManager.mark_attendance(
             student_id=student_id,
             faculty_id=faculty_id,
@@ -198,27 +225,29 @@ def mark_bulk_attendance():
         period = int(data.get('period', 1))
         records = data.get('records', []) # List of {student_id, status}
         
-        success_count = 0
-        errors = []
+        batch = [{
+            'student_id': record.get('student_id'),
+            'faculty_id': faculty_id,
+            'subject': subject,
+            'date': attendance_date,
+            'period': period,
+            'status': record.get('status')
+        } for record in records]
         
-        for record in records:
-            success, message = AttendanceManager.mark_attendance(
-                student_id=int(record['student_id']),
-                faculty_id=faculty_id,
-                subject=subject,
-                attendance_date=attendance_date,
-                period=period,
-                status=record['status']
-            )
-            if success:
-                success_count += 1
-            else:
-                errors.append(f"Student {record['student_id']}: {message}")
+        queue = get_write_behind_queue()
+        if queue is not None:
+            success_count, results = queue.submit(batch)
+        else:
+            success_count, failed_count, results = AttendanceManager.mark_attendance_batch(batch)
+        errors = [f"Student {result['student_id']}: {result['message']}"
+                  for result in results if not result['success']]
                 
         return jsonify({
             'success': True,
             'message': f'Successfully marked {success_count} records',
-            'errors': errors
+            'errors': errors,
+            'results': results,
+            'queued': queue is not None
         })
     except Exception as e:
         logger.error(f"Error in mark_bulk_attendance API: {e}")
@@ -228,21 +257,15 @@ def mark_bulk_attendance():
         }), 500
 
 @app.route('/api/attendance/today', methods=['GET'])
+@conditional('students', 'faculty', date_from=lambda kwargs: date.today())
 def today_attendance():
     """Get today's attendance records"""
     try:
         records = AttendanceManager.get_attendance_by_date(date.today())
         
-        # Convert dates to strings
-        for record in records:
-            if 'date' in record and record['date']:
-                record['date'] = str(record['date'])
-            if 'created_at' in record and record['created_at']:
-                record['created_at'] = str(record['created_at'])
-        
         return jsonify({
             'success': True,
-            'date': str(date.today()),
+            'date': date.today(),
             'records': records
         })
     except Exception as e:
@@ -254,18 +277,12 @@ def today_attendance():
         }), 500
 
 @app.route('/api/attendance/date/<date_str>', methods=['GET'])
+@conditional('students', 'faculty', date_from=lambda kwargs: kwargs['date_str'])
 def attendance_by_date(date_str):
     """Get attendance for a specific date"""
     try:
         records = AttendanceManager.get_attendance_by_date(date_str)
         
-        # Convert dates to strings
-        for record in records:
-            if 'date' in record and record['date']:
-                record['date'] = str(record['date'])
-            if 'created_at' in record and record['created_at']:
-                record['created_at'] = str(record['created_at'])
-        
         return jsonify({
             'success': True,
             'date': date_str,
@@ -280,23 +297,28 @@ def attendance_by_date(date_str):
         }), 500
 
 @app.route('/api/attendance/student/<int:student_id>', methods=['GET'])
+@conditional('attendance', 'students', 'faculty')
 def student_attendance(student_id):
-    """Get attendance history for a student"""
+    """Get one page of attendance history for a student (?limit=&after=<next_cursor>)"""
     try:
-        records = AttendanceManager.get_student_attendance(student_id)
-        
-        # Convert dates to strings
-        for record in records:
-            if 'date' in record and record['date']:
-                record['date'] = str(record['date'])
-            if 'created_at' in record and record['created_at']:
-                record['created_at'] = str(record['created_at'])
+        records, next_cursor = AttendanceManager.get_student_attendance_page(
+            student_id,
+            limit=parse_limit(request.args.get('limit')),
+            after=request.args.get('after')
+        )
         
         return jsonify({
             'success': True,
             'student_id': student_id,
-            'records': records
+            'records': records,
+            'next_cursor': next_cursor
         })
+    except InvalidCursorError as e:
+        return jsonify({
+            'success': False,
+            'message': str(e),
+            'records': []
+        }), 400
     except Exception as e:
         logger.error(f"Error in student_attendance API: {e}")
         return jsonify({
@@ -306,6 +328,7 @@ def student_attendance(student_id):
         }), 500
 
 @app.route('/api/faculty/list', methods=['GET'])
+@conditional('faculty')
 def list_faculty():
     """Get all faculty records"""
     try:
@@ -323,6 +346,7 @@ def list_faculty():
         }), 500
 
 @app.route('/api/reports/daily/<date_str>', methods=['GET'])
+@conditional('students', 'faculty', date_from=lambda kwargs: kwargs['date_str'])
 def daily_analysis(date_str):
     """Get daily analysis for all periods"""
     try:
@@ -345,19 +369,13 @@ def daily_analysis(date_str):
         }), 500
 
 @app.route('/api/reports/summary/<int:student_id>', methods=['GET'])
+@conditional('attendance', 'students')
 def attendance_summary(student_id):
     """Get attendance summary for a student"""
     try:
         summary = AttendanceManager.get_attendance_summary(student_id)
         student = StudentManager.get_student_by_id(student_id)
         
-        if student:
-            # Convert dates
-            if 'join_date' in student and student['join_date']:
-                student['join_date'] = str(student['join_date'])
-            if 'created_at' in student and student['created_at']:
-                student['created_at'] = str(student['created_at'])
-        
         return jsonify({
             'success': True,
             'student': student,
@@ -370,6 +388,98 @@ def attendance_summary(student_id):
             'message': f'Error: {str(e)}'
         }), 500
 
+@app.route('/api/stats', methods=['GET'])
+def get_dashboard_stats():
+    """
+    Dashboard counters for a day (default today)
+
+    Query parameters: date (YYYY-MM-DD)
+    """
+    try:
+        day = request.args.get('date')
+        day = datetime.strptime(day, '%Y-%m-%d').date() if day else date.today()
+        stats = AttendanceStats.get_dashboard_counters(day)
+        stats['date'] = day
+        return jsonify({
+            'success': True,
+            'stats': stats
+        })
+    except ValueError:
+        return jsonify({
+            'success': False,
+            'message': 'Invalid date format. Use YYYY-MM-DD'
+        }), 400
+    except Exception as e:
+        logger.error(f"Error in dashboard_stats API: {e}")
+        return jsonify({
+            'success': False,
+            'message': f'Error: {str(e)}'
+        }), 500
+
+@app.route('/api/cache/stats', methods=['GET'])
+def get_cache_stats():
+    """Hit, miss and eviction counters of this process's read caches"""
+    return jsonify({
+        'success': True,
+        'caches': cache_stats()
+    })
+
+@app.route('/api/export', methods=['GET'])
+@conditional('attendance', 'students', 'faculty')
+def export_attendance():
+    """
+    Download the attendance register as CSV, XLSX or Parquet
+
+    Query parameters: format (csv|xlsx|parquet), start, end, subject,
+    faculty_id, student_id. CSV is streamed as it is read; XLSX and
+    Parquet are built in a temporary file, since both formats need to
+    seek back to write their footers.
+    """
+    fmt = request.args.get('format', 'csv').lower()
+    try:
+        if fmt not in ExportManager.FORMATS:
+            raise ExportError(f"Invalid format. Must be one of: {', '.join(ExportManager.FORMATS)}")
+        filters = ExportManager.parse_filters(
+            start_date=request.args.get('start'),
+            end_date=request.args.get('end'),
+            subject=request.args.get('subject'),
+            faculty_id=request.args.get('faculty_id'),
+            student_id=request.args.get('student_id')
+        )
+    except ExportError as e:
+        return jsonify({
+            'success': False,
+            'message': str(e)
+        }), 400
+
+    filename = ExportManager.default_filename(fmt, filters)
+    try:
+        if fmt == 'csv':
+            body = ExportManager.iter_csv(ExportManager.iter_chunks(filters))
+            return Response(stream_with_context(body), mimetype=ExportManager.CONTENT_TYPES['csv'],
+                            headers={'Content-Disposition': f'attachment; filename={filename}'})
+
+        output = tempfile.TemporaryFile()
+        try:
+            ExportManager.export(output, fmt, filters)
+            output.seek(0)
+        except Exception:
+            output.close()
+            raise
+        return send_file(output, mimetype=ExportManager.CONTENT_TYPES[fmt],
+                         as_attachment=True, download_name=filename)
+    except ExportError as e:
+        return jsonify({
+            'success': False,
+            'message': str(e)
+        }), 400
+    except Exception as e:
+        logger.error(f"Error in export_attendance API: {e}")
+        return jsonify({
+            'success': False,
+            'message': f'Error: {str(e)}'
+        }), 500
+
 # Error handlers
 @app.errorhandler(404)
 def not_found(error):
@@ -386,6 +496,7 @@ if __name__ == '__main__':
     print("="*60)
     print("\nStarting Flask server...")
     print("Access the application at: http://localhost:5000")
+    print("For production use: python serve.py app --workers 4")
     print("\nPress CTRL+C to stop the server\n")
     
     app.run(debug=True, host='0.0.0.0', port=5000)
@@ -0,0 +1,131 @@
+-- Attendance Archive Setup
+-- Terms, the compressed archive table for closed terms, and the cascades
+-- and checks that replace attendance's foreign keys once it is partitioned.
+-- Run after aggregates_setup.sql:
+--   python run_setup.py archive_setup.sql
+-- then see `python manage.py partition-attendance --help` and
+-- `python manage.py archive-term --help`.
+USE attendance_system;
+
+-- Academic terms: partition boundaries for --by term and the unit of archival
+CREATE TABLE IF NOT EXISTS attendance_terms (
+    name VARCHAR(50) PRIMARY KEY,
+    start_date DATE NOT NULL,
+    end_date DATE NOT NULL,
+    archived_at DATETIME NULL,
+    rows_archived INT NULL,
+    archive_file VARCHAR(255) NULL,
+    UNIQUE KEY unique_term_start (start_date),
+    CHECK (end_date >= start_date)
+) ENGINE=InnoDB;
+
+-- Marks of closed terms, moved out of attendance by archive-term.
+-- Clustered on (student_id, date, period) since the archive is read per
+-- student (history pages), and compressed because it is written once and
+-- rarely read. idx_archive_id serves exports, which page on id across
+-- both tables. Lifetime counters in student_attendance_stats and
+-- daily_period_rollup still include these rows.
+CREATE TABLE IF NOT EXISTS attendance_archive (
+    id INT NOT NULL,
+    student_id INT NOT NULL,
+    faculty_id INT NOT NULL,
+    subject VARCHAR(100) NOT NULL,
+    date DATE NOT NULL,
+    period INT NOT NULL,
+    status ENUM('Present', 'Absent', 'Late') NOT NULL,
+    created_at TIMESTAMP NULL,
+    PRIMARY KEY (student_id, date, period),
+    INDEX idx_archive_date (date),
+    INDEX idx_archive_id (id)
+) ENGINE=InnoDB ROW_FORMAT=COMPRESSED KEY_BLOCK_SIZE=8;
+
+-- Partitioned InnoDB tables cannot have foreign keys, so deleting a
+-- student or faculty member removes their marks through these triggers
+-- instead of ON DELETE CASCADE. They also cover the archive, which never
+-- had foreign keys, and are harmless while the keys still exist.
+DROP TRIGGER IF EXISTS trg_cascade_student_attendance;
+CREATE TRIGGER trg_cascade_student_attendance BEFORE DELETE ON students
+FOR EACH ROW
+    DELETE FROM attendance WHERE student_id = OLD.id;
+
+DROP TRIGGER IF EXISTS trg_cascade_student_archive;
+CREATE TRIGGER trg_cascade_student_archive BEFORE DELETE ON students
+FOR EACH ROW
+    DELETE FROM attendance_archive WHERE student_id = OLD.id;
+
+DROP TRIGGER IF EXISTS trg_cascade_faculty_attendance;
+CREATE TRIGGER trg_cascade_faculty_attendance BEFORE DELETE ON faculty
+FOR EACH ROW
+    DELETE FROM attendance WHERE faculty_id = OLD.id;
+
+DROP TRIGGER IF EXISTS trg_cascade_faculty_archive;
+CREATE TRIGGER trg_cascade_faculty_archive BEFORE DELETE ON faculty
+FOR EACH ROW
+    DELETE FROM attendance_archive WHERE faculty_id = OLD.id;
+
+-- The other half of the foreign keys: marks must reference an existing
+-- student and faculty member. The errors raised match the foreign key
+-- violations (errno 1452 naming the column), so callers handle both alike.
+-- The share locks keep the referenced row from being deleted before the
+-- mark commits, as a foreign key check would.
+--
+-- Marks dated inside an archived term are rejected (errno 1644), since the
+-- archive and the lifetime counters already hold that term. The share lock
+-- on the term row makes archive-term wait for writes already checked.
+DELIMITER //
+
+DROP TRIGGER IF EXISTS trg_check_attendance_insert//
+CREATE TRIGGER trg_check_attendance_insert BEFORE INSERT ON attendance
+FOR EACH ROW
+BEGIN
+    DECLARE referenced INT;
+    DECLARE archived INT;
+    SELECT COUNT(*) INTO archived FROM attendance_terms
+    WHERE start_date <= NEW.date AND end_date >= NEW.date AND archived_at IS NOT NULL
+    LOCK IN SHARE MODE;
+    IF archived > 0 THEN
+        SIGNAL SQLSTATE '45000' SET MESSAGE_TEXT = 'Attendance for an archived term cannot be changed';
+    END IF;
+    SELECT COUNT(*) INTO referenced FROM students WHERE id = NEW.student_id LOCK IN SHARE MODE;
+    IF referenced = 0 THEN
+        SIGNAL SQLSTATE '23000' SET MYSQL_ERRNO = 1452,
+            MESSAGE_TEXT = 'Cannot add or update a child row: no students row for student_id';
+    END IF;
+    SELECT COUNT(*) INTO referenced FROM faculty WHERE id = NEW.faculty_id LOCK IN SHARE MODE;
+    IF referenced = 0 THEN
+        SIGNAL SQLSTATE '23000' SET MYSQL_ERRNO = 1452,
+            MESSAGE_TEXT = 'Cannot add or update a child row: no faculty row for faculty_id';
+    END IF;
+END//
+
+DROP TRIGGER IF EXISTS trg_check_attendance_update//
+CREATE TRIGGER trg_check_attendance_update BEFORE UPDATE ON attendance
+FOR EACH ROW
+BEGIN
+    DECLARE referenced INT;
+    DECLARE archived INT;
+    SELECT COUNT(*) INTO archived FROM attendance_terms
+    WHERE ((start_date <= NEW.date AND end_date >= NEW.date)
+           OR (start_date <= OLD.date AND end_date >= OLD.date))
+      AND archived_at IS NOT NULL
+    LOCK IN SHARE MODE;
+    IF archived > 0 THEN
+        SIGNAL SQLSTATE '45000' SET MESSAGE_TEXT = 'Attendance for an archived term cannot be changed';
+    END IF;
+    IF NOT (NEW.student_id <=> OLD.student_id) THEN
+        SELECT COUNT(*) INTO referenced FROM students WHERE id = NEW.student_id LOCK IN SHARE MODE;
+        IF referenced = 0 THEN
+            SIGNAL SQLSTATE '23000' SET MYSQL_ERRNO = 1452,
+                MESSAGE_TEXT = 'Cannot add or update a child row: no students row for student_id';
+        END IF;
+    END IF;
+    IF NOT (NEW.faculty_id <=> OLD.faculty_id) THEN
+        SELECT COUNT(*) INTO referenced FROM faculty WHERE id = NEW.faculty_id LOCK IN SHARE MODE;
+        IF referenced = 0 THEN
+            SIGNAL SQLSTATE '23000' SET MYSQL_ERRNO = 1452,
+                MESSAGE_TEXT = 'Cannot add or update a child row: no faculty row for faculty_id';
+        END IF;
+    END IF;
+END//
+
+DELIMITER ;
@@ -0,0 +1,517 @@
+"""
+Attendance Archive Module
+Date-range partitioning of the attendance table and archival of closed terms
+
+attendance is partitioned by RANGE COLUMNS(date), one partition per month
+or per term, so day-scoped reads only touch one partition's indexes.
+Closed terms are moved into the compressed attendance_archive table (and
+optionally exported to a file first); student history reads query both
+tables. Requires archive_setup.sql.
+"""
+
+import re
+import threading
+import time
+from datetime import date, datetime, timedelta
+from mysql.connector import Error, errorcode
+from db_config import get_db_connection
+from table_versions import bump_attendance_versions
+from logger_config import logger
+
+class ArchiveError(Exception):
+    """Raised for invalid partitioning or archival requests"""
+
+
+HISTORY_COLUMNS = "id, student_id, faculty_id, subject, date, period, status, created_at"
+
+PARTITION_METHODS = ['month', 'term']
+
+# Catch-all partition for dates past the last boundary
+MAX_PARTITION = 'pmax'
+
+# Whether attendance_archive exists, rechecked after this many seconds
+ARCHIVE_CHECK_INTERVAL = 60
+
+_archive_state = {'available': None, 'checked_at': 0.0}
+_archive_state_lock = threading.Lock()
+
+
+def _parse_date(value, label):
+    if value is None or isinstance(value, date):
+        return value
+    try:
+        return datetime.strptime(str(value), '%Y-%m-%d').date()
+    except ValueError:
+        raise ArchiveError(f"Invalid {label}: {value}. Use YYYY-MM-DD")
+
+
+def archive_available():
+    """
+    Check whether the attendance_archive table exists
+
+    Returns:
+        bool: True if archive_setup.sql has been run
+    """
+    with _archive_state_lock:
+        if (_archive_state['available'] is not None
+                and time.monotonic() - _archive_state['checked_at'] < ARCHIVE_CHECK_INTERVAL):
+            return _archive_state['available']
+
+    conn = get_db_connection()
+    cursor = conn.cursor()
+    try:
+        cursor.execute("""
+            SELECT COUNT(*) FROM information_schema.TABLES
+            WHERE TABLE_SCHEMA = DATABASE() AND TABLE_NAME = 'attendance_archive'
+        """)
+        available = cursor.fetchone()[0] > 0
+    finally:
+        cursor.close()
+        conn.close()
+
+    with _archive_state_lock:
+        _archive_state['available'] = available
+        _archive_state['checked_at'] = time.monotonic()
+    return available
+
+
+def history_tables():
+    """
+    Tables holding attendance rows: attendance, plus the archive if it exists
+
+    Returns:
+        list: Table names
+    """
+    tables = ['attendance']
+    try:
+        if archive_available():
+            tables.append('attendance_archive')
+    except Error as e:
+        logger.error(f"Database error while checking the attendance archive: {e}")
+    return tables
+
+
+def history_source(where, params, suffix=''):
+    """
+    Build a derived table of attendance rows, including archived terms
+
+    Each branch is filtered (and limited) separately so both tables use
+    their own indexes.
+
+    Args:
+        where (str): Condition on HISTORY_COLUMNS, e.g. "student_id = %s"
+        params (tuple): Parameters of where (and suffix)
+        suffix (str): ORDER BY / LIMIT applied to each branch
+
+    Returns:
+        tuple: (sql: str aliased as h, params: tuple)
+    """
+    tables = history_tables()
+    branches = [f"(SELECT {HISTORY_COLUMNS} FROM {table} WHERE {where} {suffix})" for table in tables]
+    return f"({' UNION ALL '.join(branches)}) AS h", tuple(params) * len(tables)
+
+
+def archived_ranges(cursor):
+    """
+    Date ranges of archived terms, which the attendance triggers reject marks for
+
+    Args:
+        cursor: Cursor to query with
+
+    Returns:
+        list: (start_date, end_date) tuples; empty before archive_setup.sql
+    """
+    try:
+        cursor.execute("SELECT start_date, end_date FROM attendance_terms WHERE archived_at IS NOT NULL")
+    except Error as e:
+        if e.errno == errorcode.ER_NO_SUCH_TABLE:
+            return []
+        raise
+    return [(row[0], row[1]) for row in cursor.fetchall()]
+
+
+def is_archived_term_error(error):
+    """
+    Check whether a database error is an archive_setup.sql trigger
+    rejecting a mark dated inside an archived term
+
+    Args:
+        error (mysql.connector.Error): Error raised by an attendance write
+
+    Returns:
+        bool: True if the mark's date is archived
+    """
+    return (getattr(error, 'errno', None) == errorcode.ER_SIGNAL_EXCEPTION
+            and 'archived term' in str(error))
+
+
+def aggregate_source():
+    """
+    Attendance rows that the lifetime aggregates are built from
+
+    Live rows are share-locked so concurrent marks wait for a rebuild.
+
+    Returns:
+        str: Derived table SQL aliased as a
+    """
+    live = "SELECT student_id, date, period, subject, faculty_id, status FROM attendance LOCK IN SHARE MODE"
+    try:
+        if not archive_available():
+            return f"({live}) AS a"
+    except Error:
+        return f"({live}) AS a"
+    return (f"(({live}) UNION ALL "
+            f"(SELECT student_id, date, period, subject, faculty_id, status FROM attendance_archive)) AS a")
+
+
+class AttendanceArchive:
+    """Partition maintenance and term archival"""
+
+    # ==================== TERMS ====================
+
+    @staticmethod
+    def add_term(name, start_date, end_date):
+        """
+        Define or redefine an academic term
+
+        Args:
+            name (str): Term name, e.g. '2024-odd'
+            start_date (str or date): First day
+            end_date (str or date): Last day
+
+        Returns:
+            dict: The term
+        """
+        start_date = _parse_date(start_date, 'start date')
+        end_date = _parse_date(end_date, 'end date')
+        if not name or not name.strip():
+            raise ArchiveError("Term name is required")
+        if end_date < start_date:
+            raise ArchiveError("Term end date is before its start date")
+
+        conn = get_db_connection()
+        cursor = conn.cursor()
+        try:
+            cursor.execute("""
+                SELECT name FROM attendance_terms
+                WHERE name <> %s AND start_date <= %s AND end_date >= %s
+            """, (name, end_date, start_date))
+            overlapping = cursor.fetchone()
+            if overlapping:
+                raise ArchiveError(f"Term overlaps {overlapping[0]}")
+            cursor.execute("""
+                INSERT INTO attendance_terms (name, start_date, end_date) VALUES (%s, %s, %s)
+                ON DUPLICATE KEY UPDATE start_date = VALUES(start_date), end_date = VALUES(end_date)
+            """, (name.strip(), start_date, end_date))
+            conn.commit()
+        finally:
+            cursor.close()
+            conn.close()
+
+        logger.info(f"Term {name} defined: {start_date} to {end_date}")
+        return {'name': name.strip(), 'start_date': start_date, 'end_date': end_date}
+
+    @staticmethod
+    def get_terms():
+        """
+        Get every term, oldest first
+
+        Returns:
+            list: Rows with name, start_date, end_date, archived_at,
+                rows_archived and archive_file
+        """
+        conn = get_db_connection()
+        cursor = conn.cursor(dictionary=True)
+        try:
+            cursor.execute("""
+                SELECT name, start_date, end_date, archived_at, rows_archived, archive_file
+                FROM attendance_terms
+                ORDER BY start_date
+            """)
+            return cursor.fetchall()
+        finally:
+            cursor.close()
+            conn.close()
+
+    # ==================== PARTITIONING ====================
+
+    @staticmethod
+    def partition_boundaries(method, first, last, terms=None):
+        """
+        Compute partitions covering first..last
+
+        Args:
+            method (str): 'month' or 'term'
+            first (date): Earliest date to cover
+            last (date): Latest date to cover
+            terms (list, optional): get_terms() rows, required for 'term'
+
+        Returns:
+            list: (partition_name, exclusive_upper_bound: date) in order
+        """
+        if method == 'month':
+            boundaries = []
+            current = first.replace(day=1)
+            while current <= last:
+                following = (current + timedelta(days=32)).replace(day=1)
+                boundaries.append((f"p{current:%Y%m}", following))
+                current = following
+            return boundaries
+
+        if method == 'term':
+            if not terms:
+                raise ArchiveError("No terms defined; add them with manage.py add-term")
+            boundaries = []
+            for term in terms:
+                name = 't_' + re.sub(r'[^0-9A-Za-z_]', '_', term['name'])
+                boundaries.append((name, term['end_date'] + timedelta(days=1)))
+            return boundaries
+
+        raise ArchiveError(f"Invalid partition method. Must be one of: {', '.join(PARTITION_METHODS)}")
+
+    @staticmethod
+    def get_partitions(cursor):
+        """
+        Read the current partitions of attendance
+
+        Returns:
+            list: (partition_name, description) in order; empty if the
+                table is not partitioned
+        """
+        cursor.execute("""
+            SELECT PARTITION_NAME, PARTITION_DESCRIPTION
+            FROM information_schema.PARTITIONS
+            WHERE TABLE_SCHEMA = DATABASE() AND TABLE_NAME = 'attendance'
+              AND PARTITION_NAME IS NOT NULL
+            ORDER BY PARTITION_ORDINAL_POSITION
+        """)
+        return cursor.fetchall()
+
+    @staticmethod
+    def _partition_clause(boundaries):
+        parts = [f"PARTITION {name} VALUES LESS THAN ('{bound.isoformat()}')" for name, bound in boundaries]
+        parts.append(f"PARTITION {MAX_PARTITION} VALUES LESS THAN (MAXVALUE)")
+        return ',\n    '.join(parts)
+
+    @staticmethod
+    def partition(method='month', ahead=3, rebuild=False):
+        """
+        Partition attendance by month or term, or add partitions ahead
+
+        The first run drops attendance's foreign keys (archive_setup.sql
+        triggers take over the cascades and the reference checks), widens the primary key to
+        (id, date) and rebuilds the table, which locks it for the duration.
+        Later runs only split the empty catch-all partition, which is cheap.
+
+        Args:
+            method (str): 'month' or 'term'
+            ahead (int): Months past today to create partitions for
+                (month method)
+            rebuild (bool): Repartition an already partitioned table, e.g.
+                to switch method
+
+        Returns:
+            dict: action ('created', 'extended' or 'unchanged') and the
+                partitions added
+        """
+        if method not in PARTITION_METHODS:
+            raise ArchiveError(f"Invalid partition method. Must be one of: {', '.join(PARTITION_METHODS)}")
+        if not archive_available():
+            raise ArchiveError("Run archive_setup.sql first: its triggers replace attendance's foreign keys")
+
+        terms = AttendanceArchive.get_terms() if method == 'term' else None
+
+        conn = get_db_connection()
+        cursor = conn.cursor()
+        try:
+            cursor.execute("SELECT MIN(date), MAX(date) FROM attendance")
+            first, last = cursor.fetchone()
+            today = date.today()
+            first = first or today
+            last = max(last or today, today)
+            if method == 'month':
+                for _ in range(ahead):
+                    last = (last.replace(day=1) + timedelta(days=32)).replace(day=1)
+            boundaries = AttendanceArchive.partition_boundaries(method, first, last, terms)
+
+            existing = AttendanceArchive.get_partitions(cursor)
+            if existing and not rebuild:
+                return AttendanceArchive._extend(cursor, existing, boundaries)
+
+            if not existing:
+                cursor.execute("""
+                    SELECT CONSTRAINT_NAME FROM information_schema.REFERENTIAL_CONSTRAINTS
+                    WHERE CONSTRAINT_SCHEMA = DATABASE() AND TABLE_NAME = 'attendance'
+                """)
+                foreign_keys = [row[0] for row in cursor.fetchall()]
+                if foreign_keys:
+                    cursor.execute("ALTER TABLE attendance " +
+                                   ', '.join(f"DROP FOREIGN KEY `{name}`" for name in foreign_keys))
+                    logger.info(f"Dropped attendance foreign keys: {', '.join(foreign_keys)}")
+                # Every unique key of a partitioned table must include the partition column
+                cursor.execute("ALTER TABLE attendance DROP PRIMARY KEY, ADD PRIMARY KEY (id, date)")
+
+            started = time.perf_counter()
+            cursor.execute("ALTER TABLE attendance PARTITION BY RANGE COLUMNS(date) (\n    "
+                           + AttendanceArchive._partition_clause(boundaries) + "\n)")
+            logger.info(f"Partitioned attendance by {method} into {len(boundaries) + 1} partitions "
+                        f"in {time.perf_counter() - started:.1f}s")
+            return {'action': 'created', 'partitions': [name for name, _ in boundaries] + [MAX_PARTITION]}
+        finally:
+            cursor.close()
+            conn.close()
+
+    @staticmethod
+    def _extend(cursor, existing, boundaries):
+        bounds = [description.strip("'") for name, description in existing if name != MAX_PARTITION]
+        last_bound = max(datetime.strptime(bound, '%Y-%m-%d').date() for bound in bounds) if bounds else None
+        names = {name for name, _ in existing}
+        new = [(name, bound) for name, bound in boundaries
+               if (last_bound is None or bound > last_bound) and name not in names]
+        if not new:
+            return {'action': 'unchanged', 'partitions': []}
+
+        cursor.execute(f"ALTER TABLE attendance REORGANIZE PARTITION {MAX_PARTITION} INTO (\n    "
+                       + AttendanceArchive._partition_clause(new) + "\n)")
+        logger.info(f"Added attendance partitions: {', '.join(name for name, _ in new)}")
+        return {'action': 'extended', 'partitions': [name for name, _ in new]}
+
+    # ==================== ARCHIVAL ====================
+
+    @staticmethod
+    def _droppable_partitions(cursor, start_date, end_date):
+        """Partitions whose whole date range lies inside start_date..end_date"""
+        partitions = AttendanceArchive.get_partitions(cursor)
+        droppable = []
+        lower = None
+        for name, description in partitions:
+            if name == MAX_PARTITION:
+                break
+            upper = datetime.strptime(description.strip("'"), '%Y-%m-%d').date()
+            if lower is not None and lower >= start_date and upper - timedelta(days=1) <= end_date:
+                droppable.append(name)
+            lower = upper
+        return droppable
+
+    @staticmethod
+    def _copy_to_archive(cursor, source, where="1 = 1", params=()):
+        """Copy rows into the archive, locking them; live rows win over any earlier copy"""
+        cursor.execute(f"""
+            INSERT INTO attendance_archive ({HISTORY_COLUMNS})
+            SELECT {HISTORY_COLUMNS} FROM {source} WHERE {where}
+            FOR UPDATE
+            ON DUPLICATE KEY UPDATE
+                id = VALUES(id), faculty_id = VALUES(faculty_id), subject = VALUES(subject),
+                status = VALUES(status), created_at = VALUES(created_at)
+        """, params)
+
+    @staticmethod
+    def archive_term(name, export_path=None, chunk_days=7):
+        """
+        Move a closed term's attendance into attendance_archive
+
+        The term is marked archived first, so the archive_setup.sql triggers
+        reject new or corrected marks for its dates from then on. Rows are
+        then moved (idempotently): partitions lying wholly inside the term
+        are copied and truncated once the copy is confirmed under lock,
+        other days are copied and deleted a few days per transaction.
+        Lifetime counters are left as they are, since they already include
+        the archived marks. Safe to re-run after an interruption.
+
+        Args:
+            name (str): Term defined with add_term()
+            export_path (str, optional): Also export the term to this .csv,
+                .xlsx or .parquet file before moving it
+            chunk_days (int): Days copied and deleted per transaction
+
+        Returns:
+            dict: rows, partitions_truncated, seconds and export (if any)
+        """
+        terms = {term['name']: term for term in AttendanceArchive.get_terms()}
+        term = terms.get(name)
+        if term is None:
+            raise ArchiveError(f"Unknown term {name}; define it with manage.py add-term")
+        start_date, end_date = term['start_date'], term['end_date']
+        if end_date >= date.today():
+            raise ArchiveError(f"Term {name} has not ended yet ({end_date})")
+
+        started = time.perf_counter()
+        result = {'rows': 0, 'partitions_truncated': [], 'export': None}
+
+        conn = get_db_connection()
+        cursor = conn.cursor()
+        try:
+            # 1. Close the term. Writers hold a share lock on its row while
+            #    checking it, so once this commits no write to its dates is
+            #    in flight and none can start.
+            cursor.execute("UPDATE attendance_terms SET archived_at = COALESCE(archived_at, NOW()) WHERE name = %s",
+                           (name,))
+            conn.commit()
+
+            if export_path:
+                from export_manager import ExportManager
+
+                fmt = export_path.rsplit('.', 1)[-1].lower()
+                filters = ExportManager.parse_filters(str(start_date), str(end_date))
+                result['export'] = ExportManager.export(export_path, fmt, filters)
+
+            # 2. Whole partitions: copy, confirm every row is in the archive
+            #    while still holding the locks, then truncate
+            for partition in AttendanceArchive._droppable_partitions(cursor, start_date, end_date):
+                AttendanceArchive._copy_to_archive(cursor, f"attendance PARTITION ({partition})")
+                cursor.execute(f"""
+                    SELECT COUNT(*) FROM attendance PARTITION ({partition}) AS a
+                    LEFT JOIN attendance_archive AS r
+                        ON r.student_id = a.student_id AND r.date = a.date AND r.period = a.period
+                        AND r.id = a.id AND r.status = a.status
+                    WHERE r.student_id IS NULL
+                    LOCK IN SHARE MODE
+                """)
+                missing = cursor.fetchone()[0]
+                if missing:
+                    # Left to the day-range pass below
+                    conn.rollback()
+                    logger.warning(f"Partition {partition} has {missing} rows missing from the archive; "
+                                   "deleting it by day instead of truncating")
+                    continue
+                # Commits the copy; the term is closed, so nothing reaches the
+                # partition between that commit and the truncate
+                cursor.execute(f"ALTER TABLE attendance TRUNCATE PARTITION {partition}")
+                result['partitions_truncated'].append(partition)
+
+            # 3. Other days: copy and delete each range in one transaction
+            day = start_date
+            while day <= end_date:
+                chunk_end = min(day + timedelta(days=chunk_days - 1), end_date)
+                AttendanceArchive._copy_to_archive(cursor, "attendance", "date BETWEEN %s AND %s",
+                                                   (day, chunk_end))
+                cursor.execute("DELETE FROM attendance WHERE date BETWEEN %s AND %s", (day, chunk_end))
+                conn.commit()
+                day = chunk_end + timedelta(days=1)
+
+            # 4. Record the term; cached responses for its dates are stale
+            cursor.execute("SELECT COUNT(*) FROM attendance_archive WHERE date BETWEEN %s AND %s",
+                           (start_date, end_date))
+            result['rows'] = cursor.fetchone()[0]
+            cursor.execute("""
+                UPDATE attendance_terms
+                SET archived_at = NOW(), rows_archived = %s, archive_file = %s
+                WHERE name = %s
+            """, (result['rows'], export_path, name))
+            cursor.execute("DELETE FROM daily_report_cache WHERE date BETWEEN %s AND %s",
+                           (start_date, end_date))
+            bump_attendance_versions(cursor, start_date, end_date)
+            conn.commit()
+
+        except Error as e:
+            conn.rollback()
+            if e.errno == errorcode.ER_NO_SUCH_TABLE:
+                raise ArchiveError("Run archive_setup.sql first") from e
+            raise
+        finally:
+            cursor.close()
+            conn.close()
+
+        result['seconds'] = round(time.perf_counter() - started, 3)
+        logger.info(f"Archived term {name}: {result['rows']} rows in {result['seconds']}s")
+        return result
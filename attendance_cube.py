@@ -0,0 +1,538 @@
+"""
+Attendance Cube Module
+In-memory NumPy analytics engine over the attendance table
+
+Attendance is held as a dense int8 cube indexed [student, school day, period]
+so term-level analytics are array reductions instead of SQL GROUP BYs.
+"""
+
+import os
+import threading
+import time
+from datetime import date, datetime
+import numpy as np
+from attendance_archive import history_tables
+from change_log import ChangeReader, change_log_settings, prune_changes
+from db_config import DatabaseConfig, get_db_connection
+from logger_config import logger
+
+# Cell codes; Present/Absent/Late match the attendance.status ENUM index
+UNMARKED = 0
+PRESENT = 1
+ABSENT = 2
+LATE = 3
+
+STATUS_CODES = {'Present': PRESENT, 'Absent': ABSENT, 'Late': LATE}
+PERIODS = 5
+
+# MySQL TO_DAYS() minus Python date.toordinal()
+TO_DAYS_OFFSET = 365
+
+WEEKDAY_NAMES = ['Monday', 'Tuesday', 'Wednesday', 'Thursday', 'Friday', 'Saturday', 'Sunday']
+
+
+def allocate_cells(n_students, n_days, fill, dtype):
+    """
+    Allocate a [student, day, period] array stored day-major
+
+    Marks arrive a school day at a time, so keeping each day's cells
+    contiguous means a new day (in memory or in a mapped snapshot) only
+    touches the pages of that day.
+    """
+    return np.full((n_days, n_students, PERIODS), fill, dtype=dtype).transpose(1, 0, 2)
+
+
+class AttendanceCube:
+    """
+    Dense attendance cube with incremental refresh
+
+    status[i, j, p] holds the code for student_ids[i] on day_numbers[j]
+    (MySQL TO_DAYS) in period p + 1, and subjects[i, j, p] the index into
+    subject_names (-1 when unmarked). refresh() follows the
+    attendance_changes log (change_log_setup.sql), so new marks and
+    corrections made by any process are applied alike. Without the log it
+    falls back to rows newer than the created_at watermark; corrections,
+    which do not move created_at, then wait for apply_marks() or a full
+    load().
+    """
+
+    def __init__(self):
+        self._lock = threading.RLock()
+        self.student_ids = np.zeros(0, dtype=np.int32)
+        self.day_numbers = np.zeros(0, dtype=np.int32)
+        self.status = allocate_cells(0, 0, UNMARKED, np.int8)
+        self.subjects = allocate_cells(0, 0, -1, np.int16)
+        self.subject_names = []
+        self.n_students = 0
+        self.n_days = 0
+        self.watermark = None
+        self.changes = None
+        self.loaded_at = None
+        self.refreshed_at = None
+        # Modification time of the snapshot file this cube was mapped from
+        self.snapshot_mtime = None
+        self._student_index = {}
+        self._day_index = {}
+        self._subject_index = {}
+
+    # ==================== LOADING ====================
+
+    @classmethod
+    def from_database(cls, chunk_size=100000):
+        """
+        Build a cube from the full attendance table
+
+        Args:
+            chunk_size (int): Rows fetched per round trip
+
+        Returns:
+            AttendanceCube: Loaded cube
+        """
+        cube = cls()
+        cube.load(chunk_size)
+        return cube
+
+    def load(self, chunk_size=100000):
+        """Replace the cube contents with the full attendance table and archived terms"""
+        started = time.perf_counter()
+        tables = history_tables()
+        conn = get_db_connection()
+        # One snapshot for the index queries and the scan, so every scanned
+        # row maps onto a known student, day and subject
+        conn.start_transaction(consistent_snapshot=True, readonly=True)
+        cursor = conn.cursor()
+        try:
+            cursor.execute("SELECT id FROM students ORDER BY id")
+            student_ids = np.fromiter((row[0] for row in cursor.fetchall()), dtype=np.int32)
+
+            days = set()
+            subject_names = set()
+            for table in tables:
+                cursor.execute(f"SELECT DISTINCT TO_DAYS(date) FROM {table}")
+                days.update(row[0] for row in cursor.fetchall())
+                cursor.execute(f"SELECT DISTINCT subject FROM {table}")
+                subject_names.update(row[0] for row in cursor.fetchall())
+            day_numbers = np.array(sorted(days), dtype=np.int32)
+            subject_names = sorted(subject_names)
+
+            cursor.execute("SELECT MAX(created_at) FROM attendance")
+            watermark = cursor.fetchone()[0]
+
+            changes = ChangeReader.start(cursor, change_log_settings()['lag_seconds'])
+
+            status = allocate_cells(len(student_ids), len(day_numbers), UNMARKED, np.int8)
+            subjects = allocate_cells(len(student_ids), len(day_numbers), -1, np.int16)
+            subject_lookup = {name: code for code, name in enumerate(subject_names)}
+
+            # Each table is scanned on its own rather than through a UNION,
+            # which MySQL would materialize; status + 0 yields the ENUM
+            # index, which is the cell code
+            for rows in self._scan(cursor, tables, chunk_size):
+                columns = list(zip(*rows))
+                rows_student = np.searchsorted(student_ids, np.asarray(columns[0], dtype=np.int32))
+                rows_day = np.searchsorted(day_numbers, np.asarray(columns[1], dtype=np.int32))
+                rows_period = np.asarray(columns[2], dtype=np.int16) - 1
+                status[rows_student, rows_day, rows_period] = np.asarray(columns[3], dtype=np.int8)
+                subjects[rows_student, rows_day, rows_period] = np.fromiter(
+                    (subject_lookup[name] for name in columns[4]), dtype=np.int16, count=len(rows))
+        finally:
+            cursor.close()
+            conn.close()
+
+        with self._lock:
+            self.student_ids = student_ids
+            self.day_numbers = day_numbers
+            self.status = status
+            self.subjects = subjects
+            self.subject_names = subject_names
+            self.n_students = len(student_ids)
+            self.n_days = len(day_numbers)
+            self.watermark = watermark
+            self.changes = changes
+            self.loaded_at = self.refreshed_at = time.time()
+            self._rebuild_indexes()
+
+        logger.info(f"Attendance cube loaded: {self.n_students} students x {self.n_days} days "
+                    f"in {time.perf_counter() - started:.2f}s")
+
+    @staticmethod
+    def _scan(cursor, tables, chunk_size):
+        """Yield (student_id, TO_DAYS, period, status code, subject) chunks of every table"""
+        for table in tables:
+            cursor.execute(f"""
+                SELECT student_id, TO_DAYS(date), period, status + 0, subject
+                FROM {table}
+            """)
+            while True:
+                rows = cursor.fetchmany(chunk_size)
+                if not rows:
+                    break
+                yield rows
+
+    def _rebuild_indexes(self):
+        self._student_index = {int(student_id): i for i, student_id in enumerate(self.student_ids[:self.n_students])}
+        self._day_index = {int(day): j for j, day in enumerate(self.day_numbers[:self.n_days])}
+        self._subject_index = {name: code for code, name in enumerate(self.subject_names)}
+
+    def _grow(self, n_students, n_days):
+        """
+        Ensure capacity for n_students x n_days, doubling to amortize growth
+
+        Snapshots reserve spare capacity, so a mapped cube normally grows
+        in place and keeps sharing its pages.
+        """
+        capacity_students, capacity_days = self.status.shape[:2]
+        if n_students <= capacity_students and n_days <= capacity_days:
+            return
+        new_students = max(n_students, capacity_students * 2 if n_students > capacity_students else capacity_students)
+        new_days = max(n_days, capacity_days * 2 if n_days > capacity_days else capacity_days)
+
+        status = allocate_cells(new_students, new_days, UNMARKED, np.int8)
+        subjects = allocate_cells(new_students, new_days, -1, np.int16)
+        status[:self.n_students, :self.n_days] = self.status[:self.n_students, :self.n_days]
+        subjects[:self.n_students, :self.n_days] = self.subjects[:self.n_students, :self.n_days]
+        self.status = status
+        self.subjects = subjects
+
+        student_ids = np.zeros(new_students, dtype=np.int32)
+        student_ids[:self.n_students] = self.student_ids[:self.n_students]
+        self.student_ids = student_ids
+        day_numbers = np.zeros(new_days, dtype=np.int32)
+        day_numbers[:self.n_days] = self.day_numbers[:self.n_days]
+        self.day_numbers = day_numbers
+
+    def apply_marks(self, marks):
+        """
+        Apply attendance marks to the cube
+
+        Args:
+            marks (iterable): (student_id, date or TO_DAYS int, period, status, subject) tuples
+        """
+        with self._lock:
+            for student_id, day, period, status, subject in marks:
+                if isinstance(day, str):
+                    day = datetime.strptime(day, '%Y-%m-%d').date()
+                if isinstance(day, date):
+                    day = day.toordinal() + TO_DAYS_OFFSET
+                status = STATUS_CODES[status] if isinstance(status, str) else int(status)
+
+                i = self._student_index.get(student_id)
+                if i is None:
+                    self._grow(self.n_students + 1, self.n_days)
+                    i = self.n_students
+                    self.student_ids[i] = student_id
+                    self._student_index[student_id] = i
+                    self.n_students += 1
+
+                j = self._day_index.get(day)
+                if j is None:
+                    self._grow(self.n_students, self.n_days + 1)
+                    j = self.n_days
+                    self.day_numbers[j] = day
+                    self._day_index[day] = j
+                    self.n_days += 1
+
+                code = self._subject_index.get(subject)
+                if code is None:
+                    code = len(self.subject_names)
+                    self.subject_names.append(subject)
+                    self._subject_index[subject] = code
+
+                self.status[i, j, period - 1] = status
+                self.subjects[i, j, period - 1] = code
+
+    def refresh(self):
+        """
+        Apply changes logged since the last refresh, or rows created since
+        the watermark when the change log is not installed
+
+        Returns:
+            int: Number of rows applied
+        """
+        conn = get_db_connection()
+        cursor = conn.cursor()
+        try:
+            if self.changes is not None:
+                changes = self.changes.read(cursor)
+                prune_changes(conn, change_log_settings()['retention_seconds'])
+                self.apply_marks((student_id, day, period, status, subject)
+                                 for _, student_id, _, subject, day, period, status in changes)
+                return len(changes)
+            if self.watermark is None:
+                cursor.execute("""
+                    SELECT student_id, TO_DAYS(date), period, status + 0, subject, created_at
+                    FROM attendance
+                """)
+            else:
+                # >= because created_at has one-second resolution; re-applying a mark is idempotent
+                cursor.execute("""
+                    SELECT student_id, TO_DAYS(date), period, status + 0, subject, created_at
+                    FROM attendance
+                    WHERE created_at >= %s
+                """, (self.watermark,))
+            rows = cursor.fetchall()
+        finally:
+            cursor.close()
+            conn.close()
+
+        if rows:
+            self.apply_marks(row[:5] for row in rows)
+            with self._lock:
+                latest = max(row[5] for row in rows)
+                if self.watermark is None or latest > self.watermark:
+                    self.watermark = latest
+        return len(rows)
+
+    # ==================== ANALYTICS ====================
+
+    def _view(self, start=None, end=None):
+        """Status and subject arrays restricted to days in [start, end]"""
+        status = self.status[:self.n_students, :self.n_days]
+        subjects = self.subjects[:self.n_students, :self.n_days]
+        days = self.day_numbers[:self.n_days]
+        if start is None and end is None:
+            return status, subjects, days
+
+        mask = np.ones(self.n_days, dtype=bool)
+        if start is not None:
+            mask &= days >= start.toordinal() + TO_DAYS_OFFSET
+        if end is not None:
+            mask &= days <= end.toordinal() + TO_DAYS_OFFSET
+        return status[:, mask], subjects[:, mask], days[mask]
+
+    @staticmethod
+    def _rates(present, absent, late):
+        total = present + absent + late
+        with np.errstate(divide='ignore', invalid='ignore'):
+            percentage = np.where(total > 0, np.round(present * 100.0 / np.maximum(total, 1), 2), np.nan)
+        return total, percentage
+
+    def student_percentages(self, start=None, end=None):
+        """
+        Per-student counters and attendance percentage
+
+        Returns:
+            dict: student_ids, total, present, absent, late and
+                attendance_percentage arrays (NaN where nothing is marked)
+        """
+        with self._lock:
+            status, _, _ = self._view(start, end)
+            present = np.count_nonzero(status == PRESENT, axis=(1, 2))
+            absent = np.count_nonzero(status == ABSENT, axis=(1, 2))
+            late = np.count_nonzero(status == LATE, axis=(1, 2))
+            total, percentage = self._rates(present, absent, late)
+            return {
+                'student_ids': self.student_ids[:self.n_students].copy(),
+                'total': total, 'present': present, 'absent': absent, 'late': late,
+                'attendance_percentage': percentage
+            }
+
+    def subject_rates(self, start=None, end=None):
+        """
+        Present/absent/late counts and attendance percentage per subject
+
+        Returns:
+            list: One dict per subject
+        """
+        with self._lock:
+            status, subjects, _ = self._view(start, end)
+            marked = status != UNMARKED
+            codes = subjects[marked]
+            cells = status[marked]
+            size = len(self.subject_names)
+            present = np.bincount(codes[cells == PRESENT], minlength=size)
+            absent = np.bincount(codes[cells == ABSENT], minlength=size)
+            late = np.bincount(codes[cells == LATE], minlength=size)
+            total, percentage = self._rates(present, absent, late)
+            return [{
+                'subject': name, 'total': int(total[code]), 'present': int(present[code]),
+                'absent': int(absent[code]), 'late': int(late[code]),
+                'attendance_percentage': None if np.isnan(percentage[code]) else float(percentage[code])
+            } for code, name in enumerate(self.subject_names) if total[code]]
+
+    def period_rates(self, start=None, end=None):
+        """
+        Present/absent/late counts and attendance percentage per period
+
+        Returns:
+            list: One dict per period (1-5)
+        """
+        with self._lock:
+            status, _, _ = self._view(start, end)
+            present = np.count_nonzero(status == PRESENT, axis=(0, 1))
+            absent = np.count_nonzero(status == ABSENT, axis=(0, 1))
+            late = np.count_nonzero(status == LATE, axis=(0, 1))
+            total, percentage = self._rates(present, absent, late)
+            return [{
+                'period': period + 1, 'total': int(total[period]), 'present': int(present[period]),
+                'absent': int(absent[period]), 'late': int(late[period]),
+                'attendance_percentage': None if np.isnan(percentage[period]) else float(percentage[period])
+            } for period in range(PERIODS)]
+
+    def weekday_patterns(self, start=None, end=None):
+        """
+        Attendance percentage by day of week
+
+        Returns:
+            list: One dict per weekday that has marks
+        """
+        with self._lock:
+            status, _, days = self._view(start, end)
+            weekdays = (days.astype(np.int64) - TO_DAYS_OFFSET - 1) % 7
+            present = np.bincount(weekdays, weights=np.count_nonzero(status == PRESENT, axis=(0, 2)), minlength=7)
+            absent = np.bincount(weekdays, weights=np.count_nonzero(status == ABSENT, axis=(0, 2)), minlength=7)
+            late = np.bincount(weekdays, weights=np.count_nonzero(status == LATE, axis=(0, 2)), minlength=7)
+            total, percentage = self._rates(present, absent, late)
+            return [{
+                'weekday': WEEKDAY_NAMES[day], 'total': int(total[day]), 'present': int(present[day]),
+                'absent': int(absent[day]), 'late': int(late[day]),
+                'attendance_percentage': float(percentage[day])
+            } for day in range(7) if total[day]]
+
+    def distribution(self, bins=(0, 50, 60, 75, 85, 90, 100), start=None, end=None):
+        """
+        Class-wide distribution of student attendance percentages
+
+        Args:
+            bins (sequence): Histogram bin edges in percent
+
+        Returns:
+            dict: bins, counts, mean, median, and students_below_75
+        """
+        percentage = self.student_percentages(start, end)['attendance_percentage']
+        percentage = percentage[~np.isnan(percentage)]
+        counts, edges = np.histogram(percentage, bins=bins)
+        return {
+            'bins': [float(edge) for edge in edges],
+            'counts': [int(count) for count in counts],
+            'students': int(len(percentage)),
+            'mean': round(float(percentage.mean()), 2) if len(percentage) else None,
+            'median': round(float(np.median(percentage)), 2) if len(percentage) else None,
+            'students_below_75': int(np.count_nonzero(percentage < 75))
+        }
+
+    def analytics(self, start=None, end=None):
+        """
+        Full-class analytics for a date range
+
+        Args:
+            start (date, optional): First day included
+            end (date, optional): Last day included
+
+        Returns:
+            dict: students, subjects, periods, weekdays and distribution sections
+        """
+        started = time.perf_counter()
+        stats = self.student_percentages(start, end)
+        students = [{
+            'student_id': int(student_id), 'total': int(total), 'present': int(present),
+            'absent': int(absent), 'late': int(late),
+            'attendance_percentage': None if np.isnan(percentage) else float(percentage)
+        } for student_id, total, present, absent, late, percentage in zip(
+            stats['student_ids'], stats['total'], stats['present'], stats['absent'],
+            stats['late'], stats['attendance_percentage'])]
+
+        result = {
+            'students': students,
+            'subjects': self.subject_rates(start, end),
+            'periods': self.period_rates(start, end),
+            'weekdays': self.weekday_patterns(start, end),
+            'distribution': self.distribution(start=start, end=end),
+            'school_days': int(len(self._view(start, end)[2])),
+            'watermark': self.watermark.isoformat() if self.watermark else None
+        }
+        result['elapsed_ms'] = round((time.perf_counter() - started) * 1000, 2)
+        return result
+
+
+_cube = None
+_cube_lock = threading.Lock()
+_reload_thread = None
+
+
+def _load_cube(snapshot_path, current=None, stale=False):
+    """
+    Load a cube, from snapshot_path when it holds a newer snapshot than current
+
+    Args:
+        snapshot_path (str): [analytics] snapshot_path, may be empty
+        current (AttendanceCube, optional): Cube being replaced
+        stale (bool): current fell too far behind the change log to be kept
+
+    Returns:
+        AttendanceCube or None: New cube, or None when current is kept
+            because there is no newer snapshot and it can still catch up
+    """
+    if snapshot_path and os.path.exists(snapshot_path):
+        from cube_snapshot import SnapshotError, load_snapshot
+        mtime = os.path.getmtime(snapshot_path)
+        if current is None or current.snapshot_mtime is None or mtime > current.snapshot_mtime:
+            try:
+                cube = load_snapshot(snapshot_path)
+                cube.snapshot_mtime = mtime
+                return cube
+            except SnapshotError as e:
+                logger.warning(f"Ignoring attendance cube snapshot: {e}")
+        elif current.changes is not None and not stale:
+            # Deletes and bulk loads arrive with the next snapshot-cube run
+            return None
+    return AttendanceCube.from_database()
+
+
+def _reload(snapshot_path, current, stale):
+    global _cube, _reload_thread
+    try:
+        cube = _load_cube(snapshot_path, current, stale)
+        if cube is not None:
+            with _cube_lock:
+                _cube = cube
+    except Exception as e:
+        logger.error(f"Error reloading the attendance cube: {e}")
+    finally:
+        with _cube_lock:
+            _reload_thread = None
+
+
+def get_attendance_cube():
+    """
+    Get this process's attendance cube, loading or refreshing it as needed
+
+    [analytics] refresh_seconds (default 30) controls how often changes are
+    pulled in; reload_seconds (default 3600) how often it is rebuilt to pick
+    up deletes and bulk loads (and, without the change log, corrections of
+    existing rows). When snapshot_path names a snapshot written by
+    `manage.py snapshot-cube`, loads map it and catch up from the change
+    log instead of scanning the whole table, and reloads only happen once
+    a newer snapshot has been written. Reloads run in the background while
+    the current cube keeps serving.
+
+    Returns:
+        AttendanceCube: Up-to-date cube
+    """
+    global _cube, _reload_thread
+
+    config = DatabaseConfig.read_config()
+    refresh_seconds = config.getfloat('analytics', 'refresh_seconds', fallback=30)
+    reload_seconds = config.getfloat('analytics', 'reload_seconds', fallback=3600)
+    retention_seconds = change_log_settings()['retention_seconds']
+    snapshot_path = config.get('analytics', 'snapshot_path', fallback='')
+
+    with _cube_lock:
+        if _cube is None:
+            _cube = _load_cube(snapshot_path)
+            return _cube
+
+        now = time.time()
+        # A cube idle for longer than the change log is kept cannot catch up reliably
+        stale = _cube.changes is not None and _cube.changes.behind(retention_seconds)
+        if ((stale or now - _cube.loaded_at >= reload_seconds)
+                and (_reload_thread is None or not _reload_thread.is_alive())):
+            # Not retried before reload_seconds even if it fails
+            _cube.loaded_at = now
+            _reload_thread = threading.Thread(target=_reload, args=(snapshot_path, _cube, stale),
+                                              name='attendance-cube-reload', daemon=True)
+            _reload_thread.start()
+        if now - _cube.refreshed_at >= refresh_seconds:
+            _cube.refresh()
+            _cube.refreshed_at = now
+        return _cube
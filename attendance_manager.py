@@ -3,11 +3,20 @@ Attendance Management Module
 Handles all attendance-related operations
 """
 
+import json
 from datetime import date, datetime
-from mysql.connector import Error
+from mysql.connector import Error, errorcode
 from db_config import get_db_connection
+from attendance_stats import AttendanceStats
+from cache import student_label, student_names
+from attendance_archive import archived_ranges, history_source, is_archived_term_error
+from live_feed import publish_marks
+from pagination import DEFAULT_PAGE_SIZE, decode_cursor, split_page
 from logger_config import logger
 
+# Per-mark messages; sample with [logging] sample_rates
+marks_logger = logger.getChild('marks')
+
 class AttendanceManager:
     """Manages attendance records and operations"""
     
@@ -23,6 +32,26 @@ class AttendanceManager:
         5: ("13:30", "15:10")
     }
     
+    # Rows per multi-row INSERT in mark_attendance_batch
+    BATCH_CHUNK_SIZE = 500
+    
+    # Column limits of the attendance table (subject VARCHAR(100), INT ids)
+    SUBJECT_MAX_LENGTH = 100
+    MAX_ID = 2147483647
+    
+    OUTCOME_INSERTED = 'inserted'
+    OUTCOME_UPDATED = 'updated'
+    OUTCOME_UNCHANGED = 'unchanged'
+    
+    UPSERT_QUERY = """
+        INSERT INTO attendance (student_id, faculty_id, subject, date, period, status)
+        VALUES (%s, %s, %s, %s, %s, %s)
+        ON DUPLICATE KEY UPDATE
+            faculty_id = VALUES(faculty_id),
+            subject = VALUES(subject),
+            status = VALUES(status)
+    """
+    
     @staticmethod
     def validate_status(status):
         """
@@ -37,7 +66,7 @@ class AttendanceManager:
         return status in AttendanceManager.VALID_STATUSES
     
     @staticmethod
-    def mark_attendance(student_id, faculty_id, subject, attendance_date=None, period=1, status='Present'):
+    def mark_attendance(student_id, faculty_id, subject, attendance_date=None, period=1, status='Present', upsert=True):
         """
         Mark attendance for a student
         
@@ -48,6 +77,8 @@ class AttendanceManager:
             attendance_date (str/date, optional): Date (defaults to today)
             period (int): Period number (1-5)
             status (str): Attendance status (Present/Absent/Late)
+            upsert (bool): Write with a single INSERT ... ON DUPLICATE KEY UPDATE
+                instead of check-then-write (message says "marked" or "updated")
             
         Returns:
             tuple: (success: bool, message: str)
@@ -71,6 +102,10 @@ class AttendanceManager:
                 logger.warning(f"Invalid date format: {attendance_date}")
                 return (False, "Invalid date format. Use YYYY-MM-DD")
         
+        if upsert:
+            return AttendanceManager._mark_attendance_upsert(
+                student_id, faculty_id, subject, attendance_date, period, status)
+        
         try:
             conn = get_db_connection()
             cursor = conn.cursor()
@@ -104,56 +139,379 @@ class AttendanceManager:
                 message = f"Attendance marked for {student_name} (Period {period})"
             
             conn.commit()
-            logger.info(f"{message}: {status}")
+            marks_logger.info(f"{message}: {status}")
             
             cursor.close()
             conn.close()
             
+            publish_marks([{'student_id': student_id, 'faculty_id': faculty_id, 'subject': subject,
+                            'date': attendance_date, 'period': period, 'status': status}])
+            
             return (True, message)
             
+        except Error as e:
+            if is_archived_term_error(e):
+                return (False, AttendanceManager.archived_message(attendance_date))
+            logger.error(f"Database error while marking attendance: {e}")
+            return (False, f"Database error: {e}")
+        except Exception as e:
+            logger.error(f"Unexpected error while marking attendance: {e}")
+            return (False, f"Unexpected error: {e}")
+    
+    @staticmethod
+    def _mark_attendance_upsert(student_id, faculty_id, subject, attendance_date, period, status):
+        """
+        Mark attendance with a single INSERT ... ON DUPLICATE KEY UPDATE
+        
+        Relies on unique_attendance (student_id, date, period), so concurrent
+        submissions for the same period cannot race into duplicate-key errors.
+        
+        Returns:
+            tuple: (success: bool, message: str)
+        """
+        try:
+            conn = get_db_connection()
+            cursor = conn.cursor()
+            
+            try:
+                cursor.execute(AttendanceManager.UPSERT_QUERY,
+                               (student_id, faculty_id, subject, attendance_date, period, status))
+                outcome = AttendanceManager.upsert_outcome(cursor.rowcount)
+                conn.commit()
+            except Error as e:
+                conn.rollback()
+                if AttendanceManager.is_missing_student_error(e):
+                    logger.warning(f"Attempted to mark attendance for non-existent student ID: {student_id}")
+                    return (False, f"Student with ID {student_id} not found")
+                if is_archived_term_error(e):
+                    return (False, AttendanceManager.archived_message(attendance_date))
+                raise
+            finally:
+                cursor.close()
+                conn.close()
+            
         except Error as e:
             logger.error(f"Database error while marking attendance: {e}")
             return (False, f"Database error: {e}")
         except Exception as e:
             logger.error(f"Unexpected error while marking attendance: {e}")
             return (False, f"Unexpected error: {e}")
+        
+        # The mark is committed: nothing below may report it as failed
+        if outcome != AttendanceManager.OUTCOME_UNCHANGED:
+            publish_marks([{'student_id': student_id, 'faculty_id': faculty_id, 'subject': subject,
+                            'date': attendance_date, 'period': period, 'status': status}])
+        
+        # Named from the roster cache, so the write stays a single statement
+        student_name = student_label(student_id)
+        if outcome == AttendanceManager.OUTCOME_INSERTED:
+            message = f"Attendance marked for {student_name} (Period {period})"
+        else:
+            message = f"Attendance updated for {student_name} (Period {period})"
+        marks_logger.info(f"{message}: {status}")
+        
+        return (True, message)
     
     @staticmethod
-    def mark_bulk_attendance(attendance_list):
+    def upsert_outcome(rowcount):
+        """
+        Translate the affected-rows count of an upsert into its outcome
+        
+        MySQL reports 1 for a new row, 2 for an updated row and 0 when the
+        existing row already held the same values.
+        
+        Args:
+            rowcount (int): cursor.rowcount after UPSERT_QUERY
+            
+        Returns:
+            str: OUTCOME_INSERTED, OUTCOME_UPDATED or OUTCOME_UNCHANGED
+        """
+        if rowcount == 1:
+            return AttendanceManager.OUTCOME_INSERTED
+        if rowcount == 0:
+            return AttendanceManager.OUTCOME_UNCHANGED
+        return AttendanceManager.OUTCOME_UPDATED
+    
+    @staticmethod
+    def is_missing_student_error(error):
+        """
+        Check whether a database error is the student_id foreign key violation
+        
+        Args:
+            error (mysql.connector.Error): Error raised by an attendance write
+            
+        Returns:
+            bool: True if the referenced student does not exist
+        """
+        return (getattr(error, 'errno', None) == errorcode.ER_NO_REFERENCED_ROW_2
+                and 'student_id' in str(error))
+    
+    @staticmethod
+    def archived_message(attendance_date):
+        """Failure message for a mark dated inside an archived term"""
+        return f"Attendance for {attendance_date} belongs to an archived term and cannot be changed"
+    
+    @staticmethod
+    def mark_bulk_attendance(attendance_list, faculty_id=None, subject=None, period=1):
         """
         Mark attendance for multiple students
         
         Args:
             attendance_list (list): List of tuples [(student_id, date, status), ...]
+            faculty_id (int): Faculty ID applied to every record
+            subject (str): Subject name applied to every record
+            period (int): Period number (1-5) applied to every record
             
         Returns:
             tuple: (success_count: int, failed_count: int, messages: list)
         """
-        success_count = 0
-        failed_count = 0
-        messages = []
-        
+        records = []
         for attendance in attendance_list:
             if len(attendance) < 2:
-                failed_count += 1
-                messages.append(f"Invalid attendance data format: {attendance}")
+                # Passed through so the engine reports it in position
+                records.append(attendance)
                 continue
             
-            student_id = attendance[0]
-            attendance_date = attendance[1] if len(attendance) > 1 else None
-            status = attendance[2] if len(attendance) > 2 else 'Present'
+            records.append({
+                'student_id': attendance[0],
+                'faculty_id': faculty_id,
+                'subject': subject,
+                'date': attendance[1],
+                'period': period,
+                'status': attendance[2] if len(attendance) > 2 else 'Present'
+            })
+        
+        success_count, failed_count, results = AttendanceManager.mark_attendance_batch(records)
+        messages = [result['message'] for result in results]
+        
+        return (success_count, failed_count, messages)
+    
+    @staticmethod
+    def validate_batch_record(record):
+        """
+        Validate and normalize one batch record
+        
+        Args:
+            record (dict): Record with student_id, faculty_id, subject, date, period, status
             
-            success, message = AttendanceManager.mark_attendance(student_id, attendance_date, status)
+        Returns:
+            tuple: (normalized record or None, error message or None)
+        """
+        if not isinstance(record, dict):
+            return (None, f"Invalid attendance data format: {record}")
+        
+        try:
+            student_id = int(record.get('student_id'))
+        except (TypeError, ValueError):
+            student_id = None
+        if student_id is None or not 0 < student_id <= AttendanceManager.MAX_ID:
+            return (None, f"Invalid student ID: {record.get('student_id')}")
+        
+        try:
+            faculty_id = int(record.get('faculty_id'))
+        except (TypeError, ValueError):
+            faculty_id = None
+        if faculty_id is None or not 0 < faculty_id <= AttendanceManager.MAX_ID:
+            return (None, f"Invalid faculty ID: {record.get('faculty_id')}")
+        
+        subject = record.get('subject')
+        if not subject or not str(subject).strip():
+            return (None, "Subject cannot be empty")
+        if len(str(subject).strip()) > AttendanceManager.SUBJECT_MAX_LENGTH:
+            return (None, f"Subject must be at most {AttendanceManager.SUBJECT_MAX_LENGTH} characters")
+        
+        status = record.get('status', 'Present')
+        if not AttendanceManager.validate_status(status):
+            return (None, f"Invalid status. Must be one of: {', '.join(AttendanceManager.VALID_STATUSES)}")
+        
+        try:
+            period = int(record.get('period', 1))
+        except (TypeError, ValueError):
+            period = None
+        if period not in range(1, 6):
+            return (None, "Invalid period. Must be between 1 and 5")
+        
+        attendance_date = record.get('date')
+        if attendance_date is None:
+            attendance_date = date.today()
+        elif isinstance(attendance_date, str):
+            try:
+                attendance_date = datetime.strptime(attendance_date, '%Y-%m-%d').date()
+            except ValueError:
+                return (None, "Invalid date format. Use YYYY-MM-DD")
+        elif isinstance(attendance_date, datetime):
+            attendance_date = attendance_date.date()
+        elif not isinstance(attendance_date, date):
+            return (None, "Invalid date format. Use YYYY-MM-DD")
+        if attendance_date.year < 1000:
+            # Below the range of MySQL's DATE type
+            return (None, "Invalid date. Year must be 1000 or later")
+        
+        return ({
+            'student_id': student_id,
+            'faculty_id': faculty_id,
+            'subject': str(subject).strip(),
+            'date': attendance_date,
+            'period': period,
+            'status': status
+        }, None)
+    
+    @staticmethod
+    def _fetch_existing_ids(cursor, table, ids, chunk_size):
+        """Return the subset of ids present in table, one IN query per chunk"""
+        ids = list(ids)
+        found = set()
+        for start in range(0, len(ids), chunk_size):
+            chunk = ids[start:start + chunk_size]
+            placeholders = ', '.join(['%s'] * len(chunk))
+            cursor.execute(f"SELECT id FROM {table} WHERE id IN ({placeholders})", tuple(chunk))
+            found.update(row[0] for row in cursor.fetchall())
+        return found
+    
+    @staticmethod
+    def _fetch_existing_keys(cursor, rows):
+        """Return the (student_id, date, period) keys of rows that already exist"""
+        student_ids = sorted({row['student_id'] for row in rows})
+        dates = sorted({row['date'] for row in rows})
+        periods = sorted({row['period'] for row in rows})
+        
+        query = f"""
+            SELECT student_id, date, period FROM attendance
+            WHERE student_id IN ({', '.join(['%s'] * len(student_ids))})
+              AND date IN ({', '.join(['%s'] * len(dates))})
+              AND period IN ({', '.join(['%s'] * len(periods))})
+        """
+        cursor.execute(query, tuple(student_ids) + tuple(dates) + tuple(periods))
+        return {(row[0], row[1], row[2]) for row in cursor.fetchall()}
+    
+    @staticmethod
+    def _upsert_rows(cursor, rows):
+        """Write rows with one multi-row INSERT ... ON DUPLICATE KEY UPDATE"""
+        values = ', '.join(['(%s, %s, %s, %s, %s, %s)'] * len(rows))
+        query = f"""
+            INSERT INTO attendance (student_id, faculty_id, subject, date, period, status)
+            VALUES {values}
+            ON DUPLICATE KEY UPDATE
+                faculty_id = VALUES(faculty_id),
+                subject = VALUES(subject),
+                status = VALUES(status)
+        """
+        params = []
+        for row in rows:
+            params.extend((row['student_id'], row['faculty_id'], row['subject'],
+                           row['date'], row['period'], row['status']))
+        cursor.execute(query, tuple(params))
+    
+    @staticmethod
+    def mark_attendance_batch(records, chunk_size=None, raise_errors=False):
+        """
+        Mark a batch of attendance records in one transaction
+        
+        The whole batch is validated up front, student and faculty IDs are
+        checked with one IN query each, and valid rows are written with
+        multi-row upserts of chunk_size rows. Either every valid row is
+        committed or none is.
+        
+        Args:
+            records (list): List of dicts with student_id, faculty_id, subject,
+                date, period and status
+            chunk_size (int, optional): Rows per statement (defaults to BATCH_CHUNK_SIZE)
+            raise_errors (bool): Re-raise database errors instead of failing
+                every valid row, so callers can retry the batch
             
-            if success:
-                success_count += 1
+        Returns:
+            tuple: (success_count: int, failed_count: int, results: list) where
+                results[i] is {'student_id', 'success', 'outcome', 'message'}
+                for records[i]
+        """
+        chunk_size = chunk_size or AttendanceManager.BATCH_CHUNK_SIZE
+        results = []
+        valid = []
+        
+        for record in records:
+            row, error = AttendanceManager.validate_batch_record(record)
+            student_id = record.get('student_id') if isinstance(record, dict) else None
+            if error:
+                results.append({'student_id': student_id, 'success': False,
+                                'outcome': None, 'message': error})
             else:
-                failed_count += 1
-            
-            messages.append(message)
+                results.append({'student_id': row['student_id'], 'success': True,
+                                'outcome': None, 'message': None})
+                valid.append((len(results) - 1, row))
+        
+        if valid:
+            try:
+                conn = get_db_connection()
+                cursor = conn.cursor()
+                
+                try:
+                    students = AttendanceManager._fetch_existing_ids(
+                        cursor, 'students', {row['student_id'] for _, row in valid}, chunk_size)
+                    faculty = AttendanceManager._fetch_existing_ids(
+                        cursor, 'faculty', {row['faculty_id'] for _, row in valid}, chunk_size)
+                    # One archived mark would fail the whole statement in the trigger
+                    archived = archived_ranges(cursor)
+                    
+                    # Messages name students from the roster cache, as mark_attendance does
+                    names = student_names()
+                    writable = []
+                    for index, row in valid:
+                        if any(start <= row['date'] <= end for start, end in archived):
+                            results[index].update(success=False,
+                                                  message=AttendanceManager.archived_message(row['date']))
+                        elif row['student_id'] not in students:
+                            results[index].update(success=False,
+                                                  message=f"Student with ID {row['student_id']} not found")
+                        elif row['faculty_id'] not in faculty:
+                            results[index].update(success=False,
+                                                  message=f"Faculty with ID {row['faculty_id']} not found")
+                        else:
+                            writable.append((index, row))
+                    
+                    for start in range(0, len(writable), chunk_size):
+                        chunk = writable[start:start + chunk_size]
+                        rows = [row for _, row in chunk]
+                        existing = AttendanceManager._fetch_existing_keys(cursor, rows)
+                        AttendanceManager._upsert_rows(cursor, rows)
+                        
+                        for index, row in chunk:
+                            key = (row['student_id'], row['date'], row['period'])
+                            if key in existing:
+                                outcome = AttendanceManager.OUTCOME_UPDATED
+                                verb = "updated"
+                            else:
+                                outcome = AttendanceManager.OUTCOME_INSERTED
+                                verb = "marked"
+                                # Later duplicates in the same batch update this row
+                                existing.add(key)
+                            student_name = student_label(row['student_id'], names)
+                            results[index].update(
+                                outcome=outcome,
+                                message=f"Attendance {verb} for {student_name} (Period {row['period']})")
+                    
+                    conn.commit()
+                except Error:
+                    conn.rollback()
+                    raise
+                finally:
+                    cursor.close()
+                    conn.close()
+                
+                publish_marks([row for _, row in writable])
+                    
+            except Exception as e:
+                logger.error(f"Database error while marking attendance batch: {e}")
+                if raise_errors:
+                    raise
+                for index, _ in valid:
+                    if results[index]['success']:
+                        results[index].update(success=False, outcome=None, message=f"Database error: {e}")
+        
+        success_count = sum(1 for result in results if result['success'])
+        failed_count = len(results) - success_count
         
         logger.info(f"Bulk attendance marking completed: {success_count} successful, {failed_count} failed")
-        return (success_count, failed_count, messages)
+        return (success_count, failed_count, results)
     
     @staticmethod
     def get_attendance_by_date(attendance_date=None, period=None):
@@ -213,20 +571,20 @@ class AttendanceManager:
     @staticmethod
     def get_student_attendance(student_id):
         """
-        Get attendance history for a specific student
+        Get attendance history for a specific student, including archived terms
         """
         try:
+            source, params = history_source("student_id = %s", (student_id,))
             conn = get_db_connection()
             cursor = conn.cursor(dictionary=True)
             
-            query = """
-                SELECT a.id, a.date, a.period, a.subject, f.name as faculty_name, a.status, a.created_at
-                FROM attendance a
-                JOIN faculty f ON a.faculty_id = f.id
-                WHERE a.student_id = %s
-                ORDER BY a.date DESC, a.period DESC
+            query = f"""
+                SELECT h.id, h.date, h.period, h.subject, f.name as faculty_name, h.status, h.created_at
+                FROM {source}
+                JOIN faculty f ON h.faculty_id = f.id
+                ORDER BY h.date DESC, h.period DESC
             """
-            cursor.execute(query, (student_id,))
+            cursor.execute(query, params)
             records = cursor.fetchall()
             
             cursor.close()
@@ -239,102 +597,149 @@ class AttendanceManager:
             return []
     
     @staticmethod
-    def get_attendance_summary(student_id):
+    def get_student_attendance_page(student_id, limit=DEFAULT_PAGE_SIZE, after=None):
         """
-        Get attendance summary/statistics for a student
+        Get one page of a student's attendance history, newest first
+        
+        Keyset pagination on (date, period) walks unique_attendance
+        (student_id, date, period) backwards from the cursor, and the
+        archive's primary key the same way.
+        
+        Args:
+            student_id (int): Student ID
+            limit (int): Page size
+            after (str, optional): Cursor returned with the previous page
+            
+        Returns:
+            tuple: (records: list, next_cursor: str or None)
+            
+        Raises:
+            InvalidCursorError: If after is not a valid cursor
         """
+        where = "student_id = %s"
+        params = [student_id]
+        
+        if after:
+            last_date, last_period = decode_cursor(after, 2)
+            where += " AND (date < %s OR (date = %s AND period < %s))"
+            params.extend([last_date, last_date, last_period])
+        params.append(limit + 1)
+        
         try:
-            conn = get_db_connection()
-            cursor = conn.cursor()
-            
-            # Total classes conduct across all periods recorded for this student
-            cursor.execute("SELECT COUNT(*) FROM attendance WHERE student_id = %s", (student_id,))
-            total = cursor.fetchone()[0]
+            # Each table returns its own first limit + 1 rows; the outer query merges them
+            source, params = history_source(where, params, "ORDER BY date DESC, period DESC LIMIT %s")
+            query = f"""
+                SELECT h.id, h.date, h.period, h.subject, f.name as faculty_name, h.status, h.created_at
+                FROM {source}
+                JOIN faculty f ON h.faculty_id = f.id
+                ORDER BY h.date DESC, h.period DESC LIMIT %s
+            """
+            params += (limit + 1,)
             
-            # Get status counts
-            cursor.execute("""
-                SELECT status, COUNT(*) as count 
-                FROM attendance 
-                WHERE student_id = %s 
-                GROUP BY status
-            """, (student_id,))
+            conn = get_db_connection()
+            cursor = conn.cursor(dictionary=True)
             
-            status_counts = {row[0]: row[1] for row in cursor.fetchall()}
+            cursor.execute(query, tuple(params))
+            records = cursor.fetchall()
             
             cursor.close()
             conn.close()
             
-            present_count = status_counts.get('Present', 0)
-            absent_count = status_counts.get('Absent', 0)
-            late_count = status_counts.get('Late', 0)
-            
-            percentage = (present_count / total * 100) if total > 0 else 0
-            
-            summary = {
-                'total': total,
-                'present': present_count,
-                'absent': absent_count,
-                'late': late_count,
-                'attendance_percentage': round(percentage, 2)
-            }
-            
-            return summary
+            return split_page(records, limit, lambda record: [record['date'], record['period']])
             
         except Error as e:
-            logger.error(f"Database error while generating attendance summary: {e}")
-            return {'total': 0, 'present': 0, 'absent': 0, 'late': 0, 'attendance_percentage': 0}
-
+            logger.error(f"Database error while retrieving student attendance page: {e}")
+            return ([], None)
+    
+    @staticmethod
+    def get_attendance_summary(student_id):
+        """
+        Get attendance summary/statistics for a student
+        
+        Reads the counters maintained in student_attendance_stats rather
+        than scanning the student's attendance rows.
+        """
+        return AttendanceStats.get_student_summary(student_id)
+    
     @staticmethod
     def get_daily_analysis(report_date=None):
         """
         Get daily attendance analysis for all periods
+        
+        The period summary is read from daily_period_rollup. Analyses of
+        past dates are stored in daily_report_cache and served from there
+        until a write to that date (or to the roster) invalidates them.
         """
         if report_date is None:
             report_date = date.today()
         elif isinstance(report_date, str):
             report_date = datetime.strptime(report_date, '%Y-%m-%d').date()
+        
+        is_past = report_date < date.today()
             
         try:
             conn = get_db_connection()
             cursor = conn.cursor(dictionary=True)
             
-            # Get period-wise summary
-            query = """
-                SELECT period, 
-                       COUNT(CASE WHEN status = 'Present' THEN 1 END) as present,
-                       COUNT(CASE WHEN status = 'Absent' THEN 1 END) as absent,
-                       COUNT(CASE WHEN status = 'Late' THEN 1 END) as late
-                FROM attendance 
-                WHERE date = %s
-                GROUP BY period
-                ORDER BY period
-            """
-            cursor.execute(query, (report_date,))
-            period_summary = cursor.fetchall()
-            
-            # Get student-wise summary for the day
-            query = """
-                SELECT s.name, s.reg_no,
-                       COUNT(CASE WHEN a.status = 'Present' THEN 1 END) as present,
-                       COUNT(CASE WHEN a.status = 'Absent' THEN 1 END) as absent,
-                       COUNT(CASE WHEN a.status = 'Late' THEN 1 END) as late,
-                       GROUP_CONCAT(CONCAT(a.period, ':', a.status) ORDER BY a.period) as period_details
-                FROM students s
-                LEFT JOIN attendance a ON s.id = a.student_id AND a.date = %s
-                GROUP BY s.id, s.name, s.reg_no
-                ORDER BY s.name
-            """
-            cursor.execute(query, (report_date,))
-            student_daily = cursor.fetchall()
-            
-            cursor.close()
-            conn.close()
-            
-            return {
-                'date': str(report_date),
-                'period_summary': period_summary,
-                'student_daily': student_daily
-            }
+            try:
+                if is_past:
+                    cursor.execute("SELECT payload FROM daily_report_cache WHERE date = %s", (report_date,))
+                    cached = cursor.fetchone()
+                    if cached and cached['payload']:
+                        return json.loads(cached['payload'])
+                    
+                    # Claim the slot before reading: a write to this date
+                    # committed from here on deletes the placeholder (see the
+                    # daily_report_cache triggers), so a stale analysis is
+                    # never stored and the reads below need no locks
+                    cursor.execute("INSERT IGNORE INTO daily_report_cache (date, payload) VALUES (%s, '')",
+                                   (report_date,))
+                    conn.commit()
+                
+                # Get period-wise summary
+                query = """
+                    SELECT period,
+                           CAST(SUM(present) AS SIGNED) as present,
+                           CAST(SUM(absent) AS SIGNED) as absent,
+                           CAST(SUM(late) AS SIGNED) as late
+                    FROM daily_period_rollup
+                    WHERE date = %s
+                    GROUP BY period
+                    ORDER BY period
+                """
+                cursor.execute(query, (report_date,))
+                period_summary = cursor.fetchall()
+                
+                # Get student-wise summary for the day
+                query = """
+                    SELECT s.name, s.reg_no,
+                           COUNT(CASE WHEN a.status = 'Present' THEN 1 END) as present,
+                           COUNT(CASE WHEN a.status = 'Absent' THEN 1 END) as absent,
+                           COUNT(CASE WHEN a.status = 'Late' THEN 1 END) as late,
+                           GROUP_CONCAT(CONCAT(a.period, ':', a.status) ORDER BY a.period) as period_details
+                    FROM students s
+                    LEFT JOIN attendance a ON s.id = a.student_id AND a.date = %s
+                    GROUP BY s.id, s.name, s.reg_no
+                    ORDER BY s.name
+                """
+                cursor.execute(query, (report_date,))
+                student_daily = cursor.fetchall()
+                
+                analysis = {
+                    'date': str(report_date),
+                    'period_summary': period_summary,
+                    'student_daily': student_daily
+                }
+                
+                if is_past:
+                    cursor.execute("UPDATE daily_report_cache SET payload = %s WHERE date = %s AND payload = ''",
+                                   (json.dumps(analysis), report_date))
+                    conn.commit()
+                
+                return analysis
+            finally:
+                cursor.close()
+                conn.close()
         except Exception as e:
             logger.error(f"Error in get_daily_analysis: {e}")
             return None
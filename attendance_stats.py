@@ -0,0 +1,276 @@
+"""
+Attendance Statistics Module
+Reads and rebuilds the incrementally maintained attendance aggregates
+(see aggregates_setup.sql)
+"""
+
+from datetime import date
+from mysql.connector import Error
+from db_config import get_db_connection
+from table_versions import bump_attendance_versions
+from attendance_archive import aggregate_source
+from cache import dashboard_cache
+from logger_config import logger
+
+class AttendanceStats:
+    """Access to the attendance aggregate tables"""
+
+    EMPTY_SUMMARY = {'total': 0, 'present': 0, 'absent': 0, 'late': 0, 'attendance_percentage': 0}
+
+    SUMMARIES_QUERY = """
+        SELECT
+            s.id,
+            s.reg_no,
+            s.name,
+            COALESCE(st.present, 0) as total_present,
+            COALESCE(st.absent, 0) as total_absent,
+            COALESCE(st.late, 0) as total_late,
+            COALESCE(st.total, 0) as total_classes
+        FROM students s
+        LEFT JOIN student_attendance_stats st ON st.student_id = s.id
+        ORDER BY s.name
+    """
+
+    @staticmethod
+    def _percentage(present, total):
+        return round(present / total * 100, 2) if total else 0
+
+    @staticmethod
+    def get_student_summary(student_id):
+        """
+        Get attendance counters for one student (single primary-key lookup)
+
+        Args:
+            student_id (int): Student ID
+
+        Returns:
+            dict: total, present, absent, late and attendance_percentage
+        """
+        try:
+            conn = get_db_connection()
+            cursor = conn.cursor(dictionary=True)
+
+            cursor.execute("""
+                SELECT total, present, absent, late
+                FROM student_attendance_stats
+                WHERE student_id = %s
+            """, (student_id,))
+            row = cursor.fetchone()
+
+            cursor.close()
+            conn.close()
+
+            if not row:
+                return dict(AttendanceStats.EMPTY_SUMMARY)
+
+            row['attendance_percentage'] = AttendanceStats._percentage(row['present'], row['total'])
+            return row
+
+        except Error as e:
+            logger.error(f"Database error while reading attendance stats: {e}")
+            return dict(AttendanceStats.EMPTY_SUMMARY)
+
+    @staticmethod
+    def with_percentage(row):
+        """Add attendance_percentage to a SUMMARIES_QUERY row"""
+        row['attendance_percentage'] = (
+            AttendanceStats._percentage(row['total_present'], row['total_classes'])
+            if row['total_classes'] else None)
+        return row
+
+    @staticmethod
+    def get_all_summaries():
+        """
+        Get attendance counters for every student
+
+        Returns:
+            list: Rows with id, reg_no, name, total_present, total_absent,
+                total_late, total_classes and attendance_percentage
+        """
+        conn = get_db_connection()
+        cursor = conn.cursor(dictionary=True)
+        try:
+            cursor.execute(AttendanceStats.SUMMARIES_QUERY)
+            rows = cursor.fetchall()
+        finally:
+            cursor.close()
+            conn.close()
+
+        return [AttendanceStats.with_percentage(row) for row in rows]
+
+    @staticmethod
+    def get_dashboard_counters(day=None):
+        """
+        Get the home page counters for a day
+
+        Reads the maintained table_counts and daily_period_rollup rows, so
+        the cost does not grow with students or marks. Results are cached
+        for [cache] dashboard_ttl seconds.
+
+        Args:
+            day (date, optional): Day to count (defaults to today)
+
+        Returns:
+            dict: total_students, today_marked, today_present, today_absent,
+                today_late and periods_completed
+        """
+        day = day or date.today()
+
+        def load():
+            conn = get_db_connection()
+            cursor = conn.cursor(dictionary=True)
+            try:
+                cursor.execute("""
+                    SELECT
+                        (SELECT row_count FROM table_counts WHERE name = 'students') AS total_students,
+                        CAST(COALESCE(SUM(present), 0) AS SIGNED) AS today_present,
+                        CAST(COALESCE(SUM(absent), 0) AS SIGNED) AS today_absent,
+                        CAST(COALESCE(SUM(late), 0) AS SIGNED) AS today_late,
+                        COUNT(DISTINCT CASE WHEN present + absent + late > 0 THEN period END) AS periods_completed
+                    FROM daily_period_rollup
+                    WHERE date = %s
+                """, (day,))
+                row = cursor.fetchone()
+            finally:
+                cursor.close()
+                conn.close()
+
+            row['total_students'] = int(row['total_students'] or 0)
+            row['today_marked'] = row['today_present'] + row['today_absent'] + row['today_late']
+            return row
+
+        return dict(dashboard_cache.get_or_load(('counters', day), load))
+
+    @staticmethod
+    def get_summaries(student_ids):
+        """
+        Get attendance counters for the given students
+
+        Args:
+            student_ids (iterable): Student IDs
+
+        Returns:
+            list: Rows shaped like get_all_summaries()
+        """
+        student_ids = sorted(set(student_ids))
+        if not student_ids:
+            return []
+
+        conn = get_db_connection()
+        cursor = conn.cursor(dictionary=True)
+        try:
+            cursor.execute(f"""
+                SELECT
+                    s.id,
+                    s.reg_no,
+                    s.name,
+                    COALESCE(st.present, 0) as total_present,
+                    COALESCE(st.absent, 0) as total_absent,
+                    COALESCE(st.late, 0) as total_late,
+                    COALESCE(st.total, 0) as total_classes
+                FROM students s
+                LEFT JOIN student_attendance_stats st ON st.student_id = s.id
+                WHERE s.id IN ({', '.join(['%s'] * len(student_ids))})
+            """, tuple(student_ids))
+            rows = cursor.fetchall()
+        finally:
+            cursor.close()
+            conn.close()
+
+        return [AttendanceStats.with_percentage(row) for row in rows]
+
+    @staticmethod
+    def _rebuild_table(cursor, table, key_columns, value_columns, fresh_query, verify_only):
+        """
+        Replace an aggregate table with freshly computed rows
+
+        Returns:
+            dict: rows (recomputed row count) and mismatched (rows whose
+                stored counters differed from the recomputed ones)
+        """
+        key_size = len(key_columns)
+        cursor.execute(fresh_query)
+        fresh = {tuple(row[:key_size]): tuple(int(value) for value in row[key_size:])
+                 for row in cursor.fetchall()}
+
+        columns = key_columns + value_columns
+        cursor.execute(f"SELECT {', '.join(columns)} FROM {table} FOR UPDATE")
+        stored = {tuple(row[:key_size]): tuple(row[key_size:]) for row in cursor.fetchall()}
+
+        mismatched = sum(1 for key in fresh.keys() | stored.keys()
+                         if fresh.get(key) != stored.get(key))
+
+        if not verify_only:
+            cursor.execute(f"DELETE FROM {table}")
+            rows = [key + counters for key, counters in fresh.items()]
+            query = (f"INSERT INTO {table} ({', '.join(columns)}) "
+                     f"VALUES ({', '.join(['%s'] * len(columns))})")
+            for start in range(0, len(rows), 1000):
+                cursor.executemany(query, rows[start:start + 1000])
+
+        return {'rows': len(fresh), 'mismatched': mismatched}
+
+    @staticmethod
+    def rebuild(verify_only=False):
+        """
+        Recompute the attendance aggregate tables from the attendance table
+        and its archive
+
+        Rebuilds student_attendance_stats, daily_period_rollup and
+        table_counts, and clears daily_report_cache. Attendance rows are
+        share-locked for the duration, so marks written concurrently wait
+        for the rebuild instead of being lost.
+
+        Args:
+            verify_only (bool): Only report drift, leave the tables unchanged
+
+        Returns:
+            dict: Per-table {'rows', 'mismatched'} results
+        """
+        source = aggregate_source()
+        conn = get_db_connection()
+        cursor = conn.cursor()
+        try:
+            results = {
+                'student_attendance_stats': AttendanceStats._rebuild_table(
+                    cursor, 'student_attendance_stats',
+                    ['student_id'], ['total', 'present', 'absent', 'late'],
+                    f"""
+                    SELECT student_id, COUNT(*),
+                           SUM(status = 'Present'), SUM(status = 'Absent'), SUM(status = 'Late')
+                    FROM {source}
+                    GROUP BY student_id
+                    """, verify_only),
+                'daily_period_rollup': AttendanceStats._rebuild_table(
+                    cursor, 'daily_period_rollup',
+                    ['date', 'period', 'subject', 'faculty_id'], ['present', 'absent', 'late'],
+                    f"""
+                    SELECT date, period, subject, faculty_id,
+                           SUM(status = 'Present'), SUM(status = 'Absent'), SUM(status = 'Late')
+                    FROM {source}
+                    GROUP BY date, period, subject, faculty_id
+                    """, verify_only),
+                'table_counts': AttendanceStats._rebuild_table(
+                    cursor, 'table_counts', ['name'], ['row_count'],
+                    """
+                    SELECT 'students', COUNT(*) FROM students LOCK IN SHARE MODE
+                    """, verify_only),
+            }
+
+            if not verify_only:
+                cursor.execute("DELETE FROM daily_report_cache")
+                # Cached responses built from the old counters are stale now
+                bump_attendance_versions(cursor)
+
+            conn.commit()
+        except Error:
+            conn.rollback()
+            raise
+        finally:
+            cursor.close()
+            conn.close()
+
+        action = "Verified" if verify_only else "Rebuilt"
+        for table, result in results.items():
+            logger.info(f"{action} {table}: {result['rows']} rows, {result['mismatched']} mismatched")
+        return results
@@ -0,0 +1,521 @@
+"""
+Benchmark Module
+Reproducible load test of the attendance APIs
+
+Virtual faculty members post whole classes to /api/attendance/mark_bulk
+(and single students to /api/attendance/mark) while dashboard readers poll
+/api/reports/daily/<date> and /api/attendance/analytics. Throughput and
+p50/p95/p99 latency are reported per endpoint and saved as JSON, and a
+previous result can be compared against for regressions.
+
+By default app.py and api_server.py are started in this process on free
+ports against the database named by ATTENDANCE_CONFIG, which should be a
+scratch copy since the run writes attendance; running against config.ini
+needs --i-know. Marks on the benchmark's dates are deleted afterwards
+and the attendance aggregates rebuilt (deletes do not update them)
+unless --keep-marks is given. Pass --app-url and --api-url to load servers
+that are already running instead.
+
+    python manage.py benchmark --duration 60 --writers 8 --readers 4
+    python manage.py benchmark --compare bench_results/baseline.json
+"""
+
+import http.client
+import json
+import math
+import os
+import platform
+import random
+import socket
+import subprocess
+import threading
+import time
+from datetime import date, datetime, timedelta
+from urllib.parse import urlsplit
+
+STATUS_WEIGHTS = (('Present', 0.85), ('Absent', 0.10), ('Late', 0.05))
+
+# Endpoint names used in results; readers and writers pick from these
+MARK_BULK = 'POST /api/attendance/mark_bulk'
+MARK = 'POST /api/attendance/mark'
+DAILY_REPORT = 'GET /api/reports/daily/<date>'
+ANALYTICS = 'GET /api/attendance/analytics'
+
+
+def percentile(sorted_values, fraction):
+    """Nearest-rank percentile of an already sorted list"""
+    if not sorted_values:
+        return None
+    index = max(0, min(len(sorted_values) - 1, math.ceil(fraction * len(sorted_values)) - 1))
+    return sorted_values[index]
+
+
+class Recorder:
+    """Thread-safe per-endpoint latency and error collection"""
+
+    def __init__(self):
+        self._latencies = {}
+        self._errors = {}
+        self._lock = threading.Lock()
+        self.recording = False
+
+    def record(self, endpoint, seconds, ok):
+        if not self.recording:
+            return
+        with self._lock:
+            self._latencies.setdefault(endpoint, []).append(seconds)
+            if not ok:
+                self._errors[endpoint] = self._errors.get(endpoint, 0) + 1
+
+    def summary(self, duration):
+        """
+        Summarize the measured window
+
+        Returns:
+            dict: endpoint -> requests, errors, throughput_rps and latency
+                percentiles in milliseconds
+        """
+        results = {}
+        with self._lock:
+            items = {endpoint: sorted(values) for endpoint, values in self._latencies.items()}
+            errors = dict(self._errors)
+        for endpoint, values in sorted(items.items()):
+            results[endpoint] = {
+                'requests': len(values),
+                'errors': errors.get(endpoint, 0),
+                'throughput_rps': round(len(values) / duration, 2),
+                'p50_ms': round(percentile(values, 0.50) * 1000, 2),
+                'p95_ms': round(percentile(values, 0.95) * 1000, 2),
+                'p99_ms': round(percentile(values, 0.99) * 1000, 2),
+                'mean_ms': round(sum(values) / len(values) * 1000, 2),
+                'max_ms': round(values[-1] * 1000, 2),
+            }
+        return results
+
+
+class Client:
+    """Keep-alive JSON client for one virtual user"""
+
+    def __init__(self, base_url, timeout=30):
+        parts = urlsplit(base_url)
+        self.host = parts.hostname
+        self.port = parts.port or 80
+        self.prefix = parts.path.rstrip('/')
+        self.timeout = timeout
+        self._connection = None
+
+    def request(self, method, path, body=None):
+        """
+        Send a request and read the whole response
+
+        Returns:
+            tuple: (status: int or None on connection failure, body: bytes)
+        """
+        headers = {'Accept-Encoding': 'gzip'}
+        payload = None
+        if body is not None:
+            payload = json.dumps(body).encode('utf-8')
+            headers['Content-Type'] = 'application/json'
+        for attempt in range(2):
+            if self._connection is None:
+                self._connection = http.client.HTTPConnection(self.host, self.port, timeout=self.timeout)
+            try:
+                if self._connection.sock is None:
+                    self._connection.connect()
+                    # Small requests must not wait on Nagle's algorithm
+                    self._connection.sock.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+                self._connection.request(method, self.prefix + path, payload, headers)
+                response = self._connection.getresponse()
+                data = response.read()
+                if response.will_close:
+                    self._connection.close()
+                    self._connection = None
+                return response.status, data
+            except (OSError, http.client.HTTPException):
+                self._connection.close()
+                self._connection = None
+                if attempt:
+                    return None, b''
+        return None, b''
+
+
+class Benchmark:
+    """One benchmark run"""
+
+    def __init__(self, app_url, api_url, roster, faculty, writers=8, readers=4, duration=30,
+                 warmup=5, class_size=60, single_ratio=0.1, start_date=date(2099, 1, 1),
+                 days=20, seed=42, think_ms=0):
+        """
+        Args:
+            app_url (str): Base URL of app.py (mark_bulk, mark, daily report)
+            api_url (str): Base URL of api_server.py (analytics)
+            roster (list): Student IDs to mark
+            faculty (list): (faculty_id, subject) pairs used by writers
+            writers (int): Concurrent virtual faculty
+            readers (int): Concurrent dashboard readers
+            duration (float): Measured seconds
+            warmup (float): Unmeasured seconds before measuring
+            class_size (int): Students per bulk submission
+            single_ratio (float): Fraction of writer actions that mark one student
+            start_date (date): First school day written to
+            days (int): School days the writers cycle through
+            seed (int): Random seed; the same seed replays the same requests
+            think_ms (float): Pause between one user's requests
+        """
+        self.app_url = app_url
+        self.api_url = api_url
+        self.roster = roster
+        self.faculty = faculty
+        self.writers = writers
+        self.readers = readers
+        self.duration = duration
+        self.warmup = warmup
+        self.class_size = min(class_size, len(roster))
+        self.single_ratio = single_ratio
+        self.dates = [d for d in (start_date + timedelta(days=i) for i in range(days * 2))
+                      if d.weekday() < 5][:days]
+        self.seed = seed
+        self.think = think_ms / 1000
+        self.recorder = Recorder()
+        self._stop = threading.Event()
+
+    def _status(self, rng):
+        value = rng.random()
+        for status, weight in STATUS_WEIGHTS:
+            if value < weight:
+                return status
+            value -= weight
+        return STATUS_WEIGHTS[0][0]
+
+    def _timed(self, client, endpoint, method, path, body=None):
+        started = time.perf_counter()
+        status, data = client.request(method, path, body)
+        elapsed = time.perf_counter() - started
+        ok = status is not None and status < 400
+        if ok and method == 'POST':
+            try:
+                ok = json.loads(data).get('success', True) is not False
+            except ValueError:
+                ok = False
+        self.recorder.record(endpoint, elapsed, ok)
+
+    def _writer(self, index):
+        rng = random.Random(self.seed * 1000 + index)
+        client = Client(self.app_url)
+        faculty_id, subject = self.faculty[index % len(self.faculty)]
+        # Each writer owns its own class section, so writers do not contend on the same rows
+        offset = (index * self.class_size) % max(1, len(self.roster))
+        section = (self.roster[offset:] + self.roster[:offset])[:self.class_size]
+        slot = 0
+        while not self._stop.is_set():
+            day = self.dates[(slot // 5) % len(self.dates)].isoformat()
+            period = slot % 5 + 1
+            slot += 1
+            if rng.random() < self.single_ratio:
+                self._timed(client, MARK, 'POST', '/api/attendance/mark', {
+                    'student_id': rng.choice(section), 'faculty_id': faculty_id, 'subject': subject,
+                    'date': day, 'period': period, 'status': self._status(rng)})
+            else:
+                self._timed(client, MARK_BULK, 'POST', '/api/attendance/mark_bulk', {
+                    'faculty_id': faculty_id, 'subject': subject, 'date': day, 'period': period,
+                    'records': [{'student_id': student_id, 'status': self._status(rng)}
+                                for student_id in section]})
+            if self.think:
+                time.sleep(self.think)
+
+    def _reader(self, index):
+        rng = random.Random(self.seed * 1000 + 500 + index)
+        app_client = Client(self.app_url)
+        api_client = Client(self.api_url)
+        while not self._stop.is_set():
+            if rng.random() < 0.5:
+                day = rng.choice(self.dates).isoformat()
+                self._timed(app_client, DAILY_REPORT, 'GET', f'/api/reports/daily/{day}')
+            else:
+                self._timed(api_client, ANALYTICS, 'GET', '/api/attendance/analytics')
+            if self.think:
+                time.sleep(self.think)
+
+    def run(self):
+        """
+        Run warmup and the measured window
+
+        Returns:
+            dict: Per-endpoint summary (see Recorder.summary)
+        """
+        threads = [threading.Thread(target=self._writer, args=(i,), daemon=True) for i in range(self.writers)]
+        threads += [threading.Thread(target=self._reader, args=(i,), daemon=True) for i in range(self.readers)]
+        for thread in threads:
+            thread.start()
+        time.sleep(self.warmup)
+        self.recorder.recording = True
+        started = time.perf_counter()
+        time.sleep(self.duration)
+        self.recorder.recording = False
+        measured = time.perf_counter() - started
+        self._stop.set()
+        for thread in threads:
+            thread.join(timeout=30)
+        return self.recorder.summary(measured)
+
+
+# ==================== SETUP ====================
+
+def ensure_roster(students, faculty_count):
+    """
+    Make sure the database has at least the requested students and faculty
+
+    Missing students are added as BENCH##### rows through StudentImporter.
+
+    Returns:
+        tuple: (student IDs, [(faculty_id, subject), ...])
+    """
+    from db_config import get_db_connection
+    from faculty_manager import FacultyManager
+    from student_importer import StudentImporter
+
+    conn = get_db_connection()
+    cursor = conn.cursor()
+    try:
+        cursor.execute("SELECT COUNT(*) FROM students")
+        missing = students - cursor.fetchone()[0]
+    finally:
+        cursor.close()
+        conn.close()
+
+    if missing > 0:
+        importer = StudentImporter()
+        importer.import_rows((i, {
+            'reg_no': f"BENCH{i:07d}", 'name': f"Bench Student {i}",
+            'email': f"bench{i}@bench.example", 'phone': f"9{i:09d}"
+        }) for i in range(1, missing + 1))
+
+    for i in range(len(FacultyManager.get_all_faculty()), faculty_count):
+        FacultyManager.add_faculty(f"Bench Faculty {i + 1}", f"Bench Subject {i + 1}")
+
+    conn = get_db_connection()
+    cursor = conn.cursor()
+    try:
+        cursor.execute("SELECT id FROM students ORDER BY id LIMIT %s", (students,))
+        roster = [row[0] for row in cursor.fetchall()]
+        cursor.execute("SELECT id, subject FROM faculty ORDER BY id LIMIT %s", (faculty_count,))
+        faculty = [(row[0], row[1]) for row in cursor.fetchall()]
+    finally:
+        cursor.close()
+        conn.close()
+    return roster, faculty
+
+
+def delete_marks(dates, chunk_size=10000):
+    """
+    Delete the attendance written on the benchmark's dates
+
+    Deleted in chunks, one transaction each, so no lock is held for long.
+    The aggregate tables still count the rows afterwards; see
+    rebuild_aggregates().
+
+    Returns:
+        int: Rows deleted
+    """
+    from db_config import get_db_connection
+
+    if not dates:
+        return 0
+    placeholders = ', '.join(['%s'] * len(dates))
+    deleted = 0
+    conn = get_db_connection()
+    cursor = conn.cursor()
+    try:
+        while True:
+            cursor.execute(f"DELETE FROM attendance WHERE date IN ({placeholders}) LIMIT %s",
+                           (*dates, chunk_size))
+            conn.commit()
+            deleted += cursor.rowcount
+            if cursor.rowcount < chunk_size:
+                break
+    finally:
+        cursor.close()
+        conn.close()
+    return deleted
+
+
+def rebuild_aggregates():
+    """
+    Recompute the aggregate tables after delete_marks()
+
+    Returns:
+        bool: True if rebuilt, False if manage.py rebuild-stats is still needed
+    """
+    from attendance_stats import AttendanceStats
+
+    try:
+        results = AttendanceStats.rebuild()
+    except Exception as e:
+        print(f"✗ Could not rebuild attendance aggregates: {e}")
+        return False
+    for table, result in results.items():
+        print(f"✓ Rebuilt {table}: {result['rows']} rows, {result['mismatched']} corrected")
+    return True
+
+
+def start_servers():
+    """
+    Serve app.py and api_server.py from this process on free ports
+
+    Returns:
+        tuple: (app_url, api_url, shutdown callable)
+    """
+    from werkzeug.serving import make_server
+    import api_server
+    import app as web_app
+
+    servers = [make_server('127.0.0.1', 0, web_app.app, threaded=True),
+               make_server('127.0.0.1', 0, api_server.app, threaded=True)]
+    for server in servers:
+        threading.Thread(target=server.serve_forever, daemon=True).start()
+
+    def shutdown():
+        for server in servers:
+            server.shutdown()
+
+    return (f"http://127.0.0.1:{servers[0].server_port}",
+            f"http://127.0.0.1:{servers[1].server_port}", shutdown)
+
+
+def _git_commit():
+    try:
+        return subprocess.run(['git', 'rev-parse', '--short', 'HEAD'], capture_output=True, text=True,
+                              cwd=os.path.dirname(os.path.abspath(__file__)), timeout=5).stdout.strip() or None
+    except (OSError, subprocess.SubprocessError):
+        return None
+
+
+def compare(current, baseline, tolerance=0.10):
+    """
+    Compare two result documents
+
+    Returns:
+        tuple: (lines: list of str, regressed: bool) where a regression is
+            p95 latency up or throughput down by more than tolerance
+    """
+    lines = []
+    regressed = False
+    for endpoint, now in current['endpoints'].items():
+        before = baseline.get('endpoints', {}).get(endpoint)
+        if not before:
+            lines.append(f"  {endpoint}: no baseline")
+            continue
+        p95_change = (now['p95_ms'] - before['p95_ms']) / before['p95_ms'] if before['p95_ms'] else 0
+        rps_change = ((now['throughput_rps'] - before['throughput_rps']) / before['throughput_rps']
+                      if before['throughput_rps'] else 0)
+        worse = p95_change > tolerance or rps_change < -tolerance
+        regressed = regressed or worse
+        lines.append(f"  {endpoint}: p95 {before['p95_ms']} → {now['p95_ms']} ms ({p95_change:+.0%}), "
+                     f"{before['throughput_rps']} → {now['throughput_rps']} req/s ({rps_change:+.0%})"
+                     f"{'  REGRESSION' if worse else ''}")
+    return lines, regressed
+
+
+# ==================== COMMAND LINE ====================
+
+def add_arguments(parser):
+    """Add the benchmark options to an argparse parser"""
+    parser.add_argument('--duration', type=float, default=30, help="Measured seconds (default: 30)")
+    parser.add_argument('--warmup', type=float, default=5, help="Unmeasured seconds first (default: 5)")
+    parser.add_argument('--writers', type=int, default=8, help="Concurrent virtual faculty (default: 8)")
+    parser.add_argument('--readers', type=int, default=4, help="Concurrent dashboard readers (default: 4)")
+    parser.add_argument('--students', type=int, default=600, help="Students seeded and marked (default: 600)")
+    parser.add_argument('--faculty', type=int, default=5, help="Faculty seeded (default: 5)")
+    parser.add_argument('--class-size', type=int, default=60, help="Students per bulk submission (default: 60)")
+    parser.add_argument('--single-ratio', type=float, default=0.1,
+                        help="Fraction of writes that mark one student (default: 0.1)")
+    parser.add_argument('--start-date', default='2099-01-01', help="First school day written (default: 2099-01-01)")
+    parser.add_argument('--days', type=int, default=20, help="School days cycled through (default: 20)")
+    parser.add_argument('--think-ms', type=float, default=0, help="Pause between a user's requests (default: 0)")
+    parser.add_argument('--seed', type=int, default=42, help="Random seed (default: 42)")
+    parser.add_argument('--app-url', help="Running app.py to load (default: start one in-process)")
+    parser.add_argument('--api-url', help="Running api_server.py to load (default: start one in-process)")
+    parser.add_argument('--output', help="Result file (default: bench_results/<timestamp>.json)")
+    parser.add_argument('--compare', help="Earlier result file to compare against")
+    parser.add_argument('--tolerance', type=float, default=0.10,
+                        help="Allowed p95/throughput change before flagging a regression (default: 0.10)")
+    parser.add_argument('--keep-marks', action='store_true',
+                        help="Keep the attendance written on the benchmark's dates instead of deleting it")
+    parser.add_argument('--i-know', action='store_true',
+                        help="Run against the database in config.ini when ATTENDANCE_CONFIG is not set")
+
+
+def run(args):
+    """
+    Seed, run and report a benchmark
+
+    Returns:
+        int: Exit status (1 if --compare found a regression)
+    """
+    if not os.environ.get('ATTENDANCE_CONFIG') and not args.i_know:
+        raise RuntimeError("The benchmark writes attendance: set ATTENDANCE_CONFIG to a config naming a "
+                           "scratch database, or pass --i-know to use config.ini")
+
+    roster, faculty = ensure_roster(args.students, args.faculty)
+    if not roster or not faculty:
+        raise RuntimeError("Benchmark needs at least one student and one faculty member")
+
+    shutdown = None
+    if args.app_url and args.api_url:
+        app_url, api_url = args.app_url, args.api_url
+    else:
+        app_url, api_url, shutdown = start_servers()
+        app_url = args.app_url or app_url
+        api_url = args.api_url or api_url
+
+    benchmark = Benchmark(
+        app_url, api_url, roster, faculty, writers=args.writers, readers=args.readers,
+        duration=args.duration, warmup=args.warmup, class_size=args.class_size,
+        single_ratio=args.single_ratio, start_date=datetime.strptime(args.start_date, '%Y-%m-%d').date(),
+        days=args.days, seed=args.seed, think_ms=args.think_ms)
+    print(f"Running {args.writers} writers and {args.readers} readers for {args.duration:g}s "
+          f"(+{args.warmup:g}s warmup) against {app_url} and {api_url}")
+    try:
+        endpoints = benchmark.run()
+    finally:
+        if shutdown is not None:
+            shutdown()
+        if not args.keep_marks and benchmark.dates:
+            deleted = delete_marks(benchmark.dates)
+            print(f"✓ Deleted {deleted} benchmark attendance rows ({benchmark.dates[0]} to {benchmark.dates[-1]})")
+            if deleted and not rebuild_aggregates():
+                print("✗ Attendance aggregates still count the deleted rows; run: python manage.py rebuild-stats")
+
+    result = {
+        'meta': {
+            'timestamp': datetime.now().isoformat(timespec='seconds'),
+            'git_commit': _git_commit(),
+            'python': platform.python_version(),
+            'platform': platform.platform(),
+            'cpu_count': os.cpu_count(),
+            'in_process': shutdown is not None,
+            'options': {key: value for key, value in vars(args).items()
+                        if key not in ('handler', 'command', 'output', 'compare', 'i_know', 'keep_marks')},
+        },
+        'endpoints': endpoints,
+    }
+
+    print(f"\n{'ENDPOINT':<34} {'REQS':>7} {'ERR':>5} {'REQ/S':>8} {'P50 ms':>8} {'P95 ms':>8} {'P99 ms':>8}")
+    for endpoint, stats in endpoints.items():
+        print(f"{endpoint:<34} {stats['requests']:>7} {stats['errors']:>5} {stats['throughput_rps']:>8} "
+              f"{stats['p50_ms']:>8} {stats['p95_ms']:>8} {stats['p99_ms']:>8}")
+
+    output = args.output or os.path.join('bench_results', f"{datetime.now():%Y%m%d_%H%M%S}.json")
+    os.makedirs(os.path.dirname(output) or '.', exist_ok=True)
+    with open(output, 'w', encoding='utf-8') as f:
+        json.dump(result, f, indent=2)
+    print(f"\n✓ Results written to {output}")
+
+    if args.compare:
+        with open(args.compare, encoding='utf-8') as f:
+            baseline = json.load(f)
+        lines, regressed = compare(result, baseline, args.tolerance)
+        print(f"\nCompared with {args.compare}:")
+        print('\n'.join(lines))
+        return 1 if regressed else 0
+    return 0
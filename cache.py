@@ -0,0 +1,207 @@
+"""
+Cache Module
+In-process LRU/TTL read cache for rarely changing reference data
+
+Entries are dropped explicitly by the write paths that change the data
+(add_student, the student importer, faculty writes) and otherwise expire
+after their TTL. Invalidation is per process, so with several workers the
+TTL bounds how stale another worker's copy can be.
+"""
+
+import threading
+import time
+from collections import OrderedDict
+from db_config import DatabaseConfig
+from logger_config import logger
+
+class TTLCache:
+    """Thread-safe LRU cache whose entries also expire after ttl seconds"""
+
+    def __init__(self, name, max_entries=128, ttl=300):
+        """
+        Args:
+            name (str): Name reported in statistics
+            max_entries (int): Entries kept before the least recently used is evicted
+            ttl (float): Seconds an entry stays valid (0 disables caching)
+        """
+        self.name = name
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+        # Bumped on invalidation so a load that raced with a write is not stored
+        self._generation = 0
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.expirations = 0
+        self.invalidations = 0
+
+    def get(self, key, default=None):
+        """Return a live entry, or default"""
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None:
+                value, expires_at = entry
+                if expires_at > time.monotonic():
+                    self._entries.move_to_end(key)
+                    self.hits += 1
+                    return value
+                del self._entries[key]
+                self.expirations += 1
+            self.misses += 1
+            return default
+
+    def set(self, key, value, generation=None):
+        """Store an entry, evicting the least recently used ones past max_entries"""
+        if self.ttl <= 0:
+            return
+        with self._lock:
+            if generation is not None and generation != self._generation:
+                return
+            self._entries[key] = (value, time.monotonic() + self.ttl)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+                self.evictions += 1
+
+    def get_or_load(self, key, loader):
+        """
+        Return the cached value for key, calling loader() on a miss
+
+        Values for which loader signals failure (None) are not cached.
+        """
+        value = self.get(key, _MISSING)
+        if value is not _MISSING:
+            return value
+        generation = self._generation
+        value = loader()
+        if value is not None:
+            self.set(key, value, generation)
+        return value
+
+    def invalidate(self, key=None):
+        """Drop one entry, or every entry when key is None"""
+        with self._lock:
+            self._generation += 1
+            self.invalidations += 1
+            if key is None:
+                self._entries.clear()
+            else:
+                self._entries.pop(key, None)
+
+    def stats(self):
+        """
+        Get cache statistics
+
+        Returns:
+            dict: Size, limits and hit/miss/eviction counters
+        """
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                'name': self.name,
+                'size': len(self._entries),
+                'max_entries': self.max_entries,
+                'ttl': self.ttl,
+                'hits': self.hits,
+                'misses': self.misses,
+                'hit_rate': round(self.hits / lookups, 4) if lookups else 0.0,
+                'evictions': self.evictions,
+                'expirations': self.expirations,
+                'invalidations': self.invalidations
+            }
+
+
+_MISSING = object()
+
+
+def copy_rows(rows):
+    """Shallow-copy cached rows so callers can modify them freely"""
+    if rows is None:
+        return None
+    if isinstance(rows, dict):
+        return dict(rows)
+    return [dict(row) for row in rows]
+
+
+def _build_cache(name, ttl_option, default_ttl):
+    config = DatabaseConfig.read_config()
+    enabled = config.getboolean('cache', 'enabled', fallback=True)
+    return TTLCache(
+        name,
+        max_entries=config.getint('cache', 'max_entries', fallback=256),
+        ttl=config.getfloat('cache', ttl_option, fallback=default_ttl) if enabled else 0
+    )
+
+
+# Student roster: full list and keyset pages, keyed by query
+roster_cache = _build_cache('roster', 'roster_ttl', 300)
+
+# Faculty list and per-ID lookups
+faculty_cache = _build_cache('faculty', 'faculty_ttl', 3600)
+
+# Home page counters; short-lived since marks change them constantly
+dashboard_cache = _build_cache('dashboard', 'dashboard_ttl', 5)
+
+# table_versions counters behind conditional GETs, keyed by the names read.
+# Writes in this process drop them; the TTL bounds how long another
+# process's write can go unnoticed.
+versions_cache = _build_cache('versions', 'versions_ttl', 1)
+
+
+def invalidate_roster():
+    """Drop cached roster data after students are added or changed"""
+    roster_cache.invalidate()
+    dashboard_cache.invalidate()
+    versions_cache.invalidate()
+    logger.debug("Roster cache invalidated")
+
+
+def student_names():
+    """
+    Names of the students in the cached roster, without querying
+
+    Returns:
+        dict: student id -> name; empty while the roster is not cached
+    """
+    def build():
+        students = roster_cache.get('all')
+        return {student['id']: student['name'] for student in students} if students is not None else None
+
+    return roster_cache.get_or_load('names', build) or {}
+
+
+def student_label(student_id, names=None):
+    """
+    Name of a student from the cached roster, or "student <id>" if not cached
+
+    Args:
+        student_id (int): Student ID
+        names (dict, optional): student_names() result, when labelling many
+    """
+    if names is None:
+        names = student_names()
+    return names.get(student_id) or f"student {student_id}"
+
+
+def invalidate_faculty():
+    """Drop cached faculty data after faculty are added or changed"""
+    faculty_cache.invalidate()
+    versions_cache.invalidate()
+    logger.debug("Faculty cache invalidated")
+
+
+def invalidate_versions():
+    """Drop cached version counters after attendance is written"""
+    versions_cache.invalidate()
+
+
+def cache_stats():
+    """
+    Get statistics for every cache
+
+    Returns:
+        list: One stats dict per cache
+    """
+    return [roster_cache.stats(), faculty_cache.stats(), dashboard_cache.stats(), versions_cache.stats()]
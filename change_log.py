@@ -0,0 +1,184 @@
+"""
+Change Log Module
+Follows the attendance_changes table written by change_log_setup.sql
+
+Triggers append every inserted or corrected mark to attendance_changes, so
+a process can see writes made by other processes, including status
+corrections that leave attendance.created_at untouched. Ids are allocated
+when a row is inserted but only become visible when its transaction
+commits, so readers keep re-reading ids past a gap until the gap is
+lag_seconds old.
+"""
+
+import threading
+import time
+from mysql.connector import Error, errorcode
+from db_config import DatabaseConfig
+from logger_config import logger
+
+CHANGE_COLUMNS = "id, student_id, faculty_id, subject, date, period, status"
+
+# Rows fetched per query while reading
+READ_CHUNK = 10000
+
+# Seconds between prune passes in one process, and rows deleted per statement
+PRUNE_INTERVAL = 300
+PRUNE_CHUNK = 10000
+
+_prune_state = {'last': 0.0}
+_prune_lock = threading.Lock()
+
+
+def change_log_settings():
+    """
+    Read the [change_log] section
+
+    Returns:
+        dict: lag_seconds and retention_seconds
+    """
+    config = DatabaseConfig.read_config()
+    return {
+        'lag_seconds': config.getfloat('change_log', 'lag_seconds', fallback=30),
+        'retention_seconds': config.getfloat('change_log', 'retention_hours', fallback=24) * 3600
+    }
+
+
+class ChangeReader:
+    """
+    Cursor over attendance_changes
+
+    Every id up to floor has been read (or given up on); ids above it that
+    were already returned are remembered so re-reads skip them.
+    """
+
+    def __init__(self, floor, read_at=None, lag_seconds=30):
+        """
+        Args:
+            floor (int): Last change id already reflected by the caller
+            read_at (float, optional): Wall-clock time floor was taken
+                (defaults to now)
+            lag_seconds (float): Longest a writing transaction is expected
+                to stay open
+        """
+        self.floor = floor
+        self.read_at = time.time() if read_at is None else read_at
+        self.lag_seconds = lag_seconds
+        self._seen = {}  # id -> monotonic time it was first returned
+
+    @classmethod
+    def start(cls, cursor, lag_seconds=30):
+        """
+        Create a reader positioned at the current end of the log
+
+        The position is lag_seconds behind, so changes of transactions that
+        are still open are read once they commit; re-reading a few changes
+        the caller already has is harmless since they hold absolute values.
+
+        Args:
+            cursor: Cursor to query with, ideally inside the snapshot the
+                caller loaded its data from
+
+        Returns:
+            ChangeReader or None: Reader, or None when change_log_setup.sql
+                has not been run
+        """
+        read_at = time.time()
+        try:
+            cursor.execute("""
+                SELECT id FROM attendance_changes
+                WHERE changed_at < NOW(6) - INTERVAL %s SECOND
+                ORDER BY changed_at DESC
+                LIMIT 1
+            """, (lag_seconds,))
+            row = cursor.fetchone()
+        except Error as e:
+            if e.errno == errorcode.ER_NO_SUCH_TABLE:
+                return None
+            raise
+        return cls(int(row[0]) if row else 0, read_at, lag_seconds)
+
+    def behind(self, retention_seconds):
+        """Whether changes since the last read may already have been pruned"""
+        return time.time() - self.read_at > retention_seconds - 2 * self.lag_seconds
+
+    def read(self, cursor):
+        """
+        Fetch changes not returned before, in id order
+
+        Returns:
+            list: (id, student_id, faculty_id, subject, date, period, status) tuples
+        """
+        read_at = time.time()
+        rows = []
+        after = self.floor
+        while True:
+            cursor.execute(f"""
+                SELECT {CHANGE_COLUMNS} FROM attendance_changes
+                WHERE id > %s
+                ORDER BY id
+                LIMIT %s
+            """, (after, READ_CHUNK))
+            chunk = cursor.fetchall()
+            rows.extend(row for row in chunk if row[0] not in self._seen)
+            if len(chunk) < READ_CHUNK:
+                break
+            after = chunk[-1][0]
+
+        now = time.monotonic()
+        for row in rows:
+            self._seen[row[0]] = now
+        self._advance(now)
+        self.read_at = read_at
+        return rows
+
+    def _advance(self, now):
+        while self.floor + 1 in self._seen:
+            self.floor += 1
+            del self._seen[self.floor]
+
+        # A gap below an id seen lag_seconds ago belongs to a transaction
+        # allocated even earlier: it rolled back or ran too long to wait for
+        settled = [change_id for change_id, seen_at in self._seen.items() if now - seen_at >= self.lag_seconds]
+        if settled:
+            self.floor = max(settled)
+            self._seen = {change_id: seen_at for change_id, seen_at in self._seen.items()
+                          if change_id > self.floor}
+
+
+def prune_changes(conn, retention_seconds):
+    """
+    Delete changes older than retention_seconds, at most once per PRUNE_INTERVAL
+
+    Args:
+        conn: Connection to delete with (committed here)
+        retention_seconds (float): Age after which changes are deleted
+
+    Returns:
+        int: Rows deleted
+    """
+    with _prune_lock:
+        if time.monotonic() - _prune_state['last'] < PRUNE_INTERVAL:
+            return 0
+        _prune_state['last'] = time.monotonic()
+
+    deleted = 0
+    cursor = conn.cursor()
+    try:
+        while True:
+            cursor.execute("""
+                DELETE FROM attendance_changes
+                WHERE changed_at < NOW(6) - INTERVAL %s SECOND
+                LIMIT %s
+            """, (retention_seconds, PRUNE_CHUNK))
+            conn.commit()
+            deleted += cursor.rowcount
+            if cursor.rowcount < PRUNE_CHUNK:
+                break
+    except Error as e:
+        logger.error(f"Error pruning attendance_changes: {e}")
+    finally:
+        cursor.close()
+
+    if deleted:
+        logger.info(f"Pruned {deleted} attendance changes older than {retention_seconds / 3600:g}h")
+    return deleted
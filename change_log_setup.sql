@@ -0,0 +1,43 @@
+-- Change Log Setup
+-- Recent inserts and corrections of attendance marks, read by the analytics
+-- cube and the live feed of every worker process (see change_log.py).
+-- Run after attendance_system_setup.sql:
+--   python run_setup.py change_log_setup.sql
+USE attendance_system;
+
+-- Rows are appended by the triggers below and pruned after
+-- [change_log] retention_hours by the processes that read them.
+CREATE TABLE IF NOT EXISTS attendance_changes (
+    id BIGINT UNSIGNED AUTO_INCREMENT PRIMARY KEY,
+    student_id INT NOT NULL,
+    faculty_id INT NOT NULL,
+    subject VARCHAR(100) NOT NULL,
+    date DATE NOT NULL,
+    period INT NOT NULL,
+    status ENUM('Present', 'Absent', 'Late') NOT NULL,
+    changed_at TIMESTAMP(6) NOT NULL DEFAULT CURRENT_TIMESTAMP(6),
+    INDEX idx_changed_at (changed_at)
+) ENGINE=InnoDB;
+
+-- Triggers are single statements so this file also runs through run_setup.py.
+-- Bulk loads that SET @skip_attendance_aggregates = 1 are not logged (readers
+-- reload after them), and neither are deletes, since archival moves marks
+-- rather than removing them.
+DROP TRIGGER IF EXISTS trg_changes_attendance_insert;
+CREATE TRIGGER trg_changes_attendance_insert AFTER INSERT ON attendance
+FOR EACH ROW
+    INSERT INTO attendance_changes (student_id, faculty_id, subject, date, period, status)
+    SELECT NEW.student_id, NEW.faculty_id, NEW.subject, NEW.date, NEW.period, NEW.status
+    FROM DUAL
+    WHERE @skip_attendance_aggregates IS NULL;
+
+-- Upserts that rewrite a mark with the same values are not changes
+DROP TRIGGER IF EXISTS trg_changes_attendance_update;
+CREATE TRIGGER trg_changes_attendance_update AFTER UPDATE ON attendance
+FOR EACH ROW
+    INSERT INTO attendance_changes (student_id, faculty_id, subject, date, period, status)
+    SELECT NEW.student_id, NEW.faculty_id, NEW.subject, NEW.date, NEW.period, NEW.status
+    FROM DUAL
+    WHERE NOT (OLD.status <=> NEW.status AND OLD.subject <=> NEW.subject
+               AND OLD.faculty_id <=> NEW.faculty_id AND OLD.student_id <=> NEW.student_id
+               AND OLD.date <=> NEW.date AND OLD.period <=> NEW.period);
@@ -0,0 +1,280 @@
+"""
+Connection Pool Module
+Bounded, thread-safe MySQL connection pool with overflow, idle eviction
+and liveness checks on checkout
+"""
+
+import os
+import threading
+import time
+from collections import deque
+import mysql.connector
+from mysql.connector import Error
+
+
+class PoolExhaustedError(Error):
+    """Raised when no connection could be checked out within the timeout"""
+
+
+class PooledConnection:
+    """
+    Proxy around a MySQL connection that returns it to the pool on close()
+
+    Every other attribute is delegated to the underlying connection, so
+    callers keep using the regular cursor()/commit()/rollback() API.
+    """
+
+    def __init__(self, pool, connection, overflow=False):
+        self._pool = pool
+        self._connection = connection
+        self._overflow = overflow
+        self._closed = False
+
+    def __getattr__(self, name):
+        return getattr(self._connection, name)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
+
+    def cursor(self, *args, **kwargs):
+        """Open a cursor, wrapped by the pool's cursor_wrapper if it has one"""
+        cursor = self._connection.cursor(*args, **kwargs)
+        wrapper = self._pool.cursor_wrapper
+        return wrapper(cursor) if wrapper is not None else cursor
+
+    @property
+    def raw_connection(self):
+        """Underlying mysql.connector connection"""
+        return self._connection
+
+    def is_connected(self):
+        """Report a released proxy as disconnected so it is not closed twice"""
+        if self._closed:
+            return False
+        return self._connection.is_connected()
+
+    def close(self):
+        """Return the connection to the pool instead of closing it"""
+        if self._closed:
+            return
+        self._closed = True
+        self._pool._release(self._connection, self._overflow)
+
+
+class ConnectionPool:
+    """
+    Bounded connection pool
+
+    Keeps between ``min_size`` and ``max_size`` idle connections. When all
+    ``max_size`` connections are checked out, up to ``max_overflow`` extra
+    connections are opened and closed again on release. Further checkouts
+    wait up to ``checkout_timeout`` seconds before PoolExhaustedError is
+    raised. Idle connections older than ``idle_timeout`` seconds are evicted
+    down to ``min_size``, and every checkout pings the connection first when
+    ``ping_on_checkout`` is enabled. ``cursor_wrapper``, if given, wraps
+    every cursor opened through a pooled connection (e.g. for timing), and
+    ``on_connect``, if given, is called with every new connection (e.g. to
+    set session variables).
+    """
+
+    def __init__(self, connect_args, min_size=2, max_size=10, max_overflow=10,
+                 idle_timeout=300, checkout_timeout=10, ping_on_checkout=True,
+                 name="attendance_pool", cursor_wrapper=None, on_connect=None):
+        if max_size < 1:
+            raise ValueError("max_size must be at least 1")
+        if not 0 <= min_size <= max_size:
+            raise ValueError("min_size must be between 0 and max_size")
+
+        self.name = name
+        self.connect_args = dict(connect_args)
+        self.min_size = min_size
+        self.max_size = max_size
+        self.max_overflow = max(0, max_overflow)
+        self.idle_timeout = idle_timeout
+        self.checkout_timeout = checkout_timeout
+        self.ping_on_checkout = ping_on_checkout
+        self.cursor_wrapper = cursor_wrapper
+        self.on_connect = on_connect
+        self.pid = os.getpid()
+
+        self._lock = threading.Condition()
+        self._idle = deque()  # (connection, last_used_monotonic)
+        self._size = 0  # connections owned by the pool (idle + checked out)
+        self._overflow = 0  # overflow connections currently checked out
+        self._waiting = 0
+
+        self._stats = {
+            'checkouts': 0,
+            'created': 0,
+            'closed': 0,
+            'evicted': 0,
+            'ping_failures': 0,
+            'timeouts': 0,
+            'wait_time_total': 0.0,
+        }
+
+        for _ in range(self.min_size):
+            self._idle.append((self._connect(), time.monotonic()))
+            self._size += 1
+
+    def _connect(self):
+        connection = mysql.connector.connect(**self.connect_args)
+        if self.on_connect is not None:
+            self.on_connect(connection)
+        self._stats['created'] += 1
+        return connection
+
+    def _discard(self, connection):
+        try:
+            connection.close()
+        except Exception:
+            pass
+        self._stats['closed'] += 1
+
+    def _alive(self, connection):
+        if not self.ping_on_checkout:
+            return True
+        try:
+            connection.ping(reconnect=False)
+            return True
+        except Exception:
+            self._stats['ping_failures'] += 1
+            return False
+
+    def _evict_idle(self):
+        """Close idle connections past idle_timeout, keeping min_size (lock held)"""
+        if not self.idle_timeout:
+            return
+        cutoff = time.monotonic() - self.idle_timeout
+        # Oldest connections sit at the left of the deque
+        while self._idle and self._size > self.min_size and self._idle[0][1] < cutoff:
+            connection, _ = self._idle.popleft()
+            self._size -= 1
+            self._stats['evicted'] += 1
+            self._discard(connection)
+
+    def get_connection(self):
+        """
+        Check out a connection
+
+        Returns:
+            PooledConnection: Connection proxy; close() returns it to the pool
+
+        Raises:
+            PoolExhaustedError: If no connection frees up within checkout_timeout
+        """
+        started = time.monotonic()
+        deadline = started + self.checkout_timeout
+
+        with self._lock:
+            self._evict_idle()
+            while True:
+                if self._idle:
+                    # Reuse the most recently used connection (LIFO keeps
+                    # cold connections at the left for eviction)
+                    connection, _ = self._idle.pop()
+                    overflow = False
+                    break
+                if self._size < self.max_size:
+                    self._size += 1
+                    connection, overflow = None, False
+                    break
+                if self._overflow < self.max_overflow:
+                    self._overflow += 1
+                    connection, overflow = None, True
+                    break
+
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    self._stats['timeouts'] += 1
+                    raise PoolExhaustedError(
+                        msg=f"Connection pool '{self.name}' exhausted "
+                            f"({self.max_size} + {self.max_overflow} connections in use)")
+                self._waiting += 1
+                try:
+                    self._lock.wait(remaining)
+                finally:
+                    self._waiting -= 1
+
+            self._stats['checkouts'] += 1
+            self._stats['wait_time_total'] += time.monotonic() - started
+
+        # Connect and ping outside the lock so slow network calls do not
+        # block other threads
+        try:
+            if connection is not None and not self._alive(connection):
+                self._discard(connection)
+                connection = None
+            if connection is None:
+                connection = self._connect()
+        except Exception:
+            with self._lock:
+                if overflow:
+                    self._overflow -= 1
+                else:
+                    self._size -= 1
+                self._lock.notify()
+            raise
+
+        return PooledConnection(self, connection, overflow)
+
+    def _release(self, connection, overflow):
+        """Return a connection to the pool, discarding broken or overflow ones"""
+        if os.getpid() != self.pid:
+            # Inherited across fork(): the socket belongs to the parent, so
+            # drop the object without sending COM_QUIT on it
+            return
+
+        reusable = not overflow
+        if reusable:
+            try:
+                # Never hand an open transaction to the next borrower
+                connection.rollback()
+            except Exception:
+                reusable = False
+
+        with self._lock:
+            if overflow:
+                self._overflow -= 1
+            if reusable:
+                self._idle.append((connection, time.monotonic()))
+            else:
+                if not overflow:
+                    self._size -= 1
+                self._discard(connection)
+            self._evict_idle()
+            self._lock.notify()
+
+    def stats(self):
+        """
+        Get pool statistics
+
+        Returns:
+            dict: Sizes, in-use/idle/waiting counts and cumulative counters
+        """
+        with self._lock:
+            in_use = self._size - len(self._idle) + self._overflow
+            return {
+                'name': self.name,
+                'min_size': self.min_size,
+                'max_size': self.max_size,
+                'max_overflow': self.max_overflow,
+                'size': self._size,
+                'idle': len(self._idle),
+                'in_use': in_use,
+                'overflow': self._overflow,
+                'waiting': self._waiting,
+                **self._stats,
+            }
+
+    def close_all(self):
+        """Close every idle connection; checked-out ones close on release"""
+        with self._lock:
+            while self._idle:
+                connection, _ = self._idle.pop()
+                self._size -= 1
+                self._discard(connection)
+            self._lock.notify_all()
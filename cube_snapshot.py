@@ -0,0 +1,220 @@
+"""
+Cube Snapshot Module
+Versioned on-disk snapshot format for AttendanceCube
+
+Layout (little-endian, sections aligned to 64 bytes):
+    header      magic, version, dimensions, capacities and section offsets/lengths
+    students    int32[student_capacity]               student ID per cube row
+    days        int32[day_capacity]                   MySQL TO_DAYS per cube column
+    status      int8[day_capacity, student_capacity, 5]   cell codes, day-major
+    subjects    int16[day_capacity, student_capacity, 5]  subject codes (-1 = unmarked)
+    meta        UTF-8 JSON                            subject names, watermark and change log position
+
+Snapshots are memory-mapped copy-on-write, so worker processes loading the
+same file share its clean pages through the page cache and only copy the
+pages they modify while catching up. Capacity beyond n_students/n_days is
+reserved so new days and students fit in place; with the day-major layout
+a new day only dirties that day's pages.
+"""
+
+import json
+import os
+import struct
+import time
+from datetime import datetime
+import numpy as np
+from attendance_cube import AttendanceCube, PERIODS, UNMARKED, allocate_cells
+from change_log import ChangeReader, change_log_settings
+from logger_config import logger
+
+MAGIC = b'ATTCUBE\x00'
+VERSION = 2
+ALIGNMENT = 64
+
+# Spare school days reserved by default; spare students default to 5% (at least 64)
+SPARE_DAYS = 31
+MIN_SPARE_STUDENTS = 64
+
+# magic, version, periods, n_students, n_days, student_capacity,
+# day_capacity, then (offset, length) for students, days, status,
+# subjects and meta
+HEADER = struct.Struct('<8sHHIIII' + 'QQ' * 5)
+
+
+class SnapshotError(Exception):
+    """Raised when a snapshot file is missing, corrupt or of another version"""
+
+
+def _align(offset):
+    return (offset + ALIGNMENT - 1) // ALIGNMENT * ALIGNMENT
+
+
+def write_snapshot(cube, path, spare_days=SPARE_DAYS, spare_students=None):
+    """
+    Write a cube to a snapshot file
+
+    The file is written next to its destination and renamed into place, so
+    readers never map a half-written snapshot.
+
+    Args:
+        cube (AttendanceCube): Cube to save
+        path (str): Destination file
+        spare_days (int): School days reserved past the last one
+        spare_students (int, optional): Student rows reserved (default: 5%,
+            at least 64)
+
+    Returns:
+        int: Size of the snapshot in bytes
+    """
+    with cube._lock:
+        n_students, n_days = cube.n_students, cube.n_days
+        if spare_students is None:
+            spare_students = max(MIN_SPARE_STUDENTS, n_students // 20)
+        student_capacity = n_students + spare_students
+        day_capacity = n_days + spare_days
+
+        student_ids = np.zeros(student_capacity, dtype='<i4')
+        student_ids[:n_students] = cube.student_ids[:n_students]
+        day_numbers = np.zeros(day_capacity, dtype='<i4')
+        day_numbers[:n_days] = cube.day_numbers[:n_days]
+        status = np.full((day_capacity, student_capacity, PERIODS), UNMARKED, dtype='i1')
+        status[:n_days, :n_students] = cube.status[:n_students, :n_days].transpose(1, 0, 2)
+        subjects = np.full((day_capacity, student_capacity, PERIODS), -1, dtype='<i2')
+        subjects[:n_days, :n_students] = cube.subjects[:n_students, :n_days].transpose(1, 0, 2)
+
+        sections = [
+            student_ids.tobytes(),
+            day_numbers.tobytes(),
+            status.tobytes(),
+            subjects.tobytes(),
+            json.dumps({
+                'subject_names': cube.subject_names,
+                'watermark': cube.watermark.isoformat() if cube.watermark else None,
+                'change_id': cube.changes.floor if cube.changes else None,
+                'changes_read_at': cube.changes.read_at if cube.changes else None,
+                'created_at': datetime.now().isoformat()
+            }).encode('utf-8'),
+        ]
+
+    layout = []
+    offset = _align(HEADER.size)
+    for section in sections:
+        layout.extend((offset, len(section)))
+        offset = _align(offset + len(section))
+
+    tmp_path = f"{path}.{os.getpid()}.tmp"
+    with open(tmp_path, 'wb') as f:
+        f.write(HEADER.pack(MAGIC, VERSION, PERIODS, n_students, n_days,
+                            student_capacity, day_capacity, *layout))
+        for section, section_offset in zip(sections, layout[::2]):
+            f.seek(section_offset)
+            f.write(section)
+        f.flush()
+        os.fsync(f.fileno())
+    os.replace(tmp_path, path)
+
+    size = os.path.getsize(path)
+    logger.info(f"Attendance cube snapshot written to {path} ({size} bytes)")
+    return size
+
+
+def read_header(path):
+    """
+    Read and validate a snapshot header
+
+    Returns:
+        dict: Dimensions, capacities and section (offset, length) pairs
+    """
+    try:
+        with open(path, 'rb') as f:
+            raw = f.read(HEADER.size)
+    except OSError as e:
+        raise SnapshotError(f"Cannot read snapshot {path}: {e}")
+
+    if len(raw) < HEADER.size:
+        raise SnapshotError(f"Snapshot {path} is truncated")
+    fields = HEADER.unpack(raw)
+    magic, version, periods, n_students, n_days, student_capacity, day_capacity = fields[:7]
+    if magic != MAGIC:
+        raise SnapshotError(f"{path} is not an attendance cube snapshot")
+    if version != VERSION:
+        raise SnapshotError(f"Unsupported snapshot version {version} (expected {VERSION})")
+    if periods != PERIODS:
+        raise SnapshotError(f"Snapshot has {periods} periods, expected {PERIODS}")
+    if n_students > student_capacity or n_days > day_capacity:
+        raise SnapshotError(f"Snapshot {path} is corrupt")
+
+    names = ['students', 'days', 'status', 'subjects', 'meta']
+    sections = {name: (fields[7 + 2 * i], fields[8 + 2 * i]) for i, name in enumerate(names)}
+    end = max(offset + length for offset, length in sections.values())
+    if os.path.getsize(path) < end:
+        raise SnapshotError(f"Snapshot {path} is truncated")
+
+    return {'n_students': n_students, 'n_days': n_days, 'student_capacity': student_capacity,
+            'day_capacity': day_capacity, 'sections': sections}
+
+
+def load_snapshot(path, catch_up=True):
+    """
+    Memory-map a snapshot into an AttendanceCube
+
+    Args:
+        path (str): Snapshot file
+        catch_up (bool): Apply attendance changes made since the snapshot was taken
+
+    Returns:
+        AttendanceCube: Cube backed by the mapped file
+
+    Raises:
+        SnapshotError: If the snapshot is unreadable, or older than the
+            change log retention so catching up could miss changes
+    """
+    started = time.perf_counter()
+    header = read_header(path)
+    n_students, n_days = header['n_students'], header['n_days']
+    student_capacity, day_capacity = header['student_capacity'], header['day_capacity']
+    sections = header['sections']
+
+    def mapped(name, dtype, shape):
+        offset, length = sections[name]
+        if not length:
+            return np.zeros(shape, dtype=dtype)
+        # Copy-on-write: pages stay shared until this process modifies them
+        return np.memmap(path, dtype=dtype, mode='c', offset=offset, shape=shape)
+
+    def mapped_cells(name, dtype, fill):
+        if not sections[name][1]:
+            return allocate_cells(student_capacity, day_capacity, fill, dtype)
+        # Stored day-major; the transposed view indexes [student, day, period]
+        return mapped(name, dtype, (day_capacity, student_capacity, PERIODS)).transpose(1, 0, 2)
+
+    offset, length = sections['meta']
+    with open(path, 'rb') as f:
+        f.seek(offset)
+        meta = json.loads(f.read(length).decode('utf-8'))
+
+    changes = None
+    if meta.get('change_id') is not None:
+        settings = change_log_settings()
+        changes = ChangeReader(meta['change_id'], meta['changes_read_at'], settings['lag_seconds'])
+        if catch_up and changes.behind(settings['retention_seconds']):
+            raise SnapshotError(f"Snapshot {path} is older than the change log retention")
+
+    cube = AttendanceCube()
+    with cube._lock:
+        cube.student_ids = mapped('students', '<i4', (student_capacity,))
+        cube.day_numbers = mapped('days', '<i4', (day_capacity,))
+        cube.status = mapped_cells('status', 'i1', UNMARKED)
+        cube.subjects = mapped_cells('subjects', '<i2', -1)
+        cube.subject_names = meta['subject_names']
+        cube.n_students = n_students
+        cube.n_days = n_days
+        cube.watermark = datetime.fromisoformat(meta['watermark']) if meta['watermark'] else None
+        cube.changes = changes
+        cube.loaded_at = cube.refreshed_at = time.time()
+        cube._rebuild_indexes()
+
+    applied = cube.refresh() if catch_up else 0
+    logger.info(f"Attendance cube mapped from {path}: {n_students} students x {n_days} days, "
+                f"{applied} changes caught up in {time.perf_counter() - started:.2f}s")
+    return cube
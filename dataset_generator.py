@@ -0,0 +1,382 @@
+"""
+Dataset Generator Module
+Synthetic institution-scale data for performance testing
+
+Generates N students, M faculty/subject pairs and Y years of school days
+x 5 periods of attendance, and bulk loads them with LOAD DATA LOCAL INFILE
+(or multi-row INSERTs where the server or client does not allow local
+files). Generated rows are tagged with a reg_no / faculty name prefix and
+every run with the same seed produces the same data; re-running skips rows
+that already exist.
+
+Absences follow a simple but realistic model: each student has their own
+absence propensity (a long-tailed Beta distribution, so a few chronic
+absentees and many near-perfect attenders), most absences are whole days,
+a day off makes the next day off more likely (illness streaks), Mondays
+and Fridays are worse, and late arrivals cluster in the first period.
+
+    python manage.py generate-dataset --students 10000 --faculty 40 --years 1
+"""
+
+import csv
+import os
+import random
+import tempfile
+import time
+from datetime import date, datetime, timedelta
+import mysql.connector
+from mysql.connector import Error, errorcode
+from db_config import DatabaseConfig
+from logger_config import logger
+
+class DatasetError(Exception):
+    """Raised for invalid generator settings"""
+
+
+LOAD_METHODS = ['auto', 'infile', 'insert']
+
+PERIODS = 5
+
+FIRST_NAMES = ['Aarav', 'Abinaya', 'Aditi', 'Akash', 'Anjali', 'Arjun', 'Bharath', 'Deepa', 'Dhanush',
+               'Divya', 'Ganesh', 'Gayathri', 'Harini', 'Hari', 'Ishwarya', 'Jaya', 'Karthik', 'Kavya',
+               'Keerthana', 'Lakshmi', 'Madhan', 'Meena', 'Nandhini', 'Naveen', 'Pooja', 'Pradeep',
+               'Priya', 'Rahul', 'Ramya', 'Sandhya', 'Sanjay', 'Shreya', 'Sneha', 'Surya', 'Swetha',
+               'Tharun', 'Varsha', 'Vignesh', 'Vishnu', 'Yamini']
+LAST_NAMES = ['Anand', 'Balaji', 'Chandran', 'Devi', 'Ganesan', 'Iyer', 'Kannan', 'Krishnan', 'Kumar',
+              'Lakshmanan', 'Mohan', 'Murugan', 'Nair', 'Natarajan', 'Pillai', 'Raja', 'Raman', 'Rao',
+              'Ravi', 'Selvam', 'Shankar', 'Srinivasan', 'Subramanian', 'Sundaram', 'Venkatesh']
+SUBJECTS = ['Machine Learning', 'Big Data Analytics', 'Computer Networks', 'Statistical Data Analysis',
+            'Database Systems', 'Operating Systems', 'Data Structures', 'Algorithms', 'Linear Algebra',
+            'Probability', 'Cloud Computing', 'Deep Learning', 'Data Visualization', 'Software Engineering',
+            'Compiler Design', 'Information Security', 'Natural Language Processing', 'Computer Vision',
+            'Discrete Mathematics', 'Web Technologies']
+BOARDS = ['State Board', 'CBSE', 'ICSE']
+
+# Breaks with no classes, as (month, day) ranges within a year
+BREAKS = [((5, 1), (6, 15)), ((12, 24), (12, 31)), ((1, 1), (1, 1))]
+
+# Relative chance of a whole-day absence by weekday (Monday first)
+WEEKDAY_ABSENCE = [1.15, 1.0, 0.95, 1.0, 1.3]
+
+# Chance of staying off the day after a day off
+ILLNESS_STREAK = 0.45
+
+# Share of a student's absences that are single missed periods
+PERIOD_ABSENCE_SHARE = 0.25
+
+STUDENT_COLUMNS = ['reg_no', 'name', 'email', 'phone', 'board', 'marks', 'cgpa', 'join_date']
+FACULTY_COLUMNS = ['name', 'subject']
+ATTENDANCE_COLUMNS = ['student_id', 'faculty_id', 'subject', 'date', 'period', 'status']
+
+
+def school_days(start, end, rng, holidays_per_month=1):
+    """
+    Weekdays between start and end outside the breaks, less a few
+    random holidays
+
+    Args:
+        start (date): First day
+        end (date): Last day
+        rng (random.Random): Seeded generator picking the holidays
+        holidays_per_month (int): Random single-day holidays per month
+
+    Returns:
+        list: School days in order
+    """
+    days = []
+    day = start
+    while day <= end:
+        key = (day.month, day.day)
+        if day.weekday() < 5 and not any(first <= key <= last for first, last in BREAKS):
+            days.append(day)
+        day += timedelta(days=1)
+
+    holidays = set()
+    months = {}
+    for day in days:
+        months.setdefault((day.year, day.month), []).append(day)
+    for month_days in months.values():
+        holidays.update(rng.sample(month_days, min(holidays_per_month, len(month_days) - 1)))
+    return [day for day in days if day not in holidays]
+
+
+class DatasetGenerator:
+    """Generates and bulk loads one synthetic institution"""
+
+    def __init__(self, students=1000, faculty=20, years=1, end_date=None, seed=42,
+                 absence_rate=0.08, late_rate=0.03, section_size=60, method='auto',
+                 chunk_rows=200000, prefix='GEN'):
+        """
+        Args:
+            students (int): Students to create
+            faculty (int): Faculty/subject pairs to create
+            years (float): Years of attendance, ending on end_date
+            end_date (date, optional): Last school day (default: yesterday)
+            seed (int): Random seed; the same seed generates the same data
+            absence_rate (float): Mean share of periods a student misses
+            late_rate (float): Share of first periods attended late
+            section_size (int): Students per section; sections get their own timetable
+            method (str): 'infile', 'insert' or 'auto' (infile, falling back to insert)
+            chunk_rows (int): Attendance rows loaded per transaction
+            prefix (str): reg_no and faculty name prefix marking generated rows
+        """
+        if method not in LOAD_METHODS:
+            raise DatasetError(f"Invalid method. Must be one of: {', '.join(LOAD_METHODS)}")
+        if not 1 <= students < 10 ** 8 or faculty < 1 or years <= 0:
+            raise DatasetError("Students (under 100 million), faculty and years must be positive")
+        if not 0 <= absence_rate < 1 or not 0 <= late_rate < 1:
+            raise DatasetError("Absence and late rates must be between 0 and 1")
+        if not prefix.isalnum() or len(prefix) > 10:
+            raise DatasetError("Prefix must be alphanumeric and at most 10 characters")
+
+        self.students = students
+        self.faculty = faculty
+        self.end_date = end_date or date.today() - timedelta(days=1)
+        self.start_date = self.end_date - timedelta(days=round(years * 365.25) - 1)
+        self.seed = seed
+        self.absence_rate = absence_rate
+        self.late_rate = late_rate
+        self.section_size = max(1, section_size)
+        self.method = method
+        self.chunk_rows = chunk_rows
+        self.prefix = prefix
+        self.days = school_days(self.start_date, self.end_date, random.Random(seed))
+
+    @property
+    def attendance_rows(self):
+        """Attendance rows a full run generates"""
+        return self.students * len(self.days) * PERIODS
+
+    # ==================== ROWS ====================
+
+    def student_rows(self):
+        """Yield student rows in STUDENT_COLUMNS order"""
+        rng = random.Random(self.seed)
+        for number in range(1, self.students + 1):
+            first, last = rng.choice(FIRST_NAMES), rng.choice(LAST_NAMES)
+            yield (f"{self.prefix}{number:08d}", f"{first} {last}",
+                   f"{first}.{last}.{number}@{self.prefix}.example.edu".lower(),
+                   f"{rng.choice('6789')}{rng.randrange(10 ** 9):09d}", rng.choice(BOARDS),
+                   rng.randint(250, 600), round(rng.uniform(5.5, 9.8), 2), self.start_date)
+
+    def faculty_rows(self):
+        """Yield (name, subject) pairs, cycling subjects across faculty"""
+        for index in range(self.faculty):
+            subject = SUBJECTS[index % len(SUBJECTS)]
+            if index >= len(SUBJECTS):
+                subject = f"{subject} {index // len(SUBJECTS) + 1}"
+            yield (f"{self.prefix} Faculty {index + 1:03d}", subject)
+
+    def attendance_row_batches(self, student_ids, faculty):
+        """
+        Yield lists of attendance rows, one school day at a time
+
+        Args:
+            student_ids (list): Student IDs in generation order
+            faculty (list): (faculty_id, subject) pairs
+
+        Yields:
+            list: Rows in ATTENDANCE_COLUMNS order
+        """
+        rng = random.Random(self.seed + 1)
+        # Long-tailed per-student propensity with mean absence_rate
+        shape = 1.5
+        propensity = [min(0.9, rng.betavariate(shape, shape * (1 - self.absence_rate) / self.absence_rate))
+                      if self.absence_rate > 0 else 0.0 for _ in student_ids]
+        day_share = 1 - PERIOD_ABSENCE_SHARE
+        absent_yesterday = [False] * len(student_ids)
+
+        for day in self.days:
+            day_text = day.isoformat()
+            weekday = WEEKDAY_ABSENCE[day.weekday()]
+            rows = []
+            for index, student_id in enumerate(student_ids):
+                # Sections rotate through the faculty on their own timetable
+                slot = (index // self.section_size) * 7 + day.weekday() * PERIODS
+                if absent_yesterday[index]:
+                    chance = ILLNESS_STREAK
+                else:
+                    # Onset chance that, with streaks, averages out to the target day share
+                    target = min(0.9, propensity[index] * day_share * weekday)
+                    chance = target * (1 - ILLNESS_STREAK) / (1 - target)
+                if rng.random() < chance:
+                    absent_yesterday[index] = True
+                    for period in range(1, PERIODS + 1):
+                        faculty_id, subject = faculty[(slot + period - 1) % len(faculty)]
+                        rows.append((student_id, faculty_id, subject, day_text, period, 'Absent'))
+                    continue
+                absent_yesterday[index] = False
+                period_chance = propensity[index] * PERIOD_ABSENCE_SHARE
+                for period in range(1, PERIODS + 1):
+                    faculty_id, subject = faculty[(slot + period - 1) % len(faculty)]
+                    value = rng.random()
+                    if value < period_chance:
+                        status = 'Absent'
+                    elif value < period_chance + (self.late_rate if period == 1 else self.late_rate / 4):
+                        status = 'Late'
+                    else:
+                        status = 'Present'
+                    rows.append((student_id, faculty_id, subject, day_text, period, status))
+            yield rows
+
+    # ==================== LOADING ====================
+
+    @staticmethod
+    def _connect():
+        """Dedicated connection for the load, allowed to send local files"""
+        return mysql.connector.connect(allow_local_infile=True, **DatabaseConfig.get_db_settings())
+
+    @staticmethod
+    def _insert(cursor, table, columns, rows):
+        # executemany() sends INSERTs as multi-row statements
+        cursor.executemany(
+            f"INSERT IGNORE INTO {table} ({', '.join(columns)}) "
+            f"VALUES ({', '.join(['%s'] * len(columns))})", rows)
+        return cursor.rowcount
+
+    @staticmethod
+    def _load_infile(cursor, table, columns, rows):
+        handle, path = tempfile.mkstemp(suffix='.tsv', prefix=f'{table}_')
+        try:
+            with os.fdopen(handle, 'w', encoding='utf-8', newline='') as f:
+                csv.writer(f, delimiter='\t', lineterminator='\n', quoting=csv.QUOTE_NONE,
+                           escapechar='\\').writerows(rows)
+            cursor.execute(
+                f"LOAD DATA LOCAL INFILE %s IGNORE INTO TABLE {table} CHARACTER SET utf8mb4 "
+                f"FIELDS TERMINATED BY '\\t' ESCAPED BY '\\\\' LINES TERMINATED BY '\\n' "
+                f"({', '.join(columns)})", (path,))
+            return cursor.rowcount
+        finally:
+            os.remove(path)
+
+    def _load(self, conn, cursor, table, columns, rows):
+        """
+        Load one chunk with the configured method and commit it
+
+        Returns:
+            int: Rows inserted (existing keys are skipped)
+        """
+        if self.method != 'insert':
+            try:
+                loaded = self._load_infile(cursor, table, columns, rows)
+                conn.commit()
+                return loaded
+            except Error as e:
+                conn.rollback()
+                if self.method == 'infile':
+                    raise
+                logger.warning(f"LOAD DATA LOCAL INFILE unavailable ({e}); using multi-row INSERTs "
+                               f"(enable local_infile on the server for faster loads)")
+                self.method = 'insert'
+        loaded = self._insert(cursor, table, columns, rows)
+        conn.commit()
+        return loaded
+
+    @staticmethod
+    def _fetch_ids(cursor, query, params):
+        cursor.execute(query, params)
+        return cursor.fetchall()
+
+    def generate(self, rebuild=True, progress=None):
+        """
+        Generate and load the whole dataset
+
+        Triggers that maintain aggregates, table versions and the daily
+        report cache are skipped during the load; the aggregates are
+        rebuilt (and versions bumped) once at the end.
+
+        Args:
+            rebuild (bool): Rebuild the attendance aggregates afterwards
+            progress (callable, optional): Called as progress(rows_loaded, rows_total)
+
+        Returns:
+            dict: students, faculty, school_days, attendance_rows, seconds,
+                rows_per_second and method
+        """
+        if not self.days:
+            raise DatasetError("No school days between "
+                               f"{self.start_date.isoformat()} and {self.end_date.isoformat()}")
+
+        started = time.perf_counter()
+        conn = self._connect()
+        cursor = conn.cursor()
+        loaded_rows = 0
+        try:
+            cursor.execute("SET SESSION foreign_key_checks = 0")
+            cursor.execute("SET @skip_attendance_aggregates = 1")
+
+            self._load(conn, cursor, 'students', STUDENT_COLUMNS, list(self.student_rows()))
+            self._load(conn, cursor, 'faculty', FACULTY_COLUMNS, list(self.faculty_rows()))
+
+            student_ids = [row[0] for row in self._fetch_ids(
+                cursor, "SELECT id FROM students WHERE reg_no LIKE %s ORDER BY reg_no LIMIT %s",
+                (f"{self.prefix}%", self.students))]
+            faculty = [(row[0], row[1]) for row in self._fetch_ids(
+                cursor, "SELECT id, subject FROM faculty WHERE name LIKE %s ORDER BY name, subject LIMIT %s",
+                (f"{self.prefix} Faculty %", self.faculty))]
+            logger.info(f"Generating {self.attendance_rows} attendance rows for {len(student_ids)} students "
+                        f"over {len(self.days)} school days ({self.start_date} to {self.end_date})")
+
+            total = len(student_ids) * len(self.days) * PERIODS
+            generated = 0
+            chunk = []
+            for rows in self.attendance_row_batches(student_ids, faculty):
+                chunk.extend(rows)
+                if len(chunk) >= self.chunk_rows:
+                    loaded_rows += self._load(conn, cursor, 'attendance', ATTENDANCE_COLUMNS, chunk)
+                    generated += len(chunk)
+                    chunk = []
+                    if progress:
+                        progress(generated, total)
+            if chunk:
+                loaded_rows += self._load(conn, cursor, 'attendance', ATTENDANCE_COLUMNS, chunk)
+                generated += len(chunk)
+                if progress:
+                    progress(generated, total)
+
+            # Fresh statistics so plans reflect the new table sizes
+            for table in ('students', 'faculty', 'attendance'):
+                cursor.execute(f"ANALYZE TABLE {table}")
+                cursor.fetchall()
+        except Error as e:
+            conn.rollback()
+            logger.error(f"Error generating dataset: {e}")
+            raise
+        finally:
+            cursor.close()
+            conn.close()
+
+        load_seconds = time.perf_counter() - started
+        if rebuild:
+            from attendance_stats import AttendanceStats
+            try:
+                AttendanceStats.rebuild()
+            except Error as e:
+                if e.errno != errorcode.ER_NO_SUCH_TABLE:
+                    raise
+                logger.warning("Attendance aggregates not set up; skipped rebuild")
+
+        from cache import invalidate_faculty, invalidate_roster
+        invalidate_roster()
+        invalidate_faculty()
+
+        seconds = time.perf_counter() - started
+        result = {
+            'students': len(student_ids),
+            'faculty': len(faculty),
+            'school_days': len(self.days),
+            'attendance_rows': loaded_rows,
+            'seconds': round(seconds, 2),
+            'rows_per_second': round(loaded_rows / load_seconds) if load_seconds else None,
+            'method': self.method,
+        }
+        logger.info(f"Generated dataset: {result}")
+        return result
+
+
+def parse_date(value):
+    """Parse YYYY-MM-DD for the command line"""
+    try:
+        return datetime.strptime(value, '%Y-%m-%d').date()
+    except ValueError:
+        raise DatasetError(f"Invalid date: {value}. Use YYYY-MM-DD")
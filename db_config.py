@@ -4,47 +4,125 @@ Handles MySQL database connection and pooling
 """
 
 import mysql.connector
-from mysql.connector import pooling, Error
+from mysql.connector import Error
 import configparser
 import os
+import threading
+import time
+from connection_pool import ConnectionPool
+import metrics
 from logger_config import logger
 
 class DatabaseConfig:
     """Database connection manager with pooling support"""
     
     _connection_pool = None
+    _pool_lock = threading.Lock()
+    
+    @staticmethod
+    def read_config():
+        """
+        Read config.ini from the application directory
+        
+        The ATTENDANCE_CONFIG environment variable points at another file,
+        e.g. a benchmark database's settings.
+        
+        Returns:
+            configparser.ConfigParser: Parsed configuration
+        """
+        config = configparser.ConfigParser()
+        config_path = os.environ.get('ATTENDANCE_CONFIG') or os.path.join(os.path.dirname(__file__), 'config.ini')
+        config.read(config_path)
+        return config
+    
+    @classmethod
+    def get_db_settings(cls):
+        """
+        Get connection arguments from the [database] section
+        
+        Falls back to the default XAMPP credentials when a key is missing.
+        
+        Returns:
+            dict: Keyword arguments for mysql.connector.connect()
+        """
+        config = cls.read_config()
+        return {
+            'host': config.get('database', 'host', fallback='localhost'),
+            'user': config.get('database', 'user', fallback='root'),
+            'password': config.get('database', 'password', fallback=''),
+            'database': config.get('database', 'database', fallback='attendance_system'),
+            'port': config.getint('database', 'port', fallback=3306),
+            'charset': 'utf8mb4',
+            'collation': 'utf8mb4_unicode_ci',
+            'autocommit': False
+        }
+    
+    @staticmethod
+    def _statement_time_limit(milliseconds):
+        """
+        Build an on_connect hook capping how long a statement may run
+        
+        Uses max_execution_time (MySQL, SELECT only) or, where that does
+        not exist, max_statement_time (MariaDB).
+        
+        Args:
+            milliseconds (int): Limit per statement
+        
+        Returns:
+            callable: Hook taking a new connection
+        """
+        def apply(connection):
+            cursor = connection.cursor()
+            try:
+                try:
+                    cursor.execute("SET SESSION max_execution_time = %s", (int(milliseconds),))
+                except Error:
+                    cursor.execute("SET SESSION max_statement_time = %s", (milliseconds / 1000,))
+            except Error as e:
+                logger.warning(f"Could not limit statement time: {e}")
+            finally:
+                cursor.close()
+        return apply
     
     @classmethod
-    def initialize_pool(cls):
-        """Initialize connection pool"""
-        if cls._connection_pool is None:
+    def initialize_pool(cls, statement_timeout_ms=None):
+        """
+        Initialize connection pool
+        
+        Args:
+            statement_timeout_ms (int, optional): Longest a statement may run;
+                defaults to [database] statement_timeout_ms (0 = no limit)
+        """
+        with cls._pool_lock:
+            if cls._connection_pool is not None and cls._connection_pool.pid == os.getpid():
+                return
             try:
-                # Read configuration
-                config = configparser.ConfigParser()
-                config_path = os.path.join(os.path.dirname(__file__), 'config.ini')
-                config.read(config_path)
+                config = cls.read_config()
                 
-                # Get database configuration
-                db_config = {
-                    'host': config.get('database', 'host'),
-                    'user': config.get('database', 'user'),
-                    'password': config.get('database', 'password'),
-                    'database': config.get('database', 'database'),
-                    'port': config.getint('database', 'port'),
-                    'charset': 'utf8mb4',
-                    'autocommit': False
-                }
+                # Statements are timed for /metrics and for the slow query log
+                from slow_query_log import get_slow_query_log
+                time_queries = (config.getboolean('metrics', 'query_timing', fallback=True)
+                                or get_slow_query_log() is not None)
+                
+                if statement_timeout_ms is None:
+                    statement_timeout_ms = config.getint('database', 'statement_timeout_ms', fallback=0)
                 
                 # Create connection pool
-                cls._connection_pool = pooling.MySQLConnectionPool(
-                    pool_name="attendance_pool",
-                    pool_size=5,
-                    pool_reset_session=True,
-                    **db_config
+                cls._connection_pool = ConnectionPool(
+                    cls.get_db_settings(),
+                    min_size=config.getint('pool', 'min_size', fallback=2),
+                    max_size=config.getint('pool', 'max_size', fallback=10),
+                    max_overflow=config.getint('pool', 'max_overflow', fallback=10),
+                    idle_timeout=config.getfloat('pool', 'idle_timeout', fallback=300),
+                    checkout_timeout=config.getfloat('pool', 'checkout_timeout', fallback=10),
+                    ping_on_checkout=config.getboolean('pool', 'ping_on_checkout', fallback=True),
+                    name="attendance_pool",
+                    cursor_wrapper=metrics.TimedCursor if time_queries else None,
+                    on_connect=cls._statement_time_limit(statement_timeout_ms) if statement_timeout_ms else None
                 )
                 
                 logger.info("Database connection pool initialized successfully")
-                
+            
             except Error as e:
                 logger.error(f"Error initializing database connection pool: {e}")
                 raise
@@ -52,25 +130,66 @@ class DatabaseConfig:
                 logger.error(f"Unexpected error during pool initialization: {e}")
                 raise
     
+    @classmethod
+    def get_pool(cls):
+        """
+        Get the process-wide connection pool, creating it on first use
+        
+        A pool inherited from a parent process is replaced, so forked
+        workers never share sockets with their parent.
+        
+        Returns:
+            ConnectionPool: Connection pool
+        """
+        pool = cls._connection_pool
+        if pool is None or pool.pid != os.getpid():
+            cls.initialize_pool()
+            pool = cls._connection_pool
+        return pool
+    
     @classmethod
     def get_connection(cls):
         """
         Get a connection from the pool
         
         Returns:
-            mysql.connector.connection.MySQLConnection: Database connection
+            connection_pool.PooledConnection: Database connection; close() returns it to the pool
         """
-        if cls._connection_pool is None:
-            cls.initialize_pool()
+        pool = cls.get_pool()
         
         try:
-            connection = cls._connection_pool.get_connection()
+            started = time.perf_counter()
+            connection = pool.get_connection()
+            metrics.POOL_CHECKOUT.observe(time.perf_counter() - started)
             logger.debug("Database connection obtained from pool")
             return connection
         except Error as e:
             logger.error(f"Error getting database connection: {e}")
             raise
     
+    @classmethod
+    def pool_stats(cls):
+        """
+        Get connection pool statistics
+        
+        Returns:
+            dict: Pool statistics, or an empty dict if the pool is not initialized
+        """
+        pool = cls._connection_pool
+        if pool is None or pool.pid != os.getpid():
+            return {}
+        return pool.stats()
+    
+    @classmethod
+    def close_pool(cls):
+        """Close all idle pooled connections and drop the pool"""
+        with cls._pool_lock:
+            pool = cls._connection_pool
+            cls._connection_pool = None
+        if pool is not None and pool.pid == os.getpid():
+            pool.close_all()
+            logger.info("Database connection pool closed")
+    
     @classmethod
     def test_connection(cls):
         """
@@ -100,6 +219,6 @@ def get_db_connection():
     Convenience function to get database connection
     
     Returns:
-        mysql.connector.connection.MySQLConnection: Database connection
+        connection_pool.PooledConnection: Database connection
     """
     return DatabaseConfig.get_connection()
@@ -1,45 +1,30 @@
 """
 Database Configuration for Attendance Management System
 """
-import mysql.connector
 from mysql.connector import Error
-import logging
+from db_config import DatabaseConfig as SharedDatabaseConfig
 from datetime import datetime
+from logger_config import logger
 
-# Configure logging
-logging.basicConfig(
-    filename='attendance_system.log',
-    level=logging.INFO,
-    format='%(asctime)s - %(levelname)s - %(message)s'
-)
+# Per-query messages, which [logging] sample_rates can thin out
+query_logger = logger.getChild('queries')
 
 class DatabaseConfig:
     """Database configuration and connection management"""
     
-    # Database credentials
-    DB_CONFIG = {
-        'host': 'localhost',
-        'user': 'root',
-        'password': '',  # Default XAMPP MySQL password is empty
-        'database': 'attendance_system',
-        'charset': 'utf8mb4',
-        'collation': 'utf8mb4_unicode_ci'
-    }
-    
     @staticmethod
     def get_connection():
         """
-        Create and return a database connection
+        Check out a connection from the shared pool in db_config
         Returns:
             connection object or None if connection fails
         """
         try:
-            connection = mysql.connector.connect(**DatabaseConfig.DB_CONFIG)
-            if connection.is_connected():
-                logging.info("Database connection established successfully")
-                return connection
+            # Credentials and pool sizing come from config.ini, so this API
+            # and the main Flask app share one bounded pool per process
+            return SharedDatabaseConfig.get_connection()
         except Error as e:
-            logging.error(f"Error connecting to MySQL database: {e}")
+            logger.error(f"Error connecting to MySQL database: {e}")
             print(f"❌ Database connection error: {e}")
             return None
     
@@ -66,23 +51,31 @@ class DatabaseConfig:
             
             if fetch:
                 results = cursor.fetchall()
-                logging.info(f"Query executed successfully, fetched {len(results)} rows")
+                query_logger.info(f"Query executed successfully, fetched {len(results)} rows")
                 return results
             else:
                 connection.commit()
-                logging.info(f"Query executed successfully, {cursor.rowcount} rows affected")
+                query_logger.info(f"Query executed successfully, {cursor.rowcount} rows affected")
                 return cursor.rowcount
                 
         except Error as e:
-            logging.error(f"Error executing query: {e}")
+            logger.error(f"Error executing query: {e}")
             print(f"❌ Query execution error: {e}")
             if connection:
-                connection.rollback()
+                try:
+                    connection.rollback()
+                except Error:
+                    # Connection already lost; close() below still frees its pool slot
+                    pass
             return None
         finally:
             if cursor:
-                cursor.close()
-            if connection and connection.is_connected():
+                try:
+                    cursor.close()
+                except Error:
+                    pass
+            if connection:
+                # Always return the slot to the pool, which discards dead connections
                 connection.close()
     
     @staticmethod
@@ -0,0 +1,256 @@
+"""
+Export Management Module
+Constant-memory export of the attendance register to CSV, XLSX and Parquet
+"""
+
+import csv
+import io
+import time
+from datetime import date, datetime
+from attendance_archive import history_source
+from db_config import get_db_connection
+from logger_config import logger
+
+class ExportError(Exception):
+    """Raised for invalid export requests or missing optional dependencies"""
+
+
+class ExportManager:
+    """Streams attendance joined with students and faculty to export files"""
+
+    FORMATS = ['csv', 'xlsx', 'parquet']
+
+    DEFAULT_CHUNK_SIZE = 10000
+
+    # Excel's hard limit per worksheet, including the header row
+    XLSX_MAX_ROWS = 1048576
+
+    COLUMNS = ['attendance_id', 'date', 'period', 'student_id', 'reg_no', 'student_name',
+               'subject', 'faculty_id', 'faculty_name', 'status', 'created_at']
+
+    CONTENT_TYPES = {
+        'csv': 'text/csv',
+        'xlsx': 'application/vnd.openxmlformats-officedocument.spreadsheetml.sheet',
+        'parquet': 'application/vnd.apache.parquet'
+    }
+
+    @staticmethod
+    def parse_filters(start_date=None, end_date=None, subject=None, faculty_id=None, student_id=None):
+        """
+        Validate export filters
+
+        Returns:
+            dict: Normalized filters (only those that were given)
+
+        Raises:
+            ExportError: If a filter value is invalid
+        """
+        filters = {}
+        for key, value in (('start_date', start_date), ('end_date', end_date)):
+            if value in (None, ''):
+                continue
+            if isinstance(value, str):
+                try:
+                    value = datetime.strptime(value, '%Y-%m-%d').date()
+                except ValueError:
+                    raise ExportError(f"Invalid {key}: {value}. Use YYYY-MM-DD")
+            filters[key] = value
+        if subject:
+            filters['subject'] = subject
+        for key, value in (('faculty_id', faculty_id), ('student_id', student_id)):
+            if value in (None, ''):
+                continue
+            try:
+                filters[key] = int(value)
+            except (TypeError, ValueError):
+                raise ExportError(f"Invalid {key}: {value}")
+        return filters
+
+    @staticmethod
+    def iter_chunks(filters=None, chunk_size=DEFAULT_CHUNK_SIZE):
+        """
+        Yield the filtered register in chunks, paging on attendance.id
+
+        Each chunk is one keyset-paginated query, so no query or cursor
+        ever holds more than chunk_size rows. Archived terms are included;
+        archived rows keep their attendance id, so the keyset covers both
+        tables.
+
+        Args:
+            filters (dict, optional): Output of parse_filters()
+            chunk_size (int): Rows per query
+
+        Yields:
+            list: Row tuples in COLUMNS order
+        """
+        filters = filters or {}
+        conditions = ["id > %s"]
+        params = []
+        if 'start_date' in filters:
+            conditions.append("date >= %s")
+            params.append(filters['start_date'])
+        if 'end_date' in filters:
+            conditions.append("date <= %s")
+            params.append(filters['end_date'])
+        if 'subject' in filters:
+            conditions.append("subject = %s")
+            params.append(filters['subject'])
+        if 'faculty_id' in filters:
+            conditions.append("faculty_id = %s")
+            params.append(filters['faculty_id'])
+        if 'student_id' in filters:
+            conditions.append("student_id = %s")
+            params.append(filters['student_id'])
+
+        last_id = 0
+        while True:
+            # Each table returns its own first chunk_size rows; the outer query merges them
+            source, source_params = history_source(' AND '.join(conditions), (last_id, *params, chunk_size),
+                                                   "ORDER BY id LIMIT %s")
+            query = f"""
+                SELECT h.id, h.date, h.period, h.student_id, s.reg_no, s.name,
+                       h.subject, h.faculty_id, f.name, h.status, h.created_at
+                FROM {source}
+                JOIN students s ON s.id = h.student_id
+                JOIN faculty f ON f.id = h.faculty_id
+                ORDER BY h.id
+                LIMIT %s
+            """
+            conn = get_db_connection()
+            cursor = conn.cursor()
+            try:
+                cursor.execute(query, (*source_params, chunk_size))
+                rows = cursor.fetchall()
+            finally:
+                cursor.close()
+                conn.close()
+
+            if not rows:
+                return
+            yield rows
+            if len(rows) < chunk_size:
+                return
+            last_id = rows[-1][0]
+
+    # ==================== WRITERS ====================
+
+    @staticmethod
+    def iter_csv(chunks):
+        """
+        Encode chunks as CSV text, one piece per chunk
+
+        Yields:
+            str: CSV text (the first piece starts with the header row)
+        """
+        buffer = io.StringIO()
+        writer = csv.writer(buffer)
+        writer.writerow(ExportManager.COLUMNS)
+        for rows in chunks:
+            writer.writerows(rows)
+            yield buffer.getvalue()
+            buffer.seek(0)
+            buffer.truncate()
+        if buffer.tell():
+            yield buffer.getvalue()
+
+    @staticmethod
+    def _write_csv(chunks, output):
+        with open(output, 'w', newline='', encoding='utf-8') as f:
+            for piece in ExportManager.iter_csv(chunks):
+                f.write(piece)
+
+    @staticmethod
+    def _write_xlsx(chunks, output):
+        try:
+            from openpyxl import Workbook
+        except ImportError:
+            raise ExportError("XLSX export requires openpyxl: pip install openpyxl")
+
+        # write_only workbooks stream rows to disk instead of building a DOM
+        workbook = Workbook(write_only=True)
+        sheet = None
+        sheet_rows = ExportManager.XLSX_MAX_ROWS
+        for rows in chunks:
+            for row in rows:
+                if sheet_rows >= ExportManager.XLSX_MAX_ROWS:
+                    sheet = workbook.create_sheet(f"Attendance {len(workbook.worksheets) + 1}")
+                    sheet.append(ExportManager.COLUMNS)
+                    sheet_rows = 1
+                sheet.append(row)
+                sheet_rows += 1
+        if sheet is None:
+            workbook.create_sheet("Attendance 1").append(ExportManager.COLUMNS)
+        workbook.save(output)
+
+    @staticmethod
+    def _write_parquet(chunks, output):
+        try:
+            import pyarrow as pa
+            import pyarrow.parquet as pq
+        except ImportError:
+            raise ExportError("Parquet export requires pyarrow: pip install pyarrow")
+
+        schema = pa.schema([
+            ('attendance_id', pa.int32()), ('date', pa.date32()), ('period', pa.int8()),
+            ('student_id', pa.int32()), ('reg_no', pa.string()), ('student_name', pa.string()),
+            ('subject', pa.string()), ('faculty_id', pa.int32()), ('faculty_name', pa.string()),
+            ('status', pa.string()), ('created_at', pa.timestamp('s'))
+        ])
+        # One row group per chunk keeps memory flat; low-cardinality string
+        # columns (status, subject) are dictionary-encoded by the writer
+        with pq.ParquetWriter(output, schema, compression='zstd') as writer:
+            for rows in chunks:
+                arrays = [pa.array(column, type=field.type)
+                          for column, field in zip(zip(*rows), schema)]
+                writer.write_table(pa.Table.from_arrays(arrays, schema=schema))
+
+    @staticmethod
+    def export(output, fmt='csv', filters=None, chunk_size=DEFAULT_CHUNK_SIZE):
+        """
+        Export the attendance register to a file
+
+        Args:
+            output (str or file): Destination path or binary file object
+                (file objects are supported for xlsx and parquet)
+            fmt (str): One of FORMATS
+            filters (dict, optional): Output of parse_filters()
+            chunk_size (int): Rows fetched and written per step
+
+        Returns:
+            dict: rows, seconds and rows_per_second
+        """
+        if fmt not in ExportManager.FORMATS:
+            raise ExportError(f"Invalid format. Must be one of: {', '.join(ExportManager.FORMATS)}")
+
+        counted = {'rows': 0}
+
+        def counting(chunks):
+            for rows in chunks:
+                counted['rows'] += len(rows)
+                yield rows
+
+        started = time.perf_counter()
+        chunks = counting(ExportManager.iter_chunks(filters, chunk_size))
+        writer = {'csv': ExportManager._write_csv,
+                  'xlsx': ExportManager._write_xlsx,
+                  'parquet': ExportManager._write_parquet}[fmt]
+        writer(chunks, output)
+        seconds = time.perf_counter() - started
+
+        result = {
+            'rows': counted['rows'],
+            'seconds': round(seconds, 3),
+            'rows_per_second': round(counted['rows'] / seconds) if seconds > 0 else counted['rows']
+        }
+        logger.info(f"Exported {result['rows']} attendance rows as {fmt} in {result['seconds']}s "
+                    f"({result['rows_per_second']} rows/s)")
+        return result
+
+    @staticmethod
+    def default_filename(fmt, filters=None):
+        """Build a descriptive download filename"""
+        filters = filters or {}
+        parts = ['attendance']
+        if 'start_date' in filters or 'end_date' in filters:
+            parts.append(f"{filters.get('start_date', 'start')}_{filters.get('end_date', date.today())}")
+        return '_'.join(str(part) for part in parts) + f".{fmt}"
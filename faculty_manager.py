@@ -1,11 +1,17 @@
 from mysql.connector import Error
 from db_config import get_db_connection
+from cache import copy_rows, faculty_cache, invalidate_faculty
 from logger_config import logger
 
 class FacultyManager:
     @staticmethod
     def get_all_faculty():
-        """Get all faculty and their subjects"""
+        """Get all faculty and their subjects (cached until a faculty write)"""
+        faculty = faculty_cache.get_or_load('all', FacultyManager._query_all_faculty)
+        return copy_rows(faculty) if faculty is not None else []
+
+    @staticmethod
+    def _query_all_faculty():
         try:
             conn = get_db_connection()
             cursor = conn.cursor(dictionary=True)
@@ -16,11 +22,17 @@ class FacultyManager:
             return faculty
         except Error as e:
             logger.error(f"Error getting faculty: {e}")
-            return []
+            return None
 
     @staticmethod
     def get_faculty_by_id(faculty_id):
-        """Get faculty by ID"""
+        """Get faculty by ID (cached until a faculty write)"""
+        faculty = faculty_cache.get_or_load(('id', faculty_id),
+                                            lambda: FacultyManager._query_faculty_by_id(faculty_id))
+        return copy_rows(faculty) if faculty else None
+
+    @staticmethod
+    def _query_faculty_by_id(faculty_id):
         try:
             conn = get_db_connection()
             cursor = conn.cursor(dictionary=True)
@@ -28,7 +40,34 @@ class FacultyManager:
             faculty = cursor.fetchone()
             cursor.close()
             conn.close()
-            return faculty
+            # Cache misses too, so unknown IDs do not hit the database each time
+            return faculty or {}
         except Error as e:
             logger.error(f"Error getting faculty: {e}")
             return None
+
+    @staticmethod
+    def add_faculty(name, subject):
+        """
+        Add a faculty member
+
+        Returns:
+            tuple: (success: bool, message: str, faculty_id: int or None)
+        """
+        if not name or not name.strip() or not subject or not subject.strip():
+            return (False, "Faculty name and subject cannot be empty", None)
+        try:
+            conn = get_db_connection()
+            cursor = conn.cursor()
+            cursor.execute("INSERT INTO faculty (name, subject) VALUES (%s, %s)",
+                           (name.strip(), subject.strip()))
+            conn.commit()
+            faculty_id = cursor.lastrowid
+            cursor.close()
+            conn.close()
+            invalidate_faculty()
+            logger.info(f"Added faculty: {name} ({subject}, ID: {faculty_id})")
+            return (True, f"Faculty '{name}' added successfully with ID: {faculty_id}", faculty_id)
+        except Error as e:
+            logger.error(f"Error adding faculty: {e}")
+            return (False, f"Database error: {e}", None)
@@ -0,0 +1,477 @@
+"""
+Live Feed Module
+Server-sent events pushing attendance changes to open dashboards
+
+Write paths publish the marks they commit. Marks committed by other
+processes are picked up from the attendance_changes log (change_log.py).
+Each connected dashboard gets an initial snapshot and then only deltas:
+
+    marks     [{student_id, date, period, subject, faculty_id, status}, ...]
+    stats     [{id, reg_no, name, total_present, ..., attendance_percentage}, ...]
+    resync    {date}  that date changed in a way marks cannot describe (deletes,
+                      bulk loads, or any write by another process when the change
+                      log is not installed); date is null when the client missed
+                      events and must reload everything
+
+Counters for the students touched by a batch are read once per batch by a
+background thread and fanned out to every subscriber, so database work
+follows the write rate, not the number of viewers.
+
+Each open stream holds a server thread. Under serve.py, streams are limited
+to the worker's threads minus reserved_threads, end when the worker starts
+to stop, and end after max_stream_seconds anyway; clients reconnect and
+resume from Last-Event-ID.
+"""
+
+import itertools
+import os
+import queue
+import secrets
+import threading
+import time
+from collections import deque
+from flask import Response, request, stream_with_context
+from mysql.connector import Error
+from attendance_stats import AttendanceStats
+from cache import invalidate_versions
+from change_log import ChangeReader, change_log_settings, prune_changes
+from db_config import DatabaseConfig, get_db_connection
+from serialization import dumps
+from logger_config import logger
+
+class FeedFullError(Exception):
+    """Raised when the subscriber limit is reached"""
+
+
+class Subscriber:
+    """One connected event stream"""
+
+    def __init__(self, max_queue):
+        self.events = queue.Queue(maxsize=max_queue)
+        self.overflowed = False
+
+
+class LiveFeed:
+    """In-process publish/subscribe hub for attendance events"""
+
+    def __init__(self, history=1000, max_queue=1000, max_subscribers=200,
+                 stats_interval=0.5, poll_interval=2.0, reserved_threads=None,
+                 max_stream_seconds=300):
+        """
+        Args:
+            history (int): Recent events kept for clients resuming with Last-Event-ID
+            max_queue (int): Events buffered per subscriber before it is told to resync
+            max_subscribers (int): Concurrent streams allowed in this process
+            stats_interval (float): Seconds between counter updates for touched students
+            poll_interval (float): Seconds between checks for writes made by other processes
+            reserved_threads (int, optional): Server threads kept free of streams
+                (defaults to half of them, at least one)
+            max_stream_seconds (float): Longest a stream stays open before the
+                client is made to reconnect; 0 disables
+        """
+        self.max_queue = max_queue
+        self.max_subscribers = max_subscribers
+        self.reserved_threads = reserved_threads
+        self.max_stream_seconds = max_stream_seconds
+        self.stats_interval = stats_interval
+        self.poll_interval = poll_interval
+        self.pid = os.getpid()
+        # Event IDs are only meaningful to the process that issued them
+        self.epoch = secrets.token_hex(4)
+
+        self._history = deque(maxlen=history)
+        self._subscribers = set()
+        self._lock = threading.Lock()
+        self._ids = itertools.count(1)
+        self._last_id = 0
+
+        self._dirty_students = set()
+        # Version bumps per attendance date caused by this process since the
+        # last poll, used when the change log is not installed
+        self._local_bumps = {}
+        # Marks published here and not yet seen in the change log:
+        # mark key -> monotonic times they were published
+        self._local_marks = {}
+        self._changes = None
+        self._versions = None
+        self._thread = None
+        self._wakeup = threading.Event()
+        self.stats = {'published': 0, 'dropped_subscribers': 0, 'resyncs': 0}
+
+    # ==================== SUBSCRIPTIONS ====================
+
+    def stream_limit(self, threads):
+        """
+        Streams allowed when the server has a fixed number of request threads
+
+        Args:
+            threads (int): Request threads of this process
+
+        Returns:
+            int: Streams that still leave reserved_threads for other requests
+        """
+        reserved = self.reserved_threads
+        if reserved is None:
+            reserved = threads // 2
+        return max(0, min(self.max_subscribers, threads - max(1, reserved)))
+
+    def subscribe(self, last_event_id=None, limit=None):
+        """
+        Register a subscriber
+
+        Args:
+            last_event_id (int, optional): Sequence number of the last event
+                the client saw; newer events still in history are queued
+            limit (int, optional): Streams allowed, if lower than max_subscribers
+
+        Returns:
+            tuple: (Subscriber, replayed: bool) where replayed is False if the
+                client needs a fresh snapshot
+
+        Raises:
+            FeedFullError: If the limit of open streams is reached
+        """
+        if limit is None:
+            limit = self.max_subscribers
+        subscriber = Subscriber(self.max_queue)
+        with self._lock:
+            if len(self._subscribers) >= min(limit, self.max_subscribers):
+                raise FeedFullError("Too many live feed subscribers")
+            replayed = last_event_id is not None and last_event_id == self._last_id
+            if (last_event_id is not None and self._history
+                    and self._history[0][0] <= last_event_id + 1 <= self._last_id):
+                missed = [event for event in self._history if event[0] > last_event_id]
+                if len(missed) <= self.max_queue:
+                    for event in missed:
+                        subscriber.events.put_nowait(event)
+                    replayed = True
+            self._subscribers.add(subscriber)
+        self._ensure_worker()
+        return subscriber, replayed
+
+    def unsubscribe(self, subscriber):
+        """Remove a subscriber"""
+        with self._lock:
+            self._subscribers.discard(subscriber)
+
+    def subscriber_count(self):
+        """Number of open streams"""
+        with self._lock:
+            return len(self._subscribers)
+
+    # ==================== PUBLISHING ====================
+
+    def publish(self, event_type, data):
+        """
+        Send an event to every subscriber
+
+        Subscribers whose buffer is full are dropped and reconnect with a
+        fresh snapshot rather than slowing down the writer.
+        """
+        with self._lock:
+            event_id = next(self._ids)
+            self._last_id = event_id
+            event = (event_id, event_type, dumps(data))
+            self._history.append(event)
+            for subscriber in list(self._subscribers):
+                try:
+                    subscriber.events.put_nowait(event)
+                except queue.Full:
+                    subscriber.overflowed = True
+                    self._subscribers.discard(subscriber)
+                    self.stats['dropped_subscribers'] += 1
+            self.stats['published'] += 1
+
+    def publish_marks(self, rows):
+        """
+        Publish committed attendance marks
+
+        Args:
+            rows (list): Dicts with student_id, faculty_id, subject, date,
+                period and status
+        """
+        if not rows:
+            return
+        now = time.monotonic()
+        with self._lock:
+            if not self._subscribers:
+                return
+            for row in rows:
+                key = str(row['date'])
+                self._local_bumps[key] = self._local_bumps.get(key, 0) + 1
+                self._local_marks.setdefault(_mark_key(row), []).append(now)
+            self._dirty_students.update(row['student_id'] for row in rows)
+
+        self.publish('marks', [{
+            'student_id': row['student_id'],
+            'date': row['date'],
+            'period': row['period'],
+            'subject': row['subject'],
+            'faculty_id': row['faculty_id'],
+            'status': row['status']
+        } for row in rows])
+        self._wakeup.set()
+
+    # ==================== BACKGROUND WORK ====================
+
+    def _ensure_worker(self):
+        with self._lock:
+            if self._thread is not None and self._thread.is_alive():
+                return
+            self._thread = threading.Thread(target=self._run, name='live-feed', daemon=True)
+            self._thread.start()
+
+    def _run(self):
+        next_poll = 0
+        while True:
+            self._wakeup.wait(self.poll_interval)
+            self._wakeup.clear()
+            if not self.subscriber_count():
+                # Forget the baseline so a later viewer does not get a stale resync
+                with self._lock:
+                    self._versions = None
+                    self._changes = None
+                    self._local_bumps = {}
+                    self._local_marks = {}
+                    self._dirty_students = set()
+                continue
+            # Let a burst of marks accumulate into one counter update
+            time.sleep(self.stats_interval)
+            try:
+                self._publish_stats()
+                if time.monotonic() >= next_poll:
+                    self._poll_versions()
+                    next_poll = time.monotonic() + self.poll_interval
+            except Exception as e:
+                logger.error(f"Live feed worker error: {e}")
+
+    def _publish_stats(self):
+        with self._lock:
+            student_ids, self._dirty_students = self._dirty_students, set()
+        if student_ids:
+            self.publish('stats', AttendanceStats.get_summaries(student_ids))
+
+    def _poll_versions(self):
+        """
+        Publish marks committed by other processes and resync dates whose
+        changes the marks do not account for
+
+        Version counters and the change log are read in one snapshot, where
+        every logged mark explains one version bump of its date. Bumps left
+        over come from deletes and bulk loads; subscribers get a resync for
+        their date and fresh counters for the students marked on it.
+        """
+        settings = change_log_settings()
+        try:
+            conn = get_db_connection()
+        except Error:
+            return
+        cursor = conn.cursor()
+        try:
+            conn.start_transaction(consistent_snapshot=True, readonly=True)
+            cursor.execute("SELECT name, version FROM table_versions WHERE name LIKE 'attendance:%'")
+            versions = {name.split(':', 1)[1]: int(version) for name, version in cursor.fetchall()}
+
+            changes = []
+            if self._changes is None or self._versions is None:
+                self._changes = ChangeReader.start(cursor, settings['lag_seconds'])
+                if self._changes is not None:
+                    # Marks up to the baseline versions are in every new snapshot already
+                    self._changes.read(cursor)
+            elif self._changes is not None:
+                changes = self._changes.read(cursor)
+            conn.rollback()
+
+            with self._lock:
+                previous, self._versions = self._versions, versions
+                local, self._local_bumps = self._local_bumps, {}
+            if previous is None:
+                return
+
+            explained = {}
+            if self._changes is None:
+                # change_log_setup.sql not run: only this process's marks are known
+                explained = local
+            else:
+                for change in changes:
+                    day = str(change[4])
+                    explained[day] = explained.get(day, 0) + 1
+                self._publish_remote_marks(changes)
+                prune_changes(conn, settings['retention_seconds'])
+
+            for day, version in versions.items():
+                if version - previous.get(day, 0) > explained.get(day, 0):
+                    cursor.execute("SELECT DISTINCT student_id FROM attendance WHERE date = %s", (day,))
+                    with self._lock:
+                        self._dirty_students.update(row[0] for row in cursor.fetchall())
+                    self.stats['resyncs'] += 1
+                    self.publish('resync', {'date': day})
+        except Error as e:
+            # table_versions_setup.sql not run: only local writes are pushed
+            logger.debug(f"Live feed poll skipped: {e}")
+        finally:
+            cursor.close()
+            conn.close()
+
+    def _publish_remote_marks(self, changes):
+        """Publish logged marks that this process did not publish itself"""
+        now = time.monotonic()
+        expiry = self._changes.lag_seconds + 2 * self.poll_interval
+        remote = []
+        with self._lock:
+            for _, student_id, faculty_id, subject, day, period, status in changes:
+                row = {'student_id': student_id, 'date': str(day), 'period': period,
+                       'subject': subject, 'faculty_id': faculty_id, 'status': status}
+                published = self._local_marks.get(_mark_key(row))
+                if published:
+                    published.pop(0)
+                else:
+                    remote.append(row)
+            # Rewrites with unchanged values are never logged
+            for key in list(self._local_marks):
+                times = [t for t in self._local_marks[key] if now - t < expiry]
+                if times:
+                    self._local_marks[key] = times
+                else:
+                    del self._local_marks[key]
+            self._dirty_students.update(row['student_id'] for row in remote)
+        if remote:
+            self.publish('marks', remote)
+
+
+def _mark_key(row):
+    # Write paths may pass IDs and dates as strings
+    return tuple(str(row[field]) for field in ('student_id', 'date', 'period', 'subject', 'faculty_id', 'status'))
+
+
+def _format_event(feed, event):
+    event_id, event_type, data = event
+    return f"id: {feed.epoch}-{event_id}\nevent: {event_type}\ndata: {data}\n\n"
+
+
+def _parse_event_id(feed, value):
+    """Sequence number from a Last-Event-ID this process issued, else None"""
+    epoch, _, sequence = (value or '').partition('-')
+    if epoch != feed.epoch or not sequence.isdigit():
+        return None
+    return int(sequence)
+
+
+# Longest a stream waits before checking whether it should end
+STOP_CHECK_SECONDS = 1.0
+
+
+def event_stream_response(feed, snapshot=None, last_event_id=None, keepalive=15):
+    """
+    Build a text/event-stream response for one subscriber
+
+    The subscription is opened before the snapshot is read, so no change
+    falls between the two; events overlapping the snapshot are absolute
+    values and safe to apply twice.
+
+    Under serve.py the stream ends as soon as the worker starts to stop
+    (environ 'serve.stopping') and is refused once only reserved threads
+    are left (environ 'serve.threads'). It also ends after the feed's
+    max_stream_seconds, so no thread is held indefinitely; the client
+    reconnects after the advertised retry delay and resumes from history.
+
+    Args:
+        feed (LiveFeed): Feed to subscribe to
+        snapshot (callable, optional): Returns the initial state, sent as a
+            'snapshot' event unless the client resumed from history
+        last_event_id (str, optional): Value of the Last-Event-ID header
+        keepalive (float): Seconds between keep-alive comments
+
+    Returns:
+        flask.Response: Streaming response (503 if the feed is full)
+    """
+    stopping = request.environ.get('serve.stopping')
+    threads = request.environ.get('serve.threads')
+    limit = feed.stream_limit(threads) if threads else None
+    if stopping is not None and stopping.is_set():
+        return Response(dumps({'status': 'error', 'message': 'Server is restarting'}), status=503,
+                        mimetype='application/json', headers={'Retry-After': '3'})
+    try:
+        subscriber, replayed = feed.subscribe(_parse_event_id(feed, last_event_id), limit)
+    except FeedFullError as e:
+        return Response(dumps({'status': 'error', 'message': str(e)}), status=503,
+                        mimetype='application/json', headers={'Retry-After': '30'})
+
+    started = time.monotonic()
+    deadline = started + feed.max_stream_seconds if feed.max_stream_seconds > 0 else None
+
+    def generate():
+        try:
+            yield "retry: 3000\n\n"
+            if snapshot is not None and not replayed:
+                yield f"event: snapshot\ndata: {dumps(snapshot())}\n\n"
+            last_sent = time.monotonic()
+            while not subscriber.overflowed:
+                now = time.monotonic()
+                if (stopping is not None and stopping.is_set()) or (deadline is not None and now >= deadline):
+                    # The client reconnects and resumes from Last-Event-ID
+                    return
+                # Short waits so a stopping worker is noticed within a second
+                try:
+                    event = subscriber.events.get(timeout=min(STOP_CHECK_SECONDS, keepalive))
+                except queue.Empty:
+                    if time.monotonic() - last_sent >= keepalive:
+                        yield ": keepalive\n\n"
+                        last_sent = time.monotonic()
+                    continue
+                yield _format_event(feed, event)
+                last_sent = time.monotonic()
+            yield f"event: resync\ndata: {dumps({'date': None})}\n\n"
+        finally:
+            feed.unsubscribe(subscriber)
+
+    return Response(stream_with_context(generate()), mimetype='text/event-stream',
+                    headers={'Cache-Control': 'no-cache', 'X-Accel-Buffering': 'no'})
+
+
+_feed = None
+_feed_lock = threading.Lock()
+
+
+def get_live_feed():
+    """
+    Get this process's live feed, configured from the [live] section
+
+    Returns:
+        LiveFeed or None: Feed, or None when [live] enabled is false
+    """
+    global _feed
+
+    if _feed is not None and _feed.pid == os.getpid():
+        return _feed
+
+    config = DatabaseConfig.read_config()
+    if not config.getboolean('live', 'enabled', fallback=True):
+        return None
+
+    with _feed_lock:
+        if _feed is None or _feed.pid != os.getpid():
+            _feed = LiveFeed(
+                history=config.getint('live', 'history', fallback=1000),
+                max_queue=config.getint('live', 'max_queue', fallback=1000),
+                max_subscribers=config.getint('live', 'max_subscribers', fallback=200),
+                stats_interval=config.getfloat('live', 'stats_interval', fallback=0.5),
+                poll_interval=config.getfloat('live', 'poll_interval', fallback=2.0),
+                reserved_threads=(config.getint('live', 'reserved_threads')
+                                  if config.has_option('live', 'reserved_threads') else None),
+                max_stream_seconds=config.getfloat('live', 'max_stream_seconds', fallback=300)
+            )
+    return _feed
+
+
+def publish_marks(rows):
+    """Publish committed marks to this process's feed, if enabled"""
+    # Every attendance write path ends here, so cached versions go too
+    invalidate_versions()
+    try:
+        feed = get_live_feed()
+        if feed is not None:
+            feed.publish_marks(rows)
+    except Exception as e:
+        # Never fail a write because the feed could not be notified
+        logger.error(f"Error publishing to live feed: {e}")
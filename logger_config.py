@@ -1,58 +1,378 @@
 """
 Logging Configuration Module
 Configures logging for the attendance management system
+
+By default records are handed to a background writer thread through a
+bounded queue, so request threads never wait on file or console I/O. The
+writer formats records (plain text or JSON), writes them in batches and
+flushes once per batch. Log files can rotate by size or time, and
+high-volume child loggers can be sampled.
+
+Rotation renames the file, which is only safe for one process at a time:
+a forked child (serve.py workers) that rotates writes to its own
+<file>.<pid> instead, as the write-behind journal does.
 """
 
+import atexit
+import itertools
+import json
 import logging
+import logging.handlers
 import configparser
 import os
+import queue
+import threading
+from datetime import datetime, timezone
+
+# LogRecord attributes that are not user-supplied `extra` fields
+_RECORD_ATTRIBUTES = set(vars(logging.LogRecord('', 0, '', 0, '', (), None))) | {'message', 'asctime'}
+
+
+class JsonFormatter(logging.Formatter):
+    """Format records as one JSON object per line"""
+
+    def format(self, record):
+        entry = {
+            'time': datetime.fromtimestamp(record.created, timezone.utc).isoformat(timespec='milliseconds'),
+            'level': record.levelname,
+            'logger': record.name,
+            'message': record.getMessage(),
+            'module': record.module,
+            'line': record.lineno,
+            'thread': record.threadName,
+        }
+        if record.exc_info and not record.exc_text:
+            record.exc_text = self.formatException(record.exc_info)
+        if record.exc_text:
+            entry['exception'] = record.exc_text
+        for key, value in vars(record).items():
+            if key not in _RECORD_ATTRIBUTES and key not in entry:
+                entry[key] = value
+        return json.dumps(entry, ensure_ascii=False, default=str)
+
+
+class SamplingFilter(logging.Filter):
+    """
+    Keep one in every N records below WARNING for selected loggers
+
+    Rates are matched on the logger name and its parents, so a rate for
+    'attendance_system.marks' also covers 'attendance_system.marks.bulk'.
+    Warnings and errors are never sampled.
+    """
+
+    def __init__(self, rates):
+        """
+        Args:
+            rates (dict): Logger name -> fraction of records kept (0-1)
+        """
+        super().__init__()
+        self.rates = rates
+        self._counters = {}
+
+    def _rate(self, name):
+        while name:
+            if name in self.rates:
+                return self.rates[name]
+            name = name.rpartition('.')[0]
+        return 1.0
+
+    def filter(self, record):
+        if record.levelno >= logging.WARNING:
+            return True
+        rate = self._rate(record.name)
+        if rate >= 1:
+            return True
+        if rate <= 0:
+            return False
+        counter = self._counters.get(record.name)
+        if counter is None:
+            counter = self._counters.setdefault(record.name, itertools.count())
+        # Deterministic: keep the first of every round(1 / rate) records
+        return next(counter) % max(1, round(1 / rate)) == 0
+
+
+class _BatchFlushMixin:
+    """Defer stream flushes until the writer finishes a batch"""
+
+    batching = False
+
+    def flush(self):
+        if not self.batching:
+            super().flush()
+
+
+class BatchFileHandler(_BatchFlushMixin, logging.FileHandler):
+    """File handler flushed once per batch"""
+
+
+class BatchRotatingFileHandler(_BatchFlushMixin, logging.handlers.RotatingFileHandler):
+    """Size-rotated file handler flushed once per batch"""
+
+
+class BatchTimedRotatingFileHandler(_BatchFlushMixin, logging.handlers.TimedRotatingFileHandler):
+    """Time-rotated file handler flushed once per batch"""
+
+
+class BatchStreamHandler(_BatchFlushMixin, logging.StreamHandler):
+    """Console handler flushed once per batch"""
+
+
+class AsyncQueueHandler(logging.handlers.QueueHandler):
+    """
+    Enqueue records without blocking
+
+    The message is resolved on the calling thread (so later changes to its
+    arguments cannot alter it) but formatting is left to the writer. When
+    the queue is full, records below WARNING are dropped and counted;
+    warnings and errors wait up to a second for room.
+    """
+
+    def __init__(self, log_queue):
+        super().__init__(log_queue)
+        self.dropped = 0
+
+    def prepare(self, record):
+        # The record only goes on to this process's writer, so no copy is needed
+        record.msg = record.getMessage()
+        record.args = None
+        if record.exc_info and not record.exc_text:
+            record.exc_text = logging.Formatter().formatException(record.exc_info)
+        record.exc_info = None
+        return record
+
+    def enqueue(self, record):
+        try:
+            if record.levelno >= logging.WARNING:
+                self.queue.put(record, timeout=1)
+            else:
+                self.queue.put_nowait(record)
+        except queue.Full:
+            self.dropped += 1
+
+
+class AsyncLogWriter:
+    """Background thread writing queued records to handlers in batches"""
+
+    _STOP = object()
+
+    def __init__(self, log_queue, handlers, batch_size=500, queue_handler=None):
+        """
+        Args:
+            log_queue (queue.Queue): Queue fed by AsyncQueueHandler
+            handlers (list): Handlers the records are written to
+            batch_size (int): Most records written between flushes
+            queue_handler (AsyncQueueHandler, optional): Source of the
+                dropped-record count reported in the log
+        """
+        self.queue = log_queue
+        self.handlers = handlers
+        self.batch_size = batch_size
+        self.queue_handler = queue_handler
+        self.reported_drops = 0
+        self._thread = None
+
+    def start(self):
+        """Start the writer thread"""
+        self._thread = threading.Thread(target=self._run, name='log-writer', daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        """Write everything still queued, then stop the writer thread"""
+        if self._thread is None or not self._thread.is_alive():
+            return
+        self.queue.put(self._STOP)
+        self._thread.join(timeout=5)
+
+    def _write_batch(self, records):
+        for handler in self.handlers:
+            handler.batching = True
+        try:
+            for record in records:
+                for handler in self.handlers:
+                    if record.levelno >= handler.level:
+                        handler.handle(record)
+        finally:
+            for handler in self.handlers:
+                handler.batching = False
+                handler.flush()
+
+    def _dropped_record(self):
+        dropped = self.queue_handler.dropped if self.queue_handler else 0
+        if dropped == self.reported_drops:
+            return None
+        record = logging.makeLogRecord({
+            'name': 'attendance_system.logging', 'levelno': logging.WARNING, 'levelname': 'WARNING',
+            'msg': f"Log queue full: dropped {dropped - self.reported_drops} records"})
+        self.reported_drops = dropped
+        return record
+
+    def _run(self):
+        stopping = False
+        while True:
+            batch = []
+            if not stopping:
+                record = self.queue.get()
+                if record is self._STOP:
+                    stopping = True
+                else:
+                    batch.append(record)
+            while len(batch) < self.batch_size:
+                try:
+                    record = self.queue.get_nowait()
+                except queue.Empty:
+                    break
+                if record is self._STOP:
+                    stopping = True
+                else:
+                    batch.append(record)
+            dropped = self._dropped_record()
+            if dropped is not None:
+                batch.append(dropped)
+            try:
+                if batch:
+                    self._write_batch(batch)
+            except Exception:
+                # Never let a bad record kill the writer
+                pass
+            if stopping and not batch:
+                return
+
+
+def _parse_rates(value):
+    """Parse 'name=rate, name=rate' into a dict"""
+    rates = {}
+    for item in value.split(','):
+        name, _, rate = item.strip().partition('=')
+        if name and rate:
+            rates[name.strip()] = float(rate)
+    return rates
+
+
+def _build_file_handler(config, log_file):
+    rotation = config.get('logging', 'rotation', fallback='none').lower()
+    backup_count = config.getint('logging', 'backup_count', fallback=5)
+    if rotation == 'size':
+        return BatchRotatingFileHandler(
+            log_file, encoding='utf-8', backupCount=backup_count,
+            maxBytes=config.getint('logging', 'max_bytes', fallback=10 * 1024 * 1024))
+    if rotation == 'time':
+        return BatchTimedRotatingFileHandler(
+            log_file, encoding='utf-8', backupCount=backup_count,
+            when=config.get('logging', 'when', fallback='midnight'),
+            interval=config.getint('logging', 'interval', fallback=1))
+    return BatchFileHandler(log_file, encoding='utf-8')
+
+
+_writers = {}
+_file_handlers = {}
+
 
 def setup_logger(name='attendance_system'):
     """
     Setup and configure logger
-    
+
     Args:
         name (str): Logger name
-        
+
     Returns:
         logging.Logger: Configured logger instance
     """
     # Read configuration
     config = configparser.ConfigParser()
-    config_path = os.path.join(os.path.dirname(__file__), 'config.ini')
+    config_path = os.environ.get('ATTENDANCE_CONFIG') or os.path.join(os.path.dirname(__file__), 'config.ini')
     config.read(config_path)
-    
+
     # Get logging configuration
     log_level = config.get('logging', 'level', fallback='INFO')
     log_file = config.get('logging', 'file', fallback='attendance_system.log')
-    log_format = config.get('logging', 'format', 
+    log_format = config.get('logging', 'format',
                            fallback='%(asctime)s - %(name)s - %(levelname)s - %(message)s')
-    
+
     # Create logger
     logger = logging.getLogger(name)
     logger.setLevel(getattr(logging, log_level))
-    
+    # Records go to these handlers only, not again through the root logger's
+    logger.propagate = False
+
     # Remove existing handlers
     logger.handlers.clear()
-    
+    previous = _writers.pop(name, None)
+    if previous is not None:
+        previous.stop()
+
     # Create file handler
-    file_handler = logging.FileHandler(log_file, encoding='utf-8')
+    file_handler = _build_file_handler(config, log_file)
     file_handler.setLevel(getattr(logging, log_level))
-    
+    _file_handlers[name] = file_handler
+
     # Create console handler
-    console_handler = logging.StreamHandler()
+    console_handler = BatchStreamHandler()
     console_handler.setLevel(logging.INFO)
-    
+
     # Create formatter
-    formatter = logging.Formatter(log_format)
+    if config.get('logging', 'output', fallback='text').lower() == 'json':
+        formatter = JsonFormatter()
+    else:
+        formatter = logging.Formatter(log_format)
     file_handler.setFormatter(formatter)
     console_handler.setFormatter(formatter)
-    
-    # Add handlers to logger
-    logger.addHandler(file_handler)
-    logger.addHandler(console_handler)
-    
+    handlers = [file_handler, console_handler]
+
+    rates = _parse_rates(config.get('logging', 'sample_rates', fallback=''))
+
+    if not config.getboolean('logging', 'async', fallback=True):
+        # Synchronous: write on the calling thread
+        for handler in handlers:
+            if rates:
+                handler.addFilter(SamplingFilter(rates))
+            logger.addHandler(handler)
+        return logger
+
+    # Asynchronous: the caller only enqueues; a writer thread does the I/O
+    log_queue = queue.Queue(maxsize=config.getint('logging', 'queue_size', fallback=10000))
+    queue_handler = AsyncQueueHandler(log_queue)
+    if rates:
+        # Sample before enqueueing so dropped records cost nothing more
+        queue_handler.addFilter(SamplingFilter(rates))
+    logger.addHandler(queue_handler)
+
+    writer = AsyncLogWriter(log_queue, handlers, config.getint('logging', 'batch_size', fallback=500),
+                            queue_handler)
+    writer.start()
+    _writers[name] = writer
     return logger
 
+
+def shutdown_logging():
+    """Write out queued records; called automatically at exit"""
+    for writer in list(_writers.values()):
+        writer.stop()
+
+
+def _after_fork():
+    for handler in _file_handlers.values():
+        if isinstance(handler, logging.handlers.BaseRotatingHandler):
+            _use_process_file(handler)
+    # Threads do not survive fork: give each child process its own writer
+    for writer in _writers.values():
+        writer.queue = queue.Queue(maxsize=writer.queue.maxsize)
+        if writer.queue_handler is not None:
+            writer.queue_handler.queue = writer.queue
+        writer.start()
+
+
+def _use_process_file(handler):
+    """Point a rotating handler inherited from the parent at <file>.<pid>"""
+    base = getattr(handler, 'parent_filename', handler.baseFilename)
+    handler.parent_filename = base
+    handler.close()
+    handler.baseFilename = f"{base}.{os.getpid()}"
+    handler.stream = handler._open()
+
+
+atexit.register(shutdown_logging)
+if hasattr(os, 'register_at_fork'):
+    os.register_at_fork(after_in_child=_after_fork)
+
 # Create global logger instance
 logger = setup_logger()
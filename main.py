@@ -6,6 +6,7 @@ Interactive menu-driven system for managing students and attendance
 import sys
 from datetime import date, datetime
 from student_manager import StudentManager
+from student_importer import StudentImporter
 from attendance_manager import AttendanceManager
 from db_config import DatabaseConfig
 from logger_config import logger
@@ -68,6 +69,25 @@ def add_multiple_students():
     """Add multiple students"""
     print("\n--- Add Multiple Students ---")
     try:
+        path = input("Import from a CSV/XLSX file? Enter path (or press Enter to type students): ").strip()
+        if path:
+            print("\nImporting...")
+            importer = StudentImporter()
+            result = importer.import_file(path)
+            
+            print(f"\n{'='*60}")
+            print(f"IMPORT RESULTS ({result['seconds']}s):")
+            print(f"  Rows read: {result['total']}")
+            print(f"  Inserted: {result['inserted']}")
+            print(f"  Failed: {result['failed']}")
+            print(f"{'='*60}")
+            
+            if result['failed'] and input("\nWrite error report? (y/n): ").strip().lower() == 'y':
+                report = input("Report file (default: import_errors.csv): ").strip() or 'import_errors.csv'
+                importer.write_error_report(report)
+                print(f"✓ Error report written to {report}")
+            return
+        
         count = int(input("How many students to add? "))
         students_list = []
         
@@ -75,7 +95,9 @@ def add_multiple_students():
             print(f"\nStudent {i+1}:")
             name = input("  Name: ").strip()
             email = input("  Email: ").strip()
-            students_list.append((name, email))
+            reg_no = input("  Registration number: ").strip()
+            phone = input("  Phone: ").strip()
+            students_list.append((name, email, reg_no, phone))
         
         print("\nProcessing...")
         success_count, failed_count, messages = StudentManager.add_students_bulk(students_list)
@@ -172,6 +194,10 @@ def mark_bulk_attendance():
             date_str = input("Enter date (YYYY-MM-DD): ").strip()
             attendance_date = date_str
         
+        faculty_id = int(input("Enter faculty ID: "))
+        subject = input("Enter subject: ").strip()
+        period = int(input("Enter period (1-5, default: 1): ").strip() or 1)
+        
         print("\nAttendance Status Options:")
         print("1. Present  2. Absent  3. Leave")
         
@@ -192,7 +218,8 @@ def mark_bulk_attendance():
             return
         
         print("\nProcessing...")
-        success_count, failed_count, messages = AttendanceManager.mark_bulk_attendance(attendance_list)
+        success_count, failed_count, messages = AttendanceManager.mark_bulk_attendance(
+            attendance_list, faculty_id=faculty_id, subject=subject, period=period)
         
         print(f"\n{'='*60}")
         print(f"BULK ATTENDANCE RESULTS:")
@@ -204,6 +231,8 @@ def mark_bulk_attendance():
             for msg in messages:
                 print(f"  - {msg}")
                 
+    except ValueError:
+        print("\n✗ ERROR: Invalid faculty ID or period.")
     except KeyboardInterrupt:
         print("\n\nOperation cancelled.")
     except Exception as e:
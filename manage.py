@@ -0,0 +1,339 @@
+"""
+Management Commands - Attendance Management System
+Maintenance tasks run from the command line, e.g.:
+    python manage.py rebuild-stats --verify
+    python manage.py export --format parquet --start 2024-01-01
+    python manage.py archive-term 2024-odd --file archive/2024-odd.parquet
+    python manage.py migrate --report migration_report.md
+"""
+
+import argparse
+import sys
+from benchmark import add_arguments as add_benchmark_arguments
+from logger_config import logger
+
+def rebuild_stats(args):
+    """Recompute the attendance aggregate tables from scratch"""
+    from attendance_stats import AttendanceStats
+
+    results = AttendanceStats.rebuild(verify_only=args.verify)
+    action = "Verified" if args.verify else "Rebuilt"
+    for table, result in results.items():
+        print(f"✓ {action} {table}: {result['rows']} rows, {result['mismatched']} mismatched")
+    drift = any(result['mismatched'] for result in results.values())
+    return 1 if args.verify and drift else 0
+
+def snapshot_cube(args):
+    """Build the attendance cube from the database and write a snapshot"""
+    from attendance_cube import AttendanceCube
+    from cube_snapshot import write_snapshot
+    from db_config import DatabaseConfig
+
+    output = args.output or DatabaseConfig.read_config().get('analytics', 'snapshot_path',
+                                                             fallback='attendance_cube.snapshot')
+    cube = AttendanceCube.from_database()
+    size = write_snapshot(cube, output, args.spare_days, args.spare_students)
+    print(f"✓ Wrote {output}: {cube.n_students} students x {cube.n_days} days, "
+          f"{size / 1024 / 1024:.1f} MB, watermark {cube.watermark}")
+    return 0
+
+def export(args):
+    """Export the attendance register to CSV, XLSX or Parquet"""
+    from export_manager import ExportManager
+
+    filters = ExportManager.parse_filters(args.start, args.end, args.subject,
+                                          args.faculty_id, args.student_id)
+    output = args.output or ExportManager.default_filename(args.format, filters)
+    result = ExportManager.export(output, args.format, filters, args.chunk_size)
+    print(f"✓ Exported {result['rows']} rows to {output} in {result['seconds']}s "
+          f"({result['rows_per_second']} rows/s)")
+    return 0
+
+def import_students(args):
+    """Import students from a CSV or XLSX file"""
+    from student_importer import StudentImporter
+
+    importer = StudentImporter(chunk_size=args.chunk_size, dry_run=args.dry_run)
+    result = importer.import_file(args.file)
+    action = "Validated" if args.dry_run else "Imported"
+    rate = round(result['total'] / result['seconds']) if result['seconds'] else result['total']
+    print(f"✓ {action} {result['inserted']} of {result['total']} students in {result['seconds']}s "
+          f"({rate} rows/s), {result['failed']} failed")
+    if result['failed']:
+        report = args.errors or f"{args.file}.errors.csv"
+        importer.write_error_report(report)
+        print(f"  Per-row errors written to {report}")
+    return 1 if result['failed'] else 0
+
+def add_term(args):
+    """Define an academic term"""
+    from attendance_archive import AttendanceArchive
+
+    term = AttendanceArchive.add_term(args.name, args.start, args.end)
+    print(f"✓ Term {term['name']}: {term['start_date']} to {term['end_date']}")
+    return 0
+
+def list_terms(args):
+    """List academic terms and their archive status"""
+    from attendance_archive import AttendanceArchive
+
+    terms = AttendanceArchive.get_terms()
+    if not terms:
+        print("No terms defined.")
+    for term in terms:
+        if term['archived_at'] is None:
+            status = "live"
+        elif term['rows_archived'] is None:
+            status = "closed, archival not finished; re-run archive-term"
+        else:
+            status = f"archived {term['archived_at']:%Y-%m-%d}, {term['rows_archived']} rows"
+        print(f"  {term['name']:<20} {term['start_date']} to {term['end_date']}  ({status})")
+    return 0
+
+def partition_attendance(args):
+    """Partition the attendance table, or add partitions ahead"""
+    from attendance_archive import AttendanceArchive
+
+    result = AttendanceArchive.partition(args.by, args.ahead, args.rebuild)
+    if result['action'] == 'unchanged':
+        print("✓ Partitions already cover the requested range")
+    else:
+        print(f"✓ {result['action'].capitalize()} {len(result['partitions'])} partitions: "
+              f"{', '.join(result['partitions'])}")
+    return 0
+
+def archive_term(args):
+    """Move a closed term's attendance into the archive"""
+    from attendance_archive import AttendanceArchive
+
+    result = AttendanceArchive.archive_term(args.name, args.file, args.chunk_days)
+    if result['export']:
+        print(f"✓ Exported {result['export']['rows']} rows to {args.file}")
+    if result['partitions_truncated']:
+        print(f"  Truncated partitions: {', '.join(result['partitions_truncated'])}")
+    print(f"✓ Archived {result['rows']} rows of {args.name} in {result['seconds']}s")
+    return 0
+
+def slow_queries(args):
+    """Rank slow statements by total time, or show one plan"""
+    import json
+    import slow_query_log
+
+    if args.reset:
+        slow_query_log.reset()
+        print("✓ Slow query log cleared")
+        return 0
+
+    if args.plan:
+        row = slow_query_log.get_plan(args.plan)
+        if row is None:
+            print(f"No slow query matches {args.plan}")
+            return 1
+        print(f"{row['fingerprint']}  {row['calls']} calls, {row['total_seconds']:.3f}s total, "
+              f"{row['max_seconds']:.3f}s max  (last from {row['last_caller']})")
+        print(f"\n{row['normalized_sql']}\n")
+        if row['plan'] is None:
+            print("No plan captured yet.")
+        else:
+            plan = json.loads(row['plan'])
+            if isinstance(plan, dict):
+                print(f"EXPLAIN failed: {plan.get('error')}")
+            for step in plan if isinstance(plan, list) else []:
+                marker = "  ← full scan" if step.get('type') == 'ALL' else ""
+                print(f"  {step.get('table')}: type={step.get('type')} key={step.get('key')} "
+                      f"rows={step.get('rows')} extra={step.get('Extra')}{marker}")
+        return 0
+
+    rows = slow_query_log.get_report(args.limit, args.order)
+    if not rows:
+        print("No slow queries recorded.")
+        return 0
+    print(f"{'FINGERPRINT':<17} {'CALLS':>6} {'TOTAL s':>9} {'AVG ms':>8} {'MAX ms':>8} {'ROWS':>8}  SCAN  CALLER / SQL")
+    for row in rows:
+        scan = "FULL" if row['full_scan'] else ("?" if row['full_scan'] is None else "")
+        print(f"{row['fingerprint']:<17} {row['calls']:>6} {row['total_seconds']:>9.3f} "
+              f"{row['avg_seconds'] * 1000:>8.1f} {row['max_seconds'] * 1000:>8.1f} "
+              f"{float(row['avg_rows'] or 0):>8.0f}  {scan:<4}  {row['last_caller']}")
+        print(f"{'':<17} {row['normalized_sql'][:args.width]}")
+    return 0
+
+def migrate(args):
+    """Apply schema migrations, or show their status"""
+    import migration_runner
+    from migration_runner import MigrationRunner
+
+    runner = MigrationRunner()
+    if args.status:
+        for row in runner.status():
+            print(f"{row['version']:04d} {row['name']:<45} {row['state']:<8} "
+                  f"{row['steps_done']}/{row['steps_total']} {row['applied_at'] or ''}"
+                  f"{'  (file changed since applied)' if row['modified'] else ''}")
+        return 0
+
+    pending = runner.pending(args.to)
+    if not pending:
+        print("✓ Schema is up to date")
+        return 0
+    for migration in pending:
+        print(f"{migration['version']:04d} {migration['name']}: "
+              f"{len(migration['steps']) - migration['steps_done']} steps to run")
+    if args.dry_run:
+        return 0
+
+    before = migration_runner.explain_hot_queries(args.runs) if args.report else None
+    applied = runner.migrate(args.to)
+    for version, name, milliseconds in applied:
+        print(f"✓ Applied {version:04d} {name} in {milliseconds} ms")
+    if args.report:
+        migration_runner.write_report(args.report, before, migration_runner.explain_hot_queries(args.runs), applied)
+        print(f"✓ Query plan report written to {args.report}")
+    return 0
+
+def generate_dataset(args):
+    """Generate and bulk load a synthetic institution"""
+    from dataset_generator import DatasetGenerator, parse_date
+
+    generator = DatasetGenerator(
+        students=args.students, faculty=args.faculty, years=args.years,
+        end_date=parse_date(args.end) if args.end else None, seed=args.seed,
+        absence_rate=args.absence_rate, late_rate=args.late_rate, section_size=args.section_size,
+        method=args.method, chunk_rows=args.chunk_rows, prefix=args.prefix)
+    print(f"Generating {args.students} students, {args.faculty} faculty and {generator.attendance_rows} "
+          f"attendance rows ({len(generator.days)} school days, {generator.start_date} to {generator.end_date})")
+
+    def progress(done, total):
+        print(f"  {done}/{total} attendance rows ({done / total:.0%})", end='\r', flush=True)
+
+    result = generator.generate(rebuild=not args.no_rebuild, progress=progress)
+    print(f"\n✓ Loaded {result['attendance_rows']} attendance rows for {result['students']} students "
+          f"in {result['seconds']}s ({result['rows_per_second']} rows/s, {result['method']})")
+    return 0
+
+def benchmark(args):
+    """Load-test the attendance APIs and save throughput and latency"""
+    import benchmark as bench
+
+    return bench.run(args)
+
+def build_parser():
+    """Build the command line parser"""
+    parser = argparse.ArgumentParser(description="Attendance Management System management commands")
+    commands = parser.add_subparsers(dest='command', required=True)
+
+    command = commands.add_parser('rebuild-stats', help="Recompute attendance aggregates from the attendance table")
+    command.add_argument('--verify', action='store_true',
+                         help="Only compare stored aggregates with recomputed ones; exit 1 on drift")
+    command.set_defaults(handler=rebuild_stats)
+
+    command = commands.add_parser('snapshot-cube', help="Write a memory-mappable attendance cube snapshot")
+    command.add_argument('--output', help="Snapshot file (default: [analytics] snapshot_path)")
+    command.add_argument('--spare-days', type=int, default=31,
+                         help="School days reserved for marks made after the snapshot (default: 31)")
+    command.add_argument('--spare-students', type=int,
+                         help="Student rows reserved for new students (default: 5%%, at least 64)")
+    command.set_defaults(handler=snapshot_cube)
+
+    command = commands.add_parser('export', help="Export attendance records to CSV, XLSX or Parquet")
+    command.add_argument('--format', choices=['csv', 'xlsx', 'parquet'], default='csv')
+    command.add_argument('--output', help="Output file (default: attendance[_<start>_<end>].<format>)")
+    command.add_argument('--start', help="First date to include (YYYY-MM-DD)")
+    command.add_argument('--end', help="Last date to include (YYYY-MM-DD)")
+    command.add_argument('--subject', help="Only this subject")
+    command.add_argument('--faculty-id', type=int, help="Only records marked by this faculty member")
+    command.add_argument('--student-id', type=int, help="Only this student")
+    command.add_argument('--chunk-size', type=int, default=10000, help="Rows fetched per query (default: 10000)")
+    command.set_defaults(handler=export)
+
+    command = commands.add_parser('import-students', help="Import students from a CSV or XLSX file")
+    command.add_argument('file', help="CSV or XLSX file with a header row (reg_no, name, email, phone, "
+                                      "board, marks, cgpa, join_date)")
+    command.add_argument('--errors', help="Per-row error report (default: <file>.errors.csv)")
+    command.add_argument('--chunk-size', type=int, default=1000, help="Rows inserted per statement (default: 1000)")
+    command.add_argument('--dry-run', action='store_true', help="Validate and check duplicates without inserting")
+    command.set_defaults(handler=import_students)
+
+    command = commands.add_parser('add-term', help="Define (or redefine) an academic term")
+    command.add_argument('name', help="Term name, e.g. 2024-odd")
+    command.add_argument('start', help="First day (YYYY-MM-DD)")
+    command.add_argument('end', help="Last day (YYYY-MM-DD)")
+    command.set_defaults(handler=add_term)
+
+    command = commands.add_parser('terms', help="List academic terms and their archive status")
+    command.set_defaults(handler=list_terms)
+
+    command = commands.add_parser('partition-attendance',
+                                  help="Partition attendance by date range, or add partitions ahead")
+    command.add_argument('--by', choices=['month', 'term'], default='month',
+                         help="One partition per month or per defined term (default: month)")
+    command.add_argument('--ahead', type=int, default=3,
+                         help="Months past today to create partitions for (default: 3)")
+    command.add_argument('--rebuild', action='store_true',
+                         help="Repartition an already partitioned table (rewrites the table)")
+    command.set_defaults(handler=partition_attendance)
+
+    command = commands.add_parser('archive-term', help="Move a closed term into the compressed archive")
+    command.add_argument('name', help="Term defined with add-term")
+    command.add_argument('--file', help="Also export the term to this .csv, .xlsx or .parquet file first")
+    command.add_argument('--chunk-days', type=int, default=7, help="Days moved per transaction (default: 7)")
+    command.set_defaults(handler=archive_term)
+
+    command = commands.add_parser('slow-queries', help="Rank slow statements by total time, with EXPLAIN plans")
+    command.add_argument('--limit', type=int, default=20, help="Fingerprints shown (default: 20)")
+    command.add_argument('--order', choices=['total', 'max', 'avg', 'calls'], default='total',
+                         help="Ranking (default: total time)")
+    command.add_argument('--width', type=int, default=160, help="Characters of SQL shown per row (default: 160)")
+    command.add_argument('--plan', metavar='FINGERPRINT', help="Show the stored EXPLAIN plan of one fingerprint")
+    command.add_argument('--reset', action='store_true', help="Forget every recorded slow query")
+    command.set_defaults(handler=slow_queries)
+
+    command = commands.add_parser('migrate', help="Apply pending schema migrations from migrations/")
+    command.add_argument('--status', action='store_true', help="List migrations and whether they are applied")
+    command.add_argument('--dry-run', action='store_true', help="Only list the pending migrations")
+    command.add_argument('--to', type=int, metavar='VERSION', help="Stop after this migration version")
+    command.add_argument('--report', help="Write a before/after EXPLAIN and timing report of the hot "
+                                          "attendance queries to this Markdown file")
+    command.add_argument('--runs', type=int, default=3,
+                         help="Timed executions per query in the report (default: 3)")
+    command.set_defaults(handler=migrate)
+
+    command = commands.add_parser('generate-dataset',
+                                  help="Generate synthetic students, faculty and attendance for load testing")
+    command.add_argument('--students', type=int, default=1000, help="Students (default: 1000)")
+    command.add_argument('--faculty', type=int, default=20, help="Faculty/subject pairs (default: 20)")
+    command.add_argument('--years', type=float, default=1, help="Years of attendance (default: 1)")
+    command.add_argument('--end', help="Last day of attendance (YYYY-MM-DD, default: yesterday)")
+    command.add_argument('--seed', type=int, default=42, help="Random seed (default: 42)")
+    command.add_argument('--absence-rate', type=float, default=0.08,
+                         help="Mean share of periods missed (default: 0.08)")
+    command.add_argument('--late-rate', type=float, default=0.03,
+                         help="Share of first periods attended late (default: 0.03)")
+    command.add_argument('--section-size', type=int, default=60, help="Students per section (default: 60)")
+    command.add_argument('--method', choices=['auto', 'infile', 'insert'], default='auto',
+                         help="LOAD DATA LOCAL INFILE, multi-row INSERT, or infile with fallback (default: auto)")
+    command.add_argument('--chunk-rows', type=int, default=200000,
+                         help="Attendance rows per transaction (default: 200000)")
+    command.add_argument('--prefix', default='GEN', help="reg_no / faculty name prefix (default: GEN)")
+    command.add_argument('--no-rebuild', action='store_true', help="Skip rebuilding the aggregates afterwards")
+    command.set_defaults(handler=generate_dataset)
+
+    command = commands.add_parser('benchmark', help="Load-test mark_bulk, mark, daily report and analytics")
+    add_benchmark_arguments(command)
+    command.set_defaults(handler=benchmark)
+
+    return parser
+
+def main(argv=None):
+    """Parse arguments and run the selected command"""
+    args = build_parser().parse_args(argv)
+    try:
+        return args.handler(args)
+    except KeyboardInterrupt:
+        print("\n\nOperation cancelled.")
+        return 130
+    except Exception as e:
+        print(f"\n✗ ERROR: {e}")
+        logger.error(f"Error in manage.py {args.command}: {e}")
+        return 1
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,350 @@
+"""
+Metrics Module
+Request, query and connection-pool instrumentation in Prometheus text format
+
+Flask hooks time every request per route template and count responses by
+status; the connection pool times checkouts and, through TimedCursor,
+every execute(). Both Flask apps serve the results at /metrics.
+
+Metrics are kept per process. Under a multi-worker server each scrape
+reaches one worker, so scrape each worker directly or aggregate with
+sum() across instances.
+"""
+
+import threading
+import time
+from bisect import bisect_left
+
+REQUEST_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10)
+QUERY_BUCKETS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5)
+
+CONTENT_TYPE = 'text/plain; version=0.0.4; charset=utf-8'
+
+SQL_OPERATIONS = {'SELECT', 'INSERT', 'UPDATE', 'DELETE', 'REPLACE', 'WITH', 'CALL',
+                  'CREATE', 'ALTER', 'DROP', 'TRUNCATE', 'SET', 'SHOW', 'EXPLAIN'}
+
+
+def _escape(value):
+    return str(value).replace('\\', '\\\\').replace('\n', '\\n').replace('"', '\\"')
+
+
+def _format_labels(names, values, extra=None):
+    pairs = [f'{name}="{_escape(value)}"' for name, value in zip(names, values)]
+    if extra:
+        pairs.append(extra)
+    return '{' + ','.join(pairs) + '}' if pairs else ''
+
+
+def _format_value(value):
+    if value == float('inf'):
+        return '+Inf'
+    if isinstance(value, float) and value.is_integer():
+        return str(int(value))
+    return repr(value) if isinstance(value, float) else str(value)
+
+
+class Counter:
+    """Monotonic counter with labels"""
+
+    type = 'counter'
+
+    def __init__(self, name, documentation, labelnames=()):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self._values = {}
+        self._lock = threading.Lock()
+
+    def inc(self, *labels, amount=1):
+        """Add amount to the series for labels"""
+        with self._lock:
+            self._values[labels] = self._values.get(labels, 0) + amount
+
+    def collect(self):
+        with self._lock:
+            items = sorted(self._values.items())
+        return [f"{self.name}{_format_labels(self.labelnames, labels)} {_format_value(value)}"
+                for labels, value in items]
+
+
+class Histogram:
+    """Cumulative-bucket histogram with labels"""
+
+    type = 'histogram'
+
+    def __init__(self, name, documentation, labelnames=(), buckets=REQUEST_BUCKETS):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self.buckets = tuple(sorted(buckets))
+        self._series = {}
+        self._lock = threading.Lock()
+
+    def observe(self, value, *labels):
+        """Record one observation for labels"""
+        index = bisect_left(self.buckets, value)
+        with self._lock:
+            series = self._series.get(labels)
+            if series is None:
+                # Per-bucket (non-cumulative) counts, +Inf last, then the sum
+                series = self._series[labels] = [0] * (len(self.buckets) + 1) + [0.0]
+            series[index] += 1
+            series[-1] += value
+
+    def collect(self):
+        with self._lock:
+            items = sorted((labels, list(series)) for labels, series in self._series.items())
+        lines = []
+        for labels, series in items:
+            cumulative = 0
+            for bound, count in zip(self.buckets + (float('inf'),), series):
+                cumulative += count
+                le = f'le="{_format_value(float(bound))}"'
+                lines.append(f"{self.name}_bucket{_format_labels(self.labelnames, labels, le)} {cumulative}")
+            lines.append(f"{self.name}_sum{_format_labels(self.labelnames, labels)} {_format_value(series[-1])}")
+            lines.append(f"{self.name}_count{_format_labels(self.labelnames, labels)} {cumulative}")
+        return lines
+
+
+class Callback:
+    """Gauge or counter whose samples are read at scrape time"""
+
+    def __init__(self, name, documentation, function, labelnames=(), metric_type='gauge'):
+        """
+        Args:
+            function (callable): Returns [(label_values: tuple, value), ...]
+        """
+        self.name = name
+        self.documentation = documentation
+        self.function = function
+        self.labelnames = tuple(labelnames)
+        self.type = metric_type
+
+    def collect(self):
+        return [f"{self.name}{_format_labels(self.labelnames, labels)} {_format_value(value)}"
+                for labels, value in self.function()]
+
+
+class Registry:
+    """Collection of metrics rendered together"""
+
+    def __init__(self):
+        self._metrics = []
+
+    def register(self, metric):
+        """Add a metric and return it"""
+        self._metrics.append(metric)
+        return metric
+
+    def render(self):
+        """
+        Render every metric in the Prometheus text exposition format
+
+        Returns:
+            str: Exposition text
+        """
+        lines = []
+        for metric in self._metrics:
+            try:
+                samples = metric.collect()
+            except Exception:
+                # A failing callback must not break the whole scrape
+                continue
+            lines.append(f"# HELP {metric.name} {metric.documentation}")
+            lines.append(f"# TYPE {metric.name} {metric.type}")
+            lines.extend(samples)
+        return '\n'.join(lines) + '\n'
+
+
+registry = Registry()
+
+REQUESTS = registry.register(Counter(
+    'http_requests_total', 'HTTP responses by route and status',
+    ('app', 'method', 'endpoint', 'status')))
+
+REQUEST_DURATION = registry.register(Histogram(
+    'http_request_duration_seconds', 'Time to produce the response (first byte for streams)',
+    ('app', 'method', 'endpoint'), REQUEST_BUCKETS))
+
+POOL_CHECKOUT = registry.register(Histogram(
+    'db_pool_checkout_seconds', 'Time to check out a pooled connection, including waits and pings',
+    (), QUERY_BUCKETS))
+
+QUERY_DURATION = registry.register(Histogram(
+    'db_query_duration_seconds', 'Time from execute() until the result is fully fetched',
+    ('operation',), QUERY_BUCKETS))
+
+QUERY_ERRORS = registry.register(Counter(
+    'db_query_errors_total', 'Statements that raised an error', ('operation',)))
+
+
+def _pool_stats():
+    from db_config import DatabaseConfig
+
+    return DatabaseConfig.pool_stats()
+
+
+def _pool_connections():
+    stats = _pool_stats()
+    if not stats:
+        return []
+    return [(('in_use',), stats['in_use']), (('idle',), stats['idle']), (('overflow',), stats['overflow'])]
+
+
+def _pool_value(key):
+    def read():
+        stats = _pool_stats()
+        return [((), stats[key])] if stats else []
+    return read
+
+
+registry.register(Callback('db_pool_connections', 'Pooled connections by state',
+                           _pool_connections, ('state',)))
+registry.register(Callback('db_pool_waiting', 'Threads waiting for a free connection',
+                           _pool_value('waiting')))
+registry.register(Callback('db_pool_max_size', 'Configured pool size', _pool_value('max_size')))
+registry.register(Callback('db_pool_checkouts_total', 'Connections checked out',
+                           _pool_value('checkouts'), metric_type='counter'))
+registry.register(Callback('db_pool_timeouts_total', 'Checkouts that gave up waiting',
+                           _pool_value('timeouts'), metric_type='counter'))
+registry.register(Callback('db_pool_connections_created_total', 'Connections opened',
+                           _pool_value('created'), metric_type='counter'))
+
+
+def sql_operation(statement):
+    """Leading SQL keyword of a statement, for low-cardinality labels"""
+    if isinstance(statement, (bytes, bytearray)):
+        statement = statement[:32].decode('utf-8', 'replace')
+    words = statement.lstrip(' \t\r\n(').split(None, 1)
+    operation = words[0].upper() if words else ''
+    return operation if operation in SQL_OPERATIONS else 'OTHER'
+
+
+# Called as observer(statement, params, seconds, rows, many) after each
+# statement completes; see slow_query_log.py
+QUERY_OBSERVERS = []
+
+
+class TimedCursor:
+    """
+    Cursor proxy recording how long each statement takes
+
+    A statement's time runs from execute() until its result is fully
+    fetched (or the next statement, or close()), so rows streamed from an
+    unbuffered cursor are included.
+    """
+
+    def __init__(self, cursor):
+        self._cursor = cursor
+        # [statement, params, seconds, fetched_rows, many] of the open statement
+        self._pending = None
+
+    def __getattr__(self, name):
+        return getattr(self._cursor, name)
+
+    def __iter__(self):
+        return iter(self._cursor)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
+
+    def _finish(self):
+        pending, self._pending = self._pending, None
+        if pending is None:
+            return
+        statement, params, seconds, rows, many = pending
+        QUERY_DURATION.observe(seconds, sql_operation(statement))
+        if QUERY_OBSERVERS:
+            if rows is None:
+                rows = max(getattr(self._cursor, 'rowcount', 0) or 0, 0)
+            for observer in QUERY_OBSERVERS:
+                observer(statement, params, seconds, rows, many)
+
+    def _timed(self, method, many, operation, *args, **kwargs):
+        self._finish()
+        started = time.perf_counter()
+        try:
+            result = method(operation, *args, **kwargs)
+        except Exception:
+            QUERY_ERRORS.inc(sql_operation(operation))
+            QUERY_DURATION.observe(time.perf_counter() - started, sql_operation(operation))
+            raise
+        params = args[0] if args else kwargs.get('seq_params' if many else 'params')
+        self._pending = [operation, params, time.perf_counter() - started, None, many]
+        return result
+
+    def _fetch(self, method, exhausts, *args, **kwargs):
+        started = time.perf_counter()
+        result = method(*args, **kwargs)
+        pending = self._pending
+        if pending is not None:
+            pending[2] += time.perf_counter() - started
+            fetched = len(result) if isinstance(result, list) else (0 if result is None else 1)
+            pending[3] = (pending[3] or 0) + fetched
+            if exhausts or not result:
+                self._finish()
+        return result
+
+    def execute(self, operation, *args, **kwargs):
+        return self._timed(self._cursor.execute, False, operation, *args, **kwargs)
+
+    def executemany(self, operation, *args, **kwargs):
+        return self._timed(self._cursor.executemany, True, operation, *args, **kwargs)
+
+    def fetchall(self):
+        return self._fetch(self._cursor.fetchall, True)
+
+    def fetchmany(self, *args, **kwargs):
+        return self._fetch(self._cursor.fetchmany, False, *args, **kwargs)
+
+    def fetchone(self):
+        return self._fetch(self._cursor.fetchone, False)
+
+    def close(self):
+        self._finish()
+        return self._cursor.close()
+
+
+def render():
+    """Render every metric of this process"""
+    return registry.render()
+
+
+def init_app(app, name):
+    """
+    Time requests and serve /metrics on a Flask app
+
+    Disabled by [metrics] enabled = false; [metrics] query_timing = false
+    keeps request and pool metrics but skips per-query timing.
+
+    Args:
+        app (Flask): Application
+        name (str): Value of the app label
+    """
+    from flask import Response, g, request
+    from db_config import DatabaseConfig
+
+    if not DatabaseConfig.read_config().getboolean('metrics', 'enabled', fallback=True):
+        return
+
+    @app.before_request
+    def _start_timer():
+        g.metrics_started = time.perf_counter()
+
+    @app.after_request
+    def _record_request(response):
+        started = g.pop('metrics_started', None)
+        if started is not None:
+            # Route templates, not raw paths, keep label cardinality bounded
+            endpoint = request.url_rule.rule if request.url_rule is not None else 'unmatched'
+            REQUEST_DURATION.observe(time.perf_counter() - started, name, request.method, endpoint)
+            REQUESTS.inc(name, request.method, endpoint, str(response.status_code))
+        return response
+
+    def metrics_view():
+        return Response(render(), content_type=CONTENT_TYPE)
+
+    app.add_url_rule('/metrics', 'metrics', metrics_view)
@@ -0,0 +1,503 @@
+"""
+Migration Runner Module
+Versioned, resumable schema migrations
+
+Migrations are the numbered files in migrations/ (NNNN_description.sql),
+applied in order to the configured database and recorded in the
+schema_migrations table with a checksum of the file. Each statement is a
+step:
+
+- DDL (CREATE, ALTER, DROP, ...) commits implicitly in MySQL, so it runs
+  on its own and the step is recorded right after; an interrupted
+  migration resumes at the first unfinished step instead of re-running
+  DDL that already happened.
+- Consecutive other statements (INSERT, UPDATE, ...) run in one
+  transaction together with the progress update, so they apply fully or
+  not at all.
+
+Index builds should ask for ALGORITHM=INPLACE, LOCK=NONE so reads and
+writes continue while they run. DDL waits at most [migrations]
+lock_wait_timeout seconds for its metadata lock (and is retried) rather
+than queueing every request behind a long transaction. Adding an index
+that already exists or dropping one that is already gone counts as done.
+
+    python manage.py migrate --report migration_report.md
+"""
+
+import hashlib
+import os
+import re
+import time
+from datetime import date
+import mysql.connector
+from mysql.connector import Error, errorcode
+from db_config import DatabaseConfig
+from logger_config import logger
+
+class MigrationError(Exception):
+    """Raised when migrations cannot be applied"""
+
+
+MIGRATIONS_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'migrations')
+
+MIGRATION_FILE = re.compile(r'^(\d{4})_(\w+)\.sql$')
+
+# Statements that commit implicitly and cannot share a transaction
+DDL_KEYWORDS = {'CREATE', 'ALTER', 'DROP', 'RENAME', 'TRUNCATE', 'ANALYZE', 'OPTIMIZE'}
+
+# Index steps that fail only because they already happened
+ALREADY_APPLIED_ERRORS = {errorcode.ER_DUP_KEYNAME, errorcode.ER_CANT_DROP_FIELD_OR_KEY}
+
+LOCK_NAME = 'attendance_schema_migrations'
+
+SCHEMA_MIGRATIONS_TABLE = """
+    CREATE TABLE IF NOT EXISTS schema_migrations (
+        version INT PRIMARY KEY,
+        name VARCHAR(255) NOT NULL,
+        checksum CHAR(64) NOT NULL,
+        steps_total INT NOT NULL,
+        steps_done INT NOT NULL DEFAULT 0,
+        started_at TIMESTAMP NULL,
+        applied_at TIMESTAMP NULL,
+        execution_ms INT NULL
+    ) ENGINE=InnoDB
+"""
+
+
+def split_sql(text):
+    """
+    Split SQL text into statements
+
+    Unlike a plain split on ';', semicolons inside strings, quoted
+    identifiers and comments are left alone, and DELIMITER lines (as used
+    for multi-statement triggers and procedures) change the separator.
+
+    Args:
+        text (str): SQL script
+
+    Returns:
+        list: (line number, statement) pairs, without trailing delimiters
+    """
+    statements = []
+    delimiter = ';'
+    current = []
+    start_line = None
+    line = 1
+    i = 0
+    length = len(text)
+
+    while i < length:
+        char = text[i]
+
+        # DELIMITER is a client command, only valid at the start of a statement
+        if start_line is None and char in 'dD' and (i == 0 or text[i - 1] == '\n'):
+            match = re.match(r'DELIMITER[ \t]+(\S+)[^\n]*', text[i:], re.I)
+            if match:
+                delimiter = match.group(1)
+                i += match.end()
+                continue
+
+        if char == '\n':
+            line += 1
+
+        if char in " \t\r\n" and start_line is None:
+            i += 1
+            continue
+
+        if text.startswith(delimiter, i):
+            statement = ''.join(current).strip()
+            if statement:
+                statements.append((start_line, statement))
+            current = []
+            start_line = None
+            i += len(delimiter)
+            continue
+
+        if char == '#' or (text.startswith('--', i) and (i + 2 >= length or text[i + 2] in ' \t\r\n')):
+            end = text.find('\n', i)
+            end = length if end == -1 else end
+            if start_line is not None:
+                current.append(text[i:end])
+            i = end
+            continue
+
+        if text.startswith('/*', i):
+            end = text.find('*/', i + 2)
+            end = length if end == -1 else end + 2
+            comment = text[i:end]
+            # /*! ... */ is executed by MySQL, so it starts a statement
+            if start_line is None and comment.startswith('/*!'):
+                start_line = line
+            if start_line is not None:
+                current.append(comment)
+            line += comment.count('\n')
+            i = end
+            continue
+
+        if start_line is None:
+            start_line = line
+
+        if char in "'\"`":
+            j = i + 1
+            while j < length:
+                if text[j] == '\\' and char != '`':
+                    j += 2
+                    continue
+                if text[j] == char:
+                    if j + 1 < length and text[j + 1] == char:
+                        j += 2
+                        continue
+                    break
+                j += 1
+            literal = text[i:j + 1]
+            current.append(literal)
+            line += literal.count('\n')
+            i = j + 1
+            continue
+
+        current.append(char)
+        i += 1
+
+    statement = ''.join(current).strip()
+    if statement:
+        statements.append((start_line, statement))
+    return statements
+
+
+def is_ddl(statement):
+    """Whether a statement commits implicitly"""
+    words = re.sub(r'^(\s|/\*[^!].*?\*/)+', '', statement, flags=re.S).split(None, 1)
+    return bool(words) and words[0].upper() in DDL_KEYWORDS
+
+
+def _connect():
+    # A dedicated connection: long DDL must not hold a pooled connection
+    # or be reported by the slow query log
+    return mysql.connector.connect(**DatabaseConfig.get_db_settings())
+
+
+def load_migrations(directory=MIGRATIONS_DIR):
+    """
+    Read the migration files
+
+    Returns:
+        list: Dicts with version, name, path, checksum and steps, in order
+
+    Raises:
+        MigrationError: If two files share a version
+    """
+    migrations = {}
+    for filename in sorted(os.listdir(directory)) if os.path.isdir(directory) else []:
+        match = MIGRATION_FILE.match(filename)
+        if not match:
+            continue
+        version = int(match.group(1))
+        if version in migrations:
+            raise MigrationError(f"Duplicate migration version {version}: "
+                                 f"{migrations[version]['path']} and {filename}")
+        path = os.path.join(directory, filename)
+        with open(path, encoding='utf-8') as f:
+            text = f.read()
+        migrations[version] = {
+            'version': version,
+            'name': match.group(2),
+            'path': path,
+            'checksum': hashlib.sha256(text.encode('utf-8')).hexdigest(),
+            'steps': split_sql(text),
+        }
+    return [migrations[version] for version in sorted(migrations)]
+
+
+class MigrationRunner:
+    """Applies pending migrations to the configured database"""
+
+    def __init__(self, directory=MIGRATIONS_DIR):
+        config = DatabaseConfig.read_config()
+        self.directory = directory
+        self.lock_wait_timeout = config.getint('migrations', 'lock_wait_timeout', fallback=5)
+        self.lock_retries = config.getint('migrations', 'lock_retries', fallback=10)
+
+    @staticmethod
+    def _applied(cursor):
+        cursor.execute(SCHEMA_MIGRATIONS_TABLE)
+        cursor.execute("""
+            SELECT version, name, checksum, steps_total, steps_done, applied_at, execution_ms
+            FROM schema_migrations
+        """)
+        columns = [column[0] for column in cursor.description]
+        return {row[0]: dict(zip(columns, row)) for row in cursor.fetchall()}
+
+    def status(self):
+        """
+        Compare migration files with schema_migrations
+
+        Returns:
+            list: Dicts with version, name, state ('applied', 'partial',
+                'pending' or 'missing' for records without a file),
+                steps_done, steps_total, applied_at and modified (file
+                changed since it was applied)
+        """
+        conn = _connect()
+        cursor = conn.cursor()
+        try:
+            applied = self._applied(cursor)
+            conn.commit()
+        finally:
+            cursor.close()
+            conn.close()
+
+        rows = []
+        for migration in load_migrations(self.directory):
+            record = applied.pop(migration['version'], None)
+            if record is None:
+                state, done = 'pending', 0
+            else:
+                state, done = ('applied' if record['applied_at'] else 'partial'), record['steps_done']
+            rows.append({
+                'version': migration['version'], 'name': migration['name'], 'state': state,
+                'steps_done': done, 'steps_total': len(migration['steps']),
+                'applied_at': record['applied_at'] if record else None,
+                'modified': record is not None and record['checksum'] != migration['checksum'],
+            })
+        for record in applied.values():
+            rows.append({
+                'version': record['version'], 'name': record['name'], 'state': 'missing',
+                'steps_done': record['steps_done'], 'steps_total': record['steps_total'],
+                'applied_at': record['applied_at'], 'modified': False,
+            })
+        return sorted(rows, key=lambda row: row['version'])
+
+    def pending(self, target=None):
+        """
+        Migrations not yet fully applied
+
+        Args:
+            target (int, optional): Highest version to include
+
+        Returns:
+            list: Migration dicts (see load_migrations) with steps_done
+        """
+        states = {row['version']: row for row in self.status()}
+        migrations = []
+        for migration in load_migrations(self.directory):
+            state = states[migration['version']]
+            if state['state'] == 'applied' or (target is not None and migration['version'] > target):
+                continue
+            if state['state'] == 'partial' and state['modified']:
+                raise MigrationError(f"Migration {migration['version']} was changed after it was "
+                                     f"partly applied; restore the file or finish it by hand")
+            migrations.append(dict(migration, steps_done=state['steps_done']))
+        return migrations
+
+    def _execute_ddl(self, cursor, statement):
+        for attempt in range(self.lock_retries + 1):
+            try:
+                cursor.execute(statement)
+                if cursor.with_rows:
+                    cursor.fetchall()
+                return True
+            except Error as e:
+                if e.errno in ALREADY_APPLIED_ERRORS:
+                    logger.warning(f"Migration step already applied ({e.msg}); continuing")
+                    return False
+                if e.errno != errorcode.ER_LOCK_WAIT_TIMEOUT or attempt == self.lock_retries:
+                    raise
+                # Give up the metadata lock queue so requests keep flowing, then retry
+                logger.warning(f"Waiting for a metadata lock (attempt {attempt + 1}): {e.msg}")
+                time.sleep(min(30, 2 ** attempt))
+
+    def _apply(self, conn, cursor, migration):
+        steps = migration['steps']
+        done = migration['steps_done']
+        started = time.perf_counter()
+        cursor.execute("""
+            INSERT INTO schema_migrations (version, name, checksum, steps_total, steps_done, started_at)
+            VALUES (%s, %s, %s, %s, 0, NOW())
+            ON DUPLICATE KEY UPDATE checksum = VALUES(checksum), steps_total = VALUES(steps_total)
+        """, (migration['version'], migration['name'], migration['checksum'], len(steps)))
+        conn.commit()
+
+        while done < len(steps):
+            line, statement = steps[done]
+            try:
+                if is_ddl(statement):
+                    self._execute_ddl(cursor, statement)
+                    done += 1
+                else:
+                    # Consecutive non-DDL steps share one transaction
+                    end = done
+                    while end < len(steps) and not is_ddl(steps[end][1]):
+                        line, statement = steps[end]
+                        cursor.execute(statement)
+                        if cursor.with_rows:
+                            cursor.fetchall()
+                        end += 1
+                    done = end
+                cursor.execute("UPDATE schema_migrations SET steps_done = %s WHERE version = %s",
+                               (done, migration['version']))
+                conn.commit()
+            except Error as e:
+                conn.rollback()
+                raise MigrationError(f"Migration {migration['version']} ({migration['name']}) failed at "
+                                     f"line {line}: {e}") from e
+            logger.info(f"Migration {migration['version']}: step {done}/{len(steps)} done")
+
+        elapsed_ms = int((time.perf_counter() - started) * 1000)
+        cursor.execute("""
+            UPDATE schema_migrations SET applied_at = NOW(), execution_ms = COALESCE(execution_ms, 0) + %s
+            WHERE version = %s
+        """, (elapsed_ms, migration['version']))
+        conn.commit()
+        logger.info(f"Applied migration {migration['version']} ({migration['name']}) in {elapsed_ms} ms")
+        return elapsed_ms
+
+    def migrate(self, target=None):
+        """
+        Apply pending migrations in order
+
+        Args:
+            target (int, optional): Stop after this version
+
+        Returns:
+            list: (version, name, milliseconds) of each migration applied
+
+        Raises:
+            MigrationError: If another run is in progress or a step fails
+        """
+        conn = _connect()
+        cursor = conn.cursor()
+        applied = []
+        try:
+            cursor.execute("SELECT GET_LOCK(%s, 0)", (LOCK_NAME,))
+            if not cursor.fetchone()[0]:
+                raise MigrationError("Another migration run is in progress")
+            try:
+                cursor.execute("SET SESSION lock_wait_timeout = %s", (self.lock_wait_timeout,))
+                for migration in self.pending(target):
+                    applied.append((migration['version'], migration['name'],
+                                    self._apply(conn, cursor, migration)))
+            finally:
+                cursor.execute("SELECT RELEASE_LOCK(%s)", (LOCK_NAME,))
+                cursor.fetchall()
+        finally:
+            cursor.close()
+            conn.close()
+        return applied
+
+
+# ==================== QUERY PLANS ====================
+
+# Representative shapes of the attendance queries the indexes are for
+HOT_QUERIES = [
+    ('daily analysis by student (get_daily_analysis)', """
+        SELECT s.name, s.reg_no,
+               COUNT(CASE WHEN a.status = 'Present' THEN 1 END) as present,
+               COUNT(CASE WHEN a.status = 'Absent' THEN 1 END) as absent,
+               COUNT(CASE WHEN a.status = 'Late' THEN 1 END) as late,
+               GROUP_CONCAT(CONCAT(a.period, ':', a.status) ORDER BY a.period) as period_details
+        FROM students s
+        LEFT JOIN attendance a ON s.id = a.student_id AND a.date = %(date)s
+        GROUP BY s.id, s.name, s.reg_no
+        ORDER BY s.name
+    """),
+    ('period summary of a day (daily_period_rollup rebuild)', """
+        SELECT period, status, COUNT(*) FROM attendance
+        WHERE date = %(date)s
+        GROUP BY period, status
+    """),
+    ('student summary (get_attendance_summary counters)', """
+        SELECT status, COUNT(*) FROM attendance
+        WHERE student_id = %(student_id)s
+        GROUP BY status
+    """),
+    ('all student summaries (student_attendance_stats rebuild)', """
+        SELECT student_id, COUNT(*), SUM(status = 'Present'), SUM(status = 'Absent'), SUM(status = 'Late')
+        FROM attendance
+        GROUP BY student_id
+    """),
+    ('student history page (get_student_attendance)', """
+        SELECT id, date, period, subject, faculty_id, status, created_at FROM attendance
+        WHERE student_id = %(student_id)s
+        ORDER BY date DESC, period DESC
+        LIMIT 51
+    """),
+]
+
+
+def _sample_params(cursor):
+    """The latest attendance date and a student marked on it"""
+    cursor.execute("SELECT MAX(date) FROM attendance")
+    latest = cursor.fetchone()[0] or date.today()
+    cursor.execute("SELECT student_id FROM attendance WHERE date = %s LIMIT 1", (latest,))
+    row = cursor.fetchone()
+    if row is None:
+        cursor.execute("SELECT MIN(id) FROM students")
+        row = cursor.fetchone()
+    return {'date': latest, 'student_id': row[0] or 0}
+
+
+def explain_hot_queries(runs=3):
+    """
+    EXPLAIN and time each of HOT_QUERIES
+
+    Args:
+        runs (int): Executions per query; the fastest is reported
+
+    Returns:
+        dict: params and, per query name, plan (list of table, type, key,
+            rows and Extra) and best_ms
+    """
+    conn = _connect()
+    cursor = conn.cursor()
+    try:
+        params = _sample_params(cursor)
+        results = {'params': {key: str(value) for key, value in params.items()}, 'queries': {}}
+        for name, query in HOT_QUERIES:
+            cursor.execute("EXPLAIN " + query, params)
+            columns = [column[0] for column in cursor.description]
+            plan = [{key: step.get(key) for key in ('table', 'type', 'key', 'rows', 'Extra')}
+                    for step in (dict(zip(columns, row)) for row in cursor.fetchall())]
+            best = None
+            for _ in range(max(1, runs)):
+                started = time.perf_counter()
+                cursor.execute(query, params)
+                cursor.fetchall()
+                elapsed = time.perf_counter() - started
+                best = elapsed if best is None else min(best, elapsed)
+            results['queries'][name] = {'plan': plan, 'best_ms': round(best * 1000, 2)}
+        conn.commit()
+        return results
+    finally:
+        cursor.close()
+        conn.close()
+
+
+def _format_plan(plan):
+    return '<br>'.join(f"{step['table']}: {step['type']} via {step['key'] or '-'}, "
+                       f"~{step['rows']} rows{', ' + step['Extra'] if step['Extra'] else ''}"
+                       for step in plan)
+
+
+def write_report(path, before, after, applied):
+    """
+    Write a Markdown before/after comparison of hot query plans
+
+    Args:
+        path (str): Output file
+        before (dict): explain_hot_queries() result before migrating
+        after (dict): explain_hot_queries() result after migrating
+        applied (list): MigrationRunner.migrate() result
+    """
+    lines = [
+        "# Migration Query Plan Report", "",
+        f"Migrations applied: {', '.join(f'{version:04d} {name}' for version, name, _ in applied) or 'none'}",
+        f"Sample parameters: {', '.join(f'{key}={value}' for key, value in after['params'].items())}", "",
+        "| Query | Before | After | Before ms | After ms |",
+        "| --- | --- | --- | ---: | ---: |",
+    ]
+    for name, result in after['queries'].items():
+        earlier = before['queries'].get(name, {'plan': [], 'best_ms': None})
+        lines.append(f"| {name} | {_format_plan(earlier['plan'])} | {_format_plan(result['plan'])} "
+                     f"| {earlier['best_ms']} | {result['best_ms']} |")
+    with open(path, 'w', encoding='utf-8') as f:
+        f.write('\n'.join(lines) + '\n')
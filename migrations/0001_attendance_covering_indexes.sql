@@ -0,0 +1,26 @@
+-- Covering indexes for the hot attendance queries.
+-- Built online (ALGORITHM=INPLACE, LOCK=NONE): marks keep being written
+-- while each index is built. One index per step, so an interrupted run
+-- resumes with the next index.
+
+-- Day-scoped reads (get_attendance_by_date, period summaries, the
+-- daily_period_rollup rebuild) find and count a day's marks from the index
+-- alone. Supersedes idx_date, dropped in 0002.
+ALTER TABLE attendance
+    ADD INDEX idx_date_period_status (date, period, status),
+    ALGORITHM=INPLACE, LOCK=NONE;
+
+-- Per-student status counts (get_attendance_summary's counters and the
+-- student_attendance_stats rebuild) without reading the rows.
+ALTER TABLE attendance
+    ADD INDEX idx_student_status (student_id, status),
+    ALGORITHM=INPLACE, LOCK=NONE;
+
+-- A student's marks in (date, period) order with their status: the
+-- per-student join of get_daily_analysis becomes index-only, and history
+-- reads walk it in order. Supersedes idx_student_date, dropped in 0002.
+ALTER TABLE attendance
+    ADD INDEX idx_student_date_status (student_id, date, period, status),
+    ALGORITHM=INPLACE, LOCK=NONE;
+
+ANALYZE TABLE attendance;
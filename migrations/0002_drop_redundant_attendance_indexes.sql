@@ -0,0 +1,12 @@
+-- Indexes that are now a prefix of a wider one only cost writes.
+-- idx_date (date) is a prefix of idx_date_period_status and
+-- idx_student_date (student_id, date) of idx_student_date_status;
+-- unique_attendance still serves the student_id foreign key.
+-- Dropping a secondary index only changes metadata.
+ALTER TABLE attendance
+    DROP INDEX idx_date,
+    ALGORITHM=INPLACE, LOCK=NONE;
+
+ALTER TABLE attendance
+    DROP INDEX idx_student_date,
+    ALGORITHM=INPLACE, LOCK=NONE;
@@ -0,0 +1,106 @@
+"""
+Pagination Module
+Helpers for keyset (cursor-based) pagination of listing queries
+"""
+
+import base64
+import json
+from datetime import date, datetime
+
+DEFAULT_PAGE_SIZE = 100
+MAX_PAGE_SIZE = 1000
+
+
+class InvalidCursorError(ValueError):
+    """Raised when a pagination cursor cannot be decoded"""
+
+
+def encode_cursor(values):
+    """
+    Encode the sort key of the last row on a page as an opaque cursor
+
+    Args:
+        values (list): Sort-key values (str, int, date or datetime)
+
+    Returns:
+        str: URL-safe cursor
+    """
+    encoded = [{'d': value.isoformat()} if isinstance(value, date) and not isinstance(value, datetime)
+               else {'t': value.isoformat()} if isinstance(value, datetime)
+               else value
+               for value in values]
+    raw = json.dumps(encoded, separators=(',', ':')).encode('utf-8')
+    return base64.urlsafe_b64encode(raw).decode('ascii').rstrip('=')
+
+
+def decode_cursor(cursor, size):
+    """
+    Decode a cursor produced by encode_cursor
+
+    Args:
+        cursor (str): Cursor from a previous page
+        size (int): Expected number of sort-key values
+
+    Returns:
+        list: Sort-key values
+
+    Raises:
+        InvalidCursorError: If the cursor is malformed
+    """
+    try:
+        raw = base64.urlsafe_b64decode(cursor + '=' * (-len(cursor) % 4))
+        values = json.loads(raw.decode('utf-8'))
+    except (ValueError, TypeError) as e:
+        raise InvalidCursorError(f"Invalid cursor: {cursor}") from e
+
+    if not isinstance(values, list) or len(values) != size:
+        raise InvalidCursorError(f"Invalid cursor: {cursor}")
+
+    decoded = []
+    for value in values:
+        try:
+            if isinstance(value, dict) and 'd' in value:
+                value = date.fromisoformat(value['d'])
+            elif isinstance(value, dict) and 't' in value:
+                value = datetime.fromisoformat(value['t'])
+        except ValueError as e:
+            raise InvalidCursorError(f"Invalid cursor: {cursor}") from e
+        decoded.append(value)
+    return decoded
+
+
+def parse_limit(value, default=DEFAULT_PAGE_SIZE, maximum=MAX_PAGE_SIZE):
+    """
+    Parse a page-size request parameter, clamped to [1, maximum]
+
+    Args:
+        value (str or int or None): Requested limit
+
+    Returns:
+        int: Page size
+    """
+    if value in (None, ''):
+        return default
+    try:
+        limit = int(value)
+    except (TypeError, ValueError):
+        return default
+    return max(1, min(limit, maximum))
+
+
+def split_page(rows, limit, key):
+    """
+    Split a LIMIT limit + 1 result into a page and the next cursor
+
+    Args:
+        rows (list): Rows fetched with one extra row past the page
+        limit (int): Page size
+        key (callable): Returns the sort-key values of a row
+
+    Returns:
+        tuple: (page rows, next cursor or None)
+    """
+    if len(rows) <= limit:
+        return rows, None
+    page = rows[:limit]
+    return page, encode_cursor(key(page[-1]))
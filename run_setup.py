@@ -1,44 +1,64 @@
 import mysql.connector
-import configparser
 import os
 import sys
+from db_config import DatabaseConfig
+from migration_runner import split_sql
 
-def run_sql_file(filename):
+def run_sql_file(filename, keep_going=False):
+    """
+    Run a setup script statement by statement
+
+    Statements are split with migration_runner.split_sql, so semicolons in
+    strings and comments are safe and DELIMITER blocks are supported. The
+    script stops at the first failing statement unless keep_going is set.
+
+    Returns:
+        bool: True if every statement succeeded
+    """
     if not os.path.exists(filename):
         print(f"File {filename} not found")
-        return
+        return False
+
+    # Setup scripts choose (or create) their database themselves
+    settings = DatabaseConfig.get_db_settings()
+    settings.pop('database')
+
+    with open(filename, 'r', encoding='utf-8') as f:
+        statements = split_sql(f.read())
 
-    config = configparser.ConfigParser()
-    config.read('config.ini')
-    
+    failed = 0
     try:
-        conn = mysql.connector.connect(
-            host=config.get('database', 'host'),
-            user=config.get('database', 'user'),
-            password=config.get('database', 'password'),
-            port=config.getint('database', 'port')
-        )
+        conn = mysql.connector.connect(**settings)
         cursor = conn.cursor()
-        
-        with open(filename, 'r', encoding='utf-8') as f:
-            sql = f.read()
-            
-        commands = sql.split(';')
-        
-        for command in commands:
-            if command.strip():
-                try:
-                    cursor.execute(command)
-                except Exception as e:
-                    print(f"Error executing command: {e}")
-                    
-        conn.commit()
+
+        for line, statement in statements:
+            try:
+                cursor.execute(statement)
+                if cursor.with_rows:
+                    cursor.fetchall()
+            except mysql.connector.Error as e:
+                failed += 1
+                print(f"Error executing statement at line {line}: {e}")
+                if not keep_going:
+                    break
+
+        if failed:
+            conn.rollback()
+        else:
+            conn.commit()
         cursor.close()
         conn.close()
-        print(f"SQL script {filename} executed successfully")
-    except Exception as e:
+    except mysql.connector.Error as e:
         print(f"Error: {e}")
+        return False
+
+    if failed:
+        print(f"SQL script {filename} failed ({failed} statement{'s' if failed > 1 else ''})")
+        return False
+    print(f"SQL script {filename} executed successfully ({len(statements)} statements)")
+    return True
 
 if __name__ == "__main__":
-    target_file = sys.argv[1] if len(sys.argv) > 1 else 'data_science_setup.sql'
-    run_sql_file(target_file)
+    args = [arg for arg in sys.argv[1:] if arg != '--keep-going']
+    target_file = args[0] if args else 'data_science_setup.sql'
+    sys.exit(0 if run_sql_file(target_file, keep_going='--keep-going' in sys.argv) else 1)
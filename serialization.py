@@ -0,0 +1,180 @@
+"""
+Serialization Module
+Fast JSON encoding and negotiated response compression for the Flask apps
+
+JSON is encoded with orjson when it is installed (falling back to the
+standard library), with native support for the types the database returns:
+date and datetime as ISO 8601 strings, Decimal as a number. Responses are
+compressed with Brotli or gzip according to Accept-Encoding.
+"""
+
+import gzip
+import json
+import zlib
+from datetime import date, datetime, timedelta
+from decimal import Decimal
+from flask.json.provider import JSONProvider
+from db_config import DatabaseConfig
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+try:
+    import brotli
+except ImportError:
+    brotli = None
+
+COMPRESSIBLE_MIMETYPES = {'application/json', 'text/csv', 'text/html', 'text/plain',
+                          'text/css', 'text/javascript', 'application/javascript'}
+
+# Suffixes appended to strong ETags of compressed representations
+ETAG_SUFFIXES = {'br': '-br', 'gzip': '-gzip'}
+
+
+def json_default(value):
+    """Encode the non-JSON types returned by mysql.connector"""
+    if isinstance(value, (date, datetime)):
+        return value.isoformat()
+    if isinstance(value, Decimal):
+        return float(value)
+    if isinstance(value, timedelta):
+        return str(value)
+    raise TypeError(f"Object of type {type(value).__name__} is not JSON serializable")
+
+
+if orjson is not None:
+    _ORJSON_OPTIONS = orjson.OPT_NON_STR_KEYS | orjson.OPT_SERIALIZE_NUMPY
+
+    def dumps_bytes(obj):
+        """Encode obj as UTF-8 JSON bytes"""
+        return orjson.dumps(obj, default=json_default, option=_ORJSON_OPTIONS)
+
+    def loads(data):
+        """Decode JSON text or bytes"""
+        return orjson.loads(data)
+else:
+    _encoder = json.JSONEncoder(default=json_default, ensure_ascii=False, separators=(',', ':'))
+
+    def dumps_bytes(obj):
+        """Encode obj as UTF-8 JSON bytes"""
+        return _encoder.encode(obj).encode('utf-8')
+
+    def loads(data):
+        """Decode JSON text or bytes"""
+        return json.loads(data)
+
+
+def dumps(obj):
+    """Encode obj as a JSON string"""
+    return dumps_bytes(obj).decode('utf-8')
+
+
+class FastJSONProvider(JSONProvider):
+    """Flask JSON provider used by jsonify() and request.get_json()"""
+
+    mimetype = 'application/json'
+
+    def dumps(self, obj, **kwargs):
+        return dumps(obj)
+
+    def loads(self, s, **kwargs):
+        return loads(s)
+
+    def response(self, *args, **kwargs):
+        obj = self._prepare_response_obj(args, kwargs)
+        # Skip the str round trip of the base implementation
+        return self._app.response_class(dumps_bytes(obj), mimetype=self.mimetype)
+
+
+class ResponseCompressor:
+    """after_request hook compressing responses the client can decode"""
+
+    def __init__(self, level=6, min_size=1024):
+        """
+        Args:
+            level (int): gzip level (1-9); Brotli uses a comparable quality
+            min_size (int): Smallest body worth compressing, in bytes
+        """
+        self.level = level
+        self.min_size = min_size
+
+    def choose_encoding(self, request):
+        """Pick the best encoding the client accepts, or None"""
+        accepted = request.accept_encodings
+        if brotli is not None and accepted['br'] > 0:
+            return 'br'
+        if accepted['gzip'] > 0:
+            return 'gzip'
+        return None
+
+    def _stream(self, chunks, encoding):
+        if encoding == 'br':
+            compressor = brotli.Compressor(quality=min(self.level, 11))
+            for chunk in chunks:
+                data = compressor.process(chunk.encode('utf-8') if isinstance(chunk, str) else chunk)
+                # Flush per chunk so the client can parse incrementally
+                data += compressor.flush()
+                if data:
+                    yield data
+            yield compressor.finish()
+        else:
+            compressor = zlib.compressobj(self.level, zlib.DEFLATED, 31)
+            for chunk in chunks:
+                data = compressor.compress(chunk.encode('utf-8') if isinstance(chunk, str) else chunk)
+                data += compressor.flush(zlib.Z_SYNC_FLUSH)
+                if data:
+                    yield data
+            yield compressor.flush()
+
+    def __call__(self, response):
+        from flask import request
+
+        response.vary.add('Accept-Encoding')
+        if (response.status_code < 200 or response.status_code >= 300
+                or response.status_code == 204
+                or response.direct_passthrough
+                or 'Content-Encoding' in response.headers
+                or response.mimetype not in COMPRESSIBLE_MIMETYPES):
+            return response
+
+        encoding = self.choose_encoding(request)
+        if encoding is None:
+            return response
+
+        if response.is_streamed:
+            response.response = self._stream(response.response, encoding)
+            response.headers.pop('Content-Length', None)
+        else:
+            body = response.get_data()
+            if len(body) < self.min_size:
+                return response
+            if encoding == 'br':
+                body = brotli.compress(body, quality=min(self.level, 11))
+            else:
+                body = gzip.compress(body, compresslevel=self.level, mtime=0)
+            response.set_data(body)
+
+        response.headers['Content-Encoding'] = encoding
+        etag, weak = response.get_etag()
+        if etag:
+            response.set_etag(etag + ETAG_SUFFIXES[encoding], weak)
+        return response
+
+
+def init_app(app):
+    """
+    Install the JSON provider and, if enabled, response compression
+
+    [http] compression (default true), compression_level (default 6) and
+    compression_min_size (default 1024 bytes) control compression.
+    """
+    app.json = FastJSONProvider(app)
+
+    config = DatabaseConfig.read_config()
+    if config.getboolean('http', 'compression', fallback=True):
+        app.after_request(ResponseCompressor(
+            level=config.getint('http', 'compression_level', fallback=6),
+            min_size=config.getint('http', 'compression_min_size', fallback=1024)
+        ))
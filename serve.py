@@ -0,0 +1,500 @@
+"""
+Serve Module
+Production server for app.py and api_server.py
+
+A master process opens the listening socket, imports the application and
+forks worker processes that share the socket. Each worker serves requests
+on a fixed number of threads and opens its own database connection pool
+after the fork. The master replaces workers that exit, so a worker can be
+recycled after a number of requests (releasing any memory it accumulated)
+without dropping connections:
+
+- SIGTERM / Ctrl+C: workers stop accepting, finish in-flight requests for
+  up to graceful_timeout seconds and exit; then the master exits
+- SIGHUP: workers are replaced one at a time (e.g. after a deploy)
+
+Requests running longer than timeout seconds are logged with their stack
+and the worker is retired: it stops accepting, gets graceful_timeout to
+finish, and a fresh worker takes its place. Database statements are not
+capped unless [database] statement_timeout_ms is set, since the cube load
+and streamed responses legitimately run longer than any request timeout.
+
+Applications see two extra WSGI environ keys: 'serve.stopping', a
+threading.Event set once the worker starts to stop, and 'serve.threads',
+the worker's request threads. Long-lived responses (the live feed) use
+them to end in time and to leave threads free for other requests.
+
+Where fork() is not available (Windows) a single threaded worker runs in
+the current process.
+
+    python serve.py app --bind 0.0.0.0:5000 --workers 4 --threads 8
+    python serve.py api_server --bind 0.0.0.0:5001
+"""
+
+import argparse
+import importlib
+import os
+import queue
+import random
+import select
+import signal
+import socket
+import sys
+import threading
+import time
+import traceback
+from werkzeug.serving import BaseWSGIServer, WSGIRequestHandler
+from db_config import DatabaseConfig
+from logger_config import logger
+
+server_logger = logger.getChild('server')
+
+APPS = ['app', 'api_server']
+
+# A worker exiting sooner than this after starting is respawned with a delay
+MIN_WORKER_LIFETIME = 2.0
+
+
+class RequestHandler(WSGIRequestHandler):
+    """Request handler that closes keep-alive connections once the worker is stopping"""
+
+    # Seconds an idle keep-alive connection (or a slow client) may hold a thread
+    timeout = 5
+    access_log = False
+
+    def handle_one_request(self):
+        super().handle_one_request()
+        if self.server.stopping:
+            self.close_connection = True
+
+    def log_request(self, code='-', size='-'):
+        if self.access_log:
+            super().log_request(code, size)
+
+
+class WorkerServer(BaseWSGIServer):
+    """
+    WSGI server handling connections on a fixed set of threads
+
+    A connection is only accepted when a thread is free, so with several
+    worker processes on one socket the least busy worker picks it up.
+    """
+
+    multithread = True
+
+    def __init__(self, host, port, app, fd, threads=8, multiprocess=True, handler=RequestHandler):
+        self.multiprocess = multiprocess
+        super().__init__(host, port, app, handler=handler, fd=fd)
+        # Several workers wait on the same socket; losers of an accept() race must not block
+        self.socket.setblocking(False)
+        self.threads = threads
+        self.stopping = False
+        self._slots = threading.BoundedSemaphore(threads)
+        self._connections = queue.Queue()
+        for index in range(threads):
+            # Daemon threads: a request stuck past the graceful timeout cannot hold up exit
+            threading.Thread(target=self._serve_connections, name=f'request-{index}', daemon=True).start()
+
+    def get_request(self):
+        if not self._slots.acquire(timeout=0.5):
+            raise OSError("No free request thread")
+        try:
+            connection, address = super().get_request()
+            connection.setblocking(True)
+            if connection.family in (socket.AF_INET, socket.AF_INET6):
+                # Headers and body are written separately; don't let Nagle hold the body back
+                connection.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+            return connection, address
+        except BaseException:
+            self._slots.release()
+            raise
+
+    def process_request(self, request, client_address):
+        self._connections.put((request, client_address))
+
+    def _serve_connections(self):
+        while True:
+            request, client_address = self._connections.get()
+            try:
+                self.finish_request(request, client_address)
+            except Exception:
+                self.handle_error(request, client_address)
+            finally:
+                self.shutdown_request(request)
+                self._slots.release()
+
+    def drain(self, timeout):
+        """
+        Wait for in-flight connections to finish
+
+        Args:
+            timeout (float): Seconds to wait
+
+        Returns:
+            bool: True if every connection finished in time
+        """
+        self.stopping = True
+        deadline = time.monotonic() + timeout
+        for _ in range(self.threads):
+            if not self._slots.acquire(timeout=max(0, deadline - time.monotonic())):
+                return False
+        return True
+
+
+class RequestWatchdog:
+    """
+    WSGI middleware tracking how long each request has been running
+
+    Time runs until the application returns its response, so streamed
+    responses (such as the live dashboard feed) only count until their
+    first byte.
+    """
+
+    def __init__(self, app, on_request=None, environ=None):
+        """
+        Args:
+            app: WSGI application
+            on_request (callable, optional): Called after each request
+            environ (dict, optional): Entries added to every request's environ
+        """
+        self.app = app
+        self.on_request = on_request
+        self.environ = environ or {}
+        self.active = {}  # thread ident -> (started, method, path)
+
+    def __call__(self, environ, start_response):
+        environ.update(self.environ)
+        ident = threading.get_ident()
+        self.active[ident] = (time.monotonic(), environ.get('REQUEST_METHOD'), environ.get('PATH_INFO'))
+        try:
+            return self.app(environ, start_response)
+        finally:
+            self.active.pop(ident, None)
+            if self.on_request is not None:
+                self.on_request()
+
+    def overdue(self, timeout):
+        """
+        Requests running longer than timeout
+
+        Returns:
+            list: (thread ident, seconds, method, path)
+        """
+        now = time.monotonic()
+        return [(ident, now - started, method, path)
+                for ident, (started, method, path) in list(self.active.items())
+                if now - started > timeout]
+
+
+class Worker:
+    """One serving process"""
+
+    def __init__(self, app, listener, threads=8, timeout=30, graceful_timeout=30,
+                 max_requests=0, max_requests_jitter=0, keepalive=5, access_log=False,
+                 multiprocess=True):
+        """
+        Args:
+            app: WSGI application
+            listener (socket.socket): Bound, listening socket
+            threads (int): Requests served concurrently
+            timeout (float): Seconds before a request counts as stuck (0 = never)
+            graceful_timeout (float): Seconds in-flight requests get when stopping
+            max_requests (int): Requests before the worker is recycled (0 = never)
+            max_requests_jitter (int): Up to this many extra requests, so
+                workers are not all recycled at once
+            keepalive (float): Seconds an idle keep-alive connection is kept
+            access_log (bool): Log every request
+            multiprocess (bool): Other workers serve the same socket
+        """
+        self.listener = listener
+        self.threads = threads
+        self.timeout = timeout
+        self.graceful_timeout = graceful_timeout
+        self.max_requests = max_requests + random.randint(0, max_requests_jitter) if max_requests else 0
+        self.multiprocess = multiprocess
+        self.handler = type('RequestHandler', (RequestHandler,), {'timeout': keepalive, 'access_log': access_log})
+        self.requests = 0
+        self.reason = None
+        self._requests_lock = threading.Lock()
+        self._retire = threading.Event()
+        self.watchdog = RequestWatchdog(app, self._count_request,
+                                        {'serve.stopping': self._retire, 'serve.threads': threads})
+        self._reported = set()
+
+    def _count_request(self):
+        with self._requests_lock:
+            self.requests += 1
+            if self.max_requests and self.requests >= self.max_requests:
+                self.retire(f"served {self.requests} requests")
+
+    def retire(self, reason):
+        """Stop accepting and exit once in-flight requests finish"""
+        if not self._retire.is_set():
+            self.reason = reason
+            self._retire.set()
+
+    def _check_requests(self):
+        for ident, seconds, method, path in self.watchdog.overdue(self.timeout):
+            if ident in self._reported:
+                continue
+            self._reported.add(ident)
+            frame = sys._current_frames().get(ident)
+            stack = ''.join(traceback.format_stack(frame)) if frame is not None else ''
+            server_logger.error(f"Request {method} {path} has run for {seconds:.1f}s (timeout {self.timeout}s); "
+                                f"retiring worker {os.getpid()}\n{stack}")
+            self.retire(f"request {method} {path} timed out")
+        self._reported &= set(self.watchdog.active)
+
+    def _monitor(self, server):
+        while not self._retire.wait(1):
+            if self.timeout:
+                self._check_requests()
+        # Keep-alive clients are told to reconnect, which lands them on another worker
+        server.stopping = True
+        server.shutdown()
+
+    def run(self):
+        """
+        Serve until retired or signalled
+
+        Returns:
+            int: Exit status
+        """
+        signal.signal(signal.SIGTERM, lambda signum, frame: self.retire("SIGTERM"))
+        if self.multiprocess:
+            # The master handles Ctrl+C and stops the workers with SIGTERM
+            signal.signal(signal.SIGINT, signal.SIG_IGN)
+        else:
+            signal.signal(signal.SIGINT, lambda signum, frame: self.retire("interrupted"))
+
+        try:
+            DatabaseConfig.initialize_pool()
+        except Exception as e:
+            # Not fatal: the pool is created on first use once the database is back
+            server_logger.error(f"Worker {os.getpid()} could not open its database pool: {e}")
+
+        host, port = self.listener.getsockname()[:2]
+        server = WorkerServer(host, port, self.watchdog, self.listener.fileno(), threads=self.threads,
+                              multiprocess=self.multiprocess, handler=self.handler)
+        threading.Thread(target=self._monitor, args=(server,), name='worker-monitor', daemon=True).start()
+        server_logger.info(f"Worker {os.getpid()} serving with {self.threads} threads")
+
+        server.serve_forever(poll_interval=0.5)
+
+        if not server.drain(self.graceful_timeout):
+            server_logger.warning(f"Worker {os.getpid()} exiting with requests still running "
+                                  f"after {self.graceful_timeout}s")
+        DatabaseConfig.close_pool()
+        server_logger.info(f"Worker {os.getpid()} stopped ({self.reason}, {self.requests} requests)")
+        return 0
+
+
+class Master:
+    """Forks, watches and replaces worker processes"""
+
+    def __init__(self, app, listener, workers, worker_options, graceful_timeout=30):
+        self.app = app
+        self.listener = listener
+        self.worker_count = workers
+        self.worker_options = dict(worker_options, graceful_timeout=graceful_timeout)
+        self.graceful_timeout = graceful_timeout
+        self.pid = os.getpid()
+        self.workers = {}  # pid -> started (monotonic)
+        self.stopping = False
+        self.reload_queue = []
+        self.retiring = set()
+        # Signal handlers only write to this pipe, which wakes the main loop
+        self._wakeup_read, self._wakeup_write = os.pipe()
+        os.set_blocking(self._wakeup_write, False)
+
+    def _spawn(self):
+        pid = os.fork()
+        if pid:
+            self.workers[pid] = time.monotonic()
+            return
+        # Worker process: the SystemExit unwinds to the interpreter, which runs the exit hooks
+        self.workers = {}
+        os.close(self._wakeup_read)
+        os.close(self._wakeup_write)
+        signal.signal(signal.SIGHUP, signal.SIG_IGN)
+        signal.signal(signal.SIGCHLD, signal.SIG_DFL)
+        # Forked workers would otherwise share the parent's random state
+        random.seed()
+        sys.exit(Worker(self.app, self.listener, **self.worker_options).run())
+
+    def _wake(self, signum=None, frame=None):
+        try:
+            os.write(self._wakeup_write, b'.')
+        except BlockingIOError:
+            pass
+
+    def _sleep(self, seconds):
+        if select.select([self._wakeup_read], [], [], seconds)[0]:
+            os.read(self._wakeup_read, 4096)
+
+    def _reap(self):
+        while self.workers:
+            try:
+                pid, status = os.waitpid(-1, os.WNOHANG)
+            except ChildProcessError:
+                self.workers.clear()
+                return
+            if pid == 0:
+                return
+            started = self.workers.pop(pid, None)
+            self.retiring.discard(pid)
+            if started is None:
+                continue
+            code = os.waitstatus_to_exitcode(status)
+            if code != 0 and not self.stopping:
+                server_logger.error(f"Worker {pid} exited with status {code}")
+            if code != 0 and time.monotonic() - started < MIN_WORKER_LIFETIME and not self.stopping:
+                # Don't fork in a tight loop if workers fail straight away
+                time.sleep(1)
+
+    def _signal(self, signum, frame):
+        if signum == signal.SIGHUP:
+            self.reload_queue = list(self.workers)
+        else:
+            self.stopping = True
+        self._wake()
+
+    def _kill(self, signum):
+        for pid in list(self.workers):
+            try:
+                os.kill(pid, signum)
+            except ProcessLookupError:
+                self.workers.pop(pid, None)
+
+    def run(self):
+        """
+        Run until SIGTERM or Ctrl+C
+
+        Returns:
+            int: Exit status
+        """
+        for signum in (signal.SIGTERM, signal.SIGINT, signal.SIGHUP):
+            signal.signal(signum, self._signal)
+        signal.signal(signal.SIGCHLD, self._wake)
+
+        server_logger.info(f"Master {self.pid} listening on {self.listener.getsockname()[:2]} "
+                           f"with {self.worker_count} workers")
+        while not self.stopping:
+            self._reap()
+            if self.reload_queue and not self.retiring:
+                # Rolling restart: retire one old worker at a time
+                pid = self.reload_queue.pop(0)
+                if pid in self.workers:
+                    self.retiring.add(pid)
+                    os.kill(pid, signal.SIGTERM)
+            # Retiring workers no longer accept, so their replacements start right away
+            while len(self.workers) - len(self.retiring) < self.worker_count and not self.stopping:
+                self._spawn()
+            self._sleep(1)
+
+        server_logger.info("Stopping workers")
+        self._kill(signal.SIGTERM)
+        deadline = time.monotonic() + self.graceful_timeout + 5
+        while self.workers and time.monotonic() < deadline:
+            self._reap()
+            self._sleep(0.1)
+        if self.workers:
+            server_logger.warning(f"Killing {len(self.workers)} workers that did not stop in time")
+            self._kill(signal.SIGKILL)
+            while self.workers:
+                self._reap()
+                time.sleep(0.1)
+        self.listener.close()
+        server_logger.info("Server stopped")
+        return 0
+
+
+def create_listener(bind, backlog=2048):
+    """
+    Open the listening socket shared by all workers
+
+    Args:
+        bind (str): host:port
+
+    Returns:
+        socket.socket: Listening socket
+    """
+    host, _, port = bind.rpartition(':')
+    host = host.strip('[]') or '0.0.0.0'
+    family = socket.AF_INET6 if ':' in host else socket.AF_INET
+    listener = socket.socket(family, socket.SOCK_STREAM)
+    listener.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
+    listener.bind((host, int(port)))
+    listener.listen(backlog)
+    listener.set_inheritable(True)
+    return listener
+
+
+def add_arguments(parser):
+    """Add the serve options to an argparse parser; defaults come from [server]"""
+    config = DatabaseConfig.read_config()
+    parser.add_argument('app', choices=APPS, help="Application to serve")
+    parser.add_argument('--bind', default=config.get('server', 'bind', fallback='0.0.0.0:5000'),
+                        help="host:port to listen on (default: [server] bind or 0.0.0.0:5000)")
+    parser.add_argument('--workers', type=int, default=config.getint('server', 'workers', fallback=os.cpu_count() or 1),
+                        help="Worker processes (default: [server] workers or one per CPU)")
+    parser.add_argument('--threads', type=int, default=config.getint('server', 'threads', fallback=8),
+                        help="Request threads per worker (default: 8)")
+    parser.add_argument('--timeout', type=float, default=config.getfloat('server', 'timeout', fallback=30),
+                        help="Seconds before a request is treated as stuck; 0 disables (default: 30)")
+    parser.add_argument('--graceful-timeout', type=float,
+                        default=config.getfloat('server', 'graceful_timeout', fallback=30),
+                        help="Seconds in-flight requests get on shutdown (default: 30)")
+    parser.add_argument('--max-requests', type=int, default=config.getint('server', 'max_requests', fallback=0),
+                        help="Recycle a worker after this many requests; 0 disables (default: 0)")
+    parser.add_argument('--max-requests-jitter', type=int,
+                        default=config.getint('server', 'max_requests_jitter', fallback=0),
+                        help="Random extra requests per worker before recycling (default: 0)")
+    parser.add_argument('--keepalive', type=float, default=config.getfloat('server', 'keepalive', fallback=5),
+                        help="Seconds an idle keep-alive connection is kept open (default: 5)")
+    parser.add_argument('--access-log', action='store_true',
+                        default=config.getboolean('server', 'access_log', fallback=False),
+                        help="Log every request")
+
+
+def run(args):
+    """
+    Serve an application until stopped
+
+    Returns:
+        int: Exit status
+    """
+    if args.workers < 1 or args.threads < 1:
+        raise ValueError("Workers and threads must be at least 1")
+
+    # Imported once in the master so forked workers share its memory
+    app = importlib.import_module(args.app).app
+    listener = create_listener(args.bind)
+    options = {
+        'threads': args.threads, 'timeout': args.timeout, 'max_requests': args.max_requests,
+        'max_requests_jitter': args.max_requests_jitter, 'keepalive': args.keepalive,
+        'access_log': args.access_log,
+    }
+    print(f"Serving {args.app} on http://{args.bind} ({args.workers} workers x {args.threads} threads)")
+
+    if not hasattr(os, 'fork'):
+        if args.workers > 1:
+            server_logger.warning("fork() is not available here; serving from a single process")
+        while True:
+            worker = Worker(app, listener, graceful_timeout=args.graceful_timeout, multiprocess=False, **options)
+            worker.run()
+            if worker.reason in ("SIGTERM", "interrupted"):
+                return 0
+
+    return Master(app, listener, args.workers, options, args.graceful_timeout).run()
+
+
+def main(argv=None):
+    """Parse arguments and serve"""
+    parser = argparse.ArgumentParser(description="Serve the attendance web app or API with multiple workers")
+    add_arguments(parser)
+    return run(parser.parse_args(argv))
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,330 @@
+"""
+Slow Query Log Module
+Records statements slower than a threshold, with their EXPLAIN plans
+
+Every statement run through a pooled connection is timed (see
+metrics.TimedCursor; db_config_new.DatabaseConfig.execute_query uses the
+same pool). Statements over [slow_query] threshold_ms are grouped by a
+fingerprint of their normalized SQL and accumulated in the slow_queries
+table (see slow_query_setup.sql) with call count, total and max time,
+rows, the last parameter fingerprint and the calling function. The first
+time a fingerprint is seen it is EXPLAINed and the plan stored, flagging
+full table scans. Storage happens on a background thread so the slow
+request is not slowed down further.
+
+    python manage.py slow-queries
+"""
+
+import hashlib
+import json
+import os
+import queue
+import re
+import sys
+import threading
+from datetime import datetime
+from mysql.connector import Error, errorcode
+from db_config import DatabaseConfig, get_db_connection
+import metrics
+from logger_config import logger
+
+slow_logger = logger.getChild('slow_query')
+
+# Statements EXPLAIN accepts without side effects
+EXPLAINABLE = {'SELECT', 'WITH', 'UPDATE', 'DELETE'}
+
+# Frames in these files belong to the database layer, not the caller
+_DB_LAYER_FILES = {'metrics.py', 'slow_query_log.py', 'connection_pool.py',
+                   'db_config.py', 'db_config_new.py'}
+
+_COMMENTS = re.compile(r'/\*.*?\*/|--[^\n]*', re.S)
+_STRINGS = re.compile(r"'(?:[^'\\]|\\.|'')*'|\"(?:[^\"\\]|\\.)*\"")
+_PLACEHOLDERS = re.compile(r'%\(\w+\)s|%s')
+_NUMBERS = re.compile(r'(?<![\w.])-?\d+(?:\.\d+)?(?![\w.])')
+_VALUE_LISTS = re.compile(r'\(\s*\?(?:\s*,\s*\?)*\s*\)(?:\s*,\s*\(\s*\?(?:\s*,\s*\?)*\s*\))+')
+_IN_LISTS = re.compile(r'\bIN\s*\(\s*\?(?:\s*,\s*\?)*\s*\)', re.I)
+_WHITESPACE = re.compile(r'\s+')
+
+
+def normalize_sql(statement):
+    """
+    Reduce a statement to its shape: literals and placeholders become ?,
+    IN lists and multi-row VALUES collapse, whitespace is squeezed
+
+    Args:
+        statement (str): SQL text
+
+    Returns:
+        str: Normalized SQL
+    """
+    if isinstance(statement, (bytes, bytearray)):
+        statement = statement.decode('utf-8', 'replace')
+    sql = _COMMENTS.sub(' ', statement)
+    sql = _STRINGS.sub('?', sql)
+    sql = _PLACEHOLDERS.sub('?', sql)
+    sql = _NUMBERS.sub('?', sql)
+    sql = _VALUE_LISTS.sub('(...), ...', sql)
+    sql = _IN_LISTS.sub('IN (...)', sql)
+    return _WHITESPACE.sub(' ', sql).strip()
+
+
+def fingerprint(normalized):
+    """Stable short identifier of a normalized statement"""
+    return hashlib.sha1(normalized.encode('utf-8')).hexdigest()[:16]
+
+
+def params_fingerprint(params, many=False):
+    """
+    Identify a parameter set without storing the values
+
+    Returns:
+        str or None: Short hash, or None without parameters
+    """
+    if not params:
+        return None
+    if many:
+        params = list(params)
+        params = (len(params), params[0] if params else None)
+    return hashlib.sha1(repr(params).encode('utf-8')).hexdigest()[:12]
+
+
+def find_caller():
+    """'module.function:line' of the first frame outside the database layer"""
+    frame = sys._getframe(1)
+    while frame is not None:
+        filename = os.path.basename(frame.f_code.co_filename)
+        if filename not in _DB_LAYER_FILES:
+            return f"{filename[:-3] if filename.endswith('.py') else filename}.{frame.f_code.co_name}:{frame.f_lineno}"
+        frame = frame.f_back
+    return None
+
+
+class SlowQueryLog:
+    """Collects slow statements and stores them from a background thread"""
+
+    def __init__(self, threshold=0.2, explain=True, max_queue=1000):
+        """
+        Args:
+            threshold (float): Seconds above which a statement is recorded
+            explain (bool): EXPLAIN each new fingerprint once
+            max_queue (int): Pending records kept before new ones are dropped
+        """
+        self.threshold = threshold
+        self.explain = explain
+        self.pid = os.getpid()
+        self._queue = queue.Queue(maxsize=max_queue)
+        self._explained = set()
+        self._thread = None
+        self._lock = threading.Lock()
+        self._unavailable_logged = False
+        self.dropped = 0
+
+    def observe(self, statement, params, seconds, rows, many):
+        """metrics.QUERY_OBSERVERS callback"""
+        if seconds < self.threshold:
+            return
+        operation = metrics.sql_operation(statement)
+        if operation == 'EXPLAIN':
+            return
+        normalized = normalize_sql(statement)
+        event = {
+            'fingerprint': fingerprint(normalized),
+            'operation': operation,
+            'normalized': normalized,
+            'statement': statement,
+            'params': None if many else params,
+            'params_fingerprint': params_fingerprint(params, many),
+            'seconds': seconds,
+            'rows': rows,
+            'caller': find_caller(),
+            'at': datetime.now(),
+        }
+        slow_logger.warning(f"Slow query {event['fingerprint']} took {seconds * 1000:.0f} ms "
+                            f"({rows} rows) from {event['caller']}: {normalized[:200]}")
+        self._ensure_worker()
+        try:
+            self._queue.put_nowait(event)
+        except queue.Full:
+            self.dropped += 1
+
+    def _ensure_worker(self):
+        with self._lock:
+            if self._thread is not None and self._thread.is_alive():
+                return
+            self._thread = threading.Thread(target=self._run, name='slow-query-log', daemon=True)
+            self._thread.start()
+
+    def _run(self):
+        while True:
+            event = self._queue.get()
+            try:
+                self._store(event)
+            except Error as e:
+                if e.errno == errorcode.ER_NO_SUCH_TABLE:
+                    if not self._unavailable_logged:
+                        logger.warning("slow_queries table missing (run slow_query_setup.sql); "
+                                       "slow queries are only written to the log")
+                        self._unavailable_logged = True
+                else:
+                    logger.error(f"Error storing slow query: {e}")
+            except Exception as e:
+                logger.error(f"Error storing slow query: {e}")
+
+    def _store(self, event):
+        conn = get_db_connection()
+        # Raw cursors: the log's own statements must not be timed and logged again
+        cursor = conn.raw_connection.cursor()
+        try:
+            cursor.execute("""
+                INSERT INTO slow_queries
+                    (fingerprint, operation, normalized_sql, calls, total_seconds, max_seconds,
+                     total_rows, last_params_fingerprint, last_caller, first_seen, last_seen)
+                VALUES (%s, %s, %s, 1, %s, %s, %s, %s, %s, %s, %s)
+                ON DUPLICATE KEY UPDATE
+                    calls = calls + 1,
+                    total_seconds = total_seconds + VALUES(total_seconds),
+                    max_seconds = GREATEST(max_seconds, VALUES(max_seconds)),
+                    total_rows = total_rows + VALUES(total_rows),
+                    last_params_fingerprint = VALUES(last_params_fingerprint),
+                    last_caller = VALUES(last_caller),
+                    last_seen = VALUES(last_seen)
+            """, (event['fingerprint'], event['operation'], event['normalized'],
+                  event['seconds'], event['seconds'], event['rows'],
+                  event['params_fingerprint'], (event['caller'] or '')[:255], event['at'], event['at']))
+            conn.commit()
+
+            if (self.explain and event['operation'] in EXPLAINABLE
+                    and event['fingerprint'] not in self._explained):
+                cursor.execute("SELECT plan IS NULL FROM slow_queries WHERE fingerprint = %s",
+                               (event['fingerprint'],))
+                row = cursor.fetchone()
+                if row and row[0]:
+                    self._explain(cursor, event)
+                    conn.commit()
+                self._explained.add(event['fingerprint'])
+        finally:
+            cursor.close()
+            conn.close()
+
+    def _explain(self, cursor, event):
+        try:
+            cursor.execute(f"EXPLAIN {event['statement']}", event['params'] or ())
+            columns = [column[0] for column in cursor.description]
+            plan = [dict(zip(columns, row)) for row in cursor.fetchall()]
+        except Error as e:
+            # e.g. statements referencing temporary tables of another session
+            plan = {'error': str(e)}
+        full_scans = sorted({step.get('table') for step in plan
+                             if isinstance(step, dict) and step.get('type') == 'ALL'}) \
+            if isinstance(plan, list) else []
+        cursor.execute("""
+            UPDATE slow_queries SET plan = %s, full_scan = %s, explained_at = NOW()
+            WHERE fingerprint = %s
+        """, (json.dumps(plan, default=str), bool(full_scans), event['fingerprint']))
+        if full_scans:
+            slow_logger.warning(f"Slow query {event['fingerprint']} scans all of: {', '.join(map(str, full_scans))}")
+
+
+_log = None
+_log_lock = threading.Lock()
+
+
+def get_slow_query_log():
+    """
+    Get this process's slow query log, configured from [slow_query]
+
+    Returns:
+        SlowQueryLog or None: Log, or None when [slow_query] enabled is false
+    """
+    global _log
+
+    if _log is not None and _log.pid == os.getpid():
+        return _log
+
+    config = DatabaseConfig.read_config()
+    if not config.getboolean('slow_query', 'enabled', fallback=True):
+        return None
+
+    with _log_lock:
+        if _log is None or _log.pid != os.getpid():
+            previous = _log
+            _log = SlowQueryLog(
+                threshold=config.getfloat('slow_query', 'threshold_ms', fallback=200) / 1000,
+                explain=config.getboolean('slow_query', 'explain', fallback=True)
+            )
+            if previous is not None and previous.observe in metrics.QUERY_OBSERVERS:
+                metrics.QUERY_OBSERVERS.remove(previous.observe)
+            metrics.QUERY_OBSERVERS.append(_log.observe)
+    return _log
+
+
+def get_report(limit=20, order='total'):
+    """
+    Rank recorded fingerprints
+
+    Args:
+        limit (int): Rows returned
+        order (str): 'total' (time), 'max', 'avg' or 'calls'
+
+    Returns:
+        list: Rows with fingerprint, operation, calls, total_seconds,
+            avg_seconds, max_seconds, avg_rows, full_scan, last_caller,
+            last_seen and normalized_sql
+    """
+    columns = {'total': 'total_seconds', 'max': 'max_seconds',
+               'avg': 'avg_seconds', 'calls': 'calls'}
+    if order not in columns:
+        raise ValueError(f"Invalid order. Must be one of: {', '.join(columns)}")
+
+    conn = get_db_connection()
+    cursor = conn.cursor(dictionary=True)
+    try:
+        cursor.execute(f"""
+            SELECT fingerprint, operation, calls, total_seconds,
+                   total_seconds / calls AS avg_seconds, max_seconds,
+                   total_rows / calls AS avg_rows, full_scan, last_caller, last_seen, normalized_sql
+            FROM slow_queries
+            ORDER BY {columns[order]} DESC
+            LIMIT %s
+        """, (limit,))
+        return cursor.fetchall()
+    finally:
+        cursor.close()
+        conn.close()
+
+
+def get_plan(fingerprint_prefix):
+    """
+    Get one fingerprint's details and stored plan
+
+    Args:
+        fingerprint_prefix (str): Fingerprint or a unique prefix of one
+
+    Returns:
+        dict or None: Row with normalized_sql, plan, full_scan and counters
+    """
+    conn = get_db_connection()
+    cursor = conn.cursor(dictionary=True)
+    try:
+        cursor.execute("""
+            SELECT fingerprint, normalized_sql, calls, total_seconds, max_seconds,
+                   full_scan, explained_at, plan, last_caller
+            FROM slow_queries WHERE fingerprint LIKE %s
+            ORDER BY total_seconds DESC LIMIT 1
+        """, (fingerprint_prefix + '%',))
+        return cursor.fetchone()
+    finally:
+        cursor.close()
+        conn.close()
+
+
+def reset():
+    """Forget every recorded slow query"""
+    conn = get_db_connection()
+    cursor = conn.raw_connection.cursor()
+    try:
+        cursor.execute("DELETE FROM slow_queries")
+        conn.commit()
+    finally:
+        cursor.close()
+        conn.close()
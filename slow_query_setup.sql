@@ -0,0 +1,25 @@
+-- Slow Query Log Setup
+-- Per-fingerprint totals and EXPLAIN plans of statements slower than
+-- [slow_query] threshold_ms (see slow_query_log.py).
+--   python run_setup.py slow_query_setup.sql
+--   python manage.py slow-queries
+USE attendance_system;
+
+CREATE TABLE IF NOT EXISTS slow_queries (
+    fingerprint CHAR(16) PRIMARY KEY,
+    operation VARCHAR(16) NOT NULL,
+    normalized_sql TEXT NOT NULL,
+    calls BIGINT UNSIGNED NOT NULL DEFAULT 0,
+    total_seconds DOUBLE NOT NULL DEFAULT 0,
+    max_seconds DOUBLE NOT NULL DEFAULT 0,
+    total_rows BIGINT UNSIGNED NOT NULL DEFAULT 0,
+    last_params_fingerprint CHAR(12) NULL,
+    last_caller VARCHAR(255) NULL,
+    first_seen DATETIME(3) NOT NULL,
+    last_seen DATETIME(3) NOT NULL,
+    -- EXPLAIN rows as JSON, captured once per fingerprint
+    plan MEDIUMTEXT NULL,
+    full_scan BOOLEAN NULL,
+    explained_at DATETIME NULL,
+    INDEX idx_total_seconds (total_seconds)
+) ENGINE=InnoDB;
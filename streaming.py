@@ -0,0 +1,105 @@
+"""
+Streaming Module
+Streams large query results to the client as incrementally written JSON
+
+Rows are read from an unbuffered (server-side) cursor in chunks and encoded
+as they arrive, so neither the full result set nor the full JSON document
+is ever held in memory.
+"""
+
+from flask import Response, stream_with_context
+from db_config import get_db_connection
+from serialization import dumps
+from logger_config import logger
+
+DEFAULT_CHUNK_SIZE = 500
+
+
+def stream_rows(query, params=None, chunk_size=DEFAULT_CHUNK_SIZE):
+    """
+    Yield rows of a query from an unbuffered cursor
+
+    The pooled connection is held until the generator is exhausted or
+    closed. If the consumer stops early, the connection still has unread
+    rows; the pool's rollback on release fails and the connection is
+    discarded rather than reused.
+
+    Args:
+        query (str): SQL query
+        params (tuple, optional): Query parameters
+        chunk_size (int): Rows fetched per round trip
+
+    Yields:
+        dict: One row at a time
+    """
+    conn = get_db_connection()
+    cursor = conn.cursor(dictionary=True, buffered=False)
+    try:
+        cursor.execute(query, params or ())
+        while True:
+            rows = cursor.fetchmany(chunk_size)
+            if not rows:
+                break
+            yield from rows
+    finally:
+        try:
+            cursor.close()
+        except Exception:
+            pass
+        conn.close()
+
+
+def iter_json(envelope, rows, key='data', chunk_size=DEFAULT_CHUNK_SIZE):
+    """
+    Encode an envelope object with a streamed array member
+
+    Produces the same document as json.dumps({**envelope, key: list(rows),
+    'count': n}) but yields it in pieces of roughly chunk_size rows.
+
+    Args:
+        envelope (dict): Top-level members written before the array
+        rows (iterable): Array items
+        key (str): Name of the array member
+        chunk_size (int): Rows encoded per yielded piece
+
+    Yields:
+        str: JSON text fragments
+    """
+    head = dumps(envelope)[:-1]
+    separator = ', ' if envelope else ''
+    yield f'{head}{separator}{dumps(key)}: ['
+
+    count = 0
+    buffer = []
+    try:
+        for row in rows:
+            buffer.append(dumps(row))
+            count += 1
+            if len(buffer) >= chunk_size:
+                yield (', ' if count > len(buffer) else '') + ', '.join(buffer)
+                buffer = []
+        if buffer:
+            yield (', ' if count > len(buffer) else '') + ', '.join(buffer)
+    except Exception as e:
+        # Headers are already sent; close the document and report the failure in-band
+        logger.error(f"Error while streaming response: {e}")
+        yield f'], "count": {count}, "error": {dumps(str(e))}}}'
+        return
+
+    yield f'], "count": {count}}}'
+
+
+def streaming_json_response(envelope, rows, key='data', chunk_size=DEFAULT_CHUNK_SIZE):
+    """
+    Build a Flask response that streams iter_json output
+
+    Args:
+        envelope (dict): Top-level members written before the array
+        rows (iterable): Array items, typically from stream_rows()
+        key (str): Name of the array member
+
+    Returns:
+        flask.Response: Chunked application/json response
+    """
+    return Response(stream_with_context(iter_json(envelope, rows, key, chunk_size)),
+                    mimetype='application/json')
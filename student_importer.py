@@ -0,0 +1,343 @@
+"""
+Student Import Module
+High-throughput import of student intakes from CSV or XLSX files
+"""
+
+import csv
+import os
+import re
+import time
+from datetime import date, datetime
+from decimal import Decimal, InvalidOperation
+from mysql.connector import Error, errorcode
+from db_config import get_db_connection
+from cache import invalidate_roster
+from logger_config import logger
+
+class StudentImporter:
+    """
+    Streams rows into the students table in validated, deduplicated chunks
+
+    Each chunk costs one duplicate lookup and one multi-row INSERT, and is
+    committed on its own, so a failure only loses the chunk it happened in.
+    """
+
+    COLUMNS = ['reg_no', 'name', 'email', 'phone', 'board', 'marks', 'cgpa', 'join_date']
+    REQUIRED_COLUMNS = ['reg_no', 'name', 'email', 'phone']
+
+    # Alternative spellings accepted in the header row
+    HEADER_ALIASES = {
+        'registration_number': 'reg_no',
+        'register_number': 'reg_no',
+        'regno': 'reg_no',
+        'student_name': 'name',
+        'email_address': 'email',
+        'mail': 'email',
+        'phone_number': 'phone',
+        'mobile': 'phone',
+        'joined': 'join_date',
+    }
+
+    # Column sizes from attendance_system_setup.sql
+    MAX_LENGTHS = {'reg_no': 20, 'name': 100, 'email': 100, 'phone': 15, 'board': 50}
+
+    EMAIL_PATTERN = re.compile(r'^[a-zA-Z0-9._%+-]+@[a-zA-Z0-9.-]+\.[a-zA-Z]{2,}$')
+    PHONE_PATTERN = re.compile(r'^\+?[0-9][0-9 -]{5,13}[0-9]$')
+
+    DEFAULT_CHUNK_SIZE = 1000
+
+    def __init__(self, chunk_size=DEFAULT_CHUNK_SIZE, dry_run=False):
+        """
+        Args:
+            chunk_size (int): Rows validated, checked and inserted per step
+            dry_run (bool): Validate and check duplicates without inserting
+        """
+        self.chunk_size = chunk_size
+        self.dry_run = dry_run
+        self.total = 0
+        self.inserted = 0
+        self.errors = []
+        self.seconds = 0.0
+        self._seen_emails = set()
+        self._seen_reg_nos = set()
+
+    # ==================== VALIDATION ====================
+
+    @staticmethod
+    def normalize_header(header):
+        """Map a header row to column names (None for unknown columns)"""
+        columns = []
+        for name in header:
+            key = re.sub(r'[^a-z0-9]+', '_', str(name or '').strip().lower()).strip('_')
+            key = StudentImporter.HEADER_ALIASES.get(key, key)
+            columns.append(key if key in StudentImporter.COLUMNS else None)
+        return columns
+
+    @staticmethod
+    def validate_row(row):
+        """
+        Validate and normalize one student row
+
+        Args:
+            row (dict): Column name to raw value
+
+        Returns:
+            tuple: (values tuple in COLUMNS order or None, error message or None)
+        """
+        values = {}
+        for column in StudentImporter.COLUMNS:
+            value = row.get(column)
+            if isinstance(value, str):
+                value = value.strip()
+            values[column] = None if value in ('', None) else value
+
+        for column in StudentImporter.REQUIRED_COLUMNS:
+            if values[column] is None:
+                return (None, f"Missing {column}")
+
+        for column, max_length in StudentImporter.MAX_LENGTHS.items():
+            if values[column] is not None:
+                values[column] = str(values[column])
+                if len(values[column]) > max_length:
+                    return (None, f"{column} longer than {max_length} characters")
+
+        values['email'] = values['email'].lower()
+        if not StudentImporter.EMAIL_PATTERN.match(values['email']):
+            return (None, f"Invalid email format: {values['email']}")
+
+        if values['phone'].endswith('.0'):
+            # Spreadsheets store phone numbers as floats
+            values['phone'] = values['phone'][:-2]
+        if not StudentImporter.PHONE_PATTERN.match(values['phone']):
+            return (None, f"Invalid phone number: {values['phone']}")
+
+        if values['marks'] is not None:
+            try:
+                values['marks'] = int(float(values['marks']))
+            except (TypeError, ValueError):
+                return (None, f"Invalid marks: {values['marks']}")
+
+        if values['cgpa'] is not None:
+            try:
+                cgpa = Decimal(str(values['cgpa'])).quantize(Decimal('0.01'))
+            except InvalidOperation:
+                return (None, f"Invalid CGPA: {values['cgpa']}")
+            if not Decimal('0') <= cgpa <= Decimal('10'):
+                return (None, f"CGPA out of range: {values['cgpa']}")
+            values['cgpa'] = cgpa
+
+        join_date = values['join_date']
+        if join_date is None:
+            values['join_date'] = date.today()
+        elif isinstance(join_date, datetime):
+            values['join_date'] = join_date.date()
+        elif not isinstance(join_date, date):
+            try:
+                values['join_date'] = datetime.strptime(str(join_date), '%Y-%m-%d').date()
+            except ValueError:
+                return (None, "Invalid join date format. Use YYYY-MM-DD")
+
+        return (tuple(values[column] for column in StudentImporter.COLUMNS), None)
+
+    # ==================== READERS ====================
+
+    @staticmethod
+    def iter_file(path):
+        """
+        Read a CSV or XLSX file row by row
+
+        Yields:
+            tuple: (line number, dict of column name to raw value)
+        """
+        extension = os.path.splitext(path)[1].lower()
+        if extension == '.csv':
+            with open(path, newline='', encoding='utf-8-sig') as f:
+                yield from StudentImporter._iter_table(csv.reader(f))
+        elif extension in ('.xlsx', '.xlsm'):
+            try:
+                from openpyxl import load_workbook
+            except ImportError:
+                raise ValueError("XLSX import requires openpyxl: pip install openpyxl")
+            # read_only workbooks parse the sheet lazily instead of loading it whole
+            workbook = load_workbook(path, read_only=True, data_only=True)
+            try:
+                yield from StudentImporter._iter_table(workbook.active.iter_rows(values_only=True))
+            finally:
+                workbook.close()
+        else:
+            raise ValueError(f"Unsupported file type: {extension or path}. Use .csv or .xlsx")
+
+    @staticmethod
+    def _iter_table(rows):
+        rows = iter(rows)
+        header = next(rows, None)
+        if header is None:
+            return
+        columns = StudentImporter.normalize_header(header)
+        missing = [column for column in StudentImporter.REQUIRED_COLUMNS if column not in columns]
+        if missing:
+            raise ValueError(f"Missing required columns: {', '.join(missing)}")
+
+        for line, values in enumerate(rows, start=2):
+            if not any(value not in (None, '') for value in values):
+                continue
+            yield (line, {column: value for column, value in zip(columns, values) if column})
+
+    # ==================== IMPORT ====================
+
+    def _fail(self, line, row, error):
+        self.errors.append({
+            'row': line,
+            'reg_no': row.get('reg_no') if isinstance(row, dict) else None,
+            'email': row.get('email') if isinstance(row, dict) else None,
+            'error': error
+        })
+
+    @staticmethod
+    def _fetch_duplicates(cursor, rows):
+        """Return the emails and reg_nos of rows that already exist, in one query"""
+        emails = [values[2] for _, values in rows]
+        reg_nos = [values[0] for _, values in rows]
+        query = f"""
+            SELECT email, reg_no FROM students
+            WHERE email IN ({', '.join(['%s'] * len(emails))})
+               OR reg_no IN ({', '.join(['%s'] * len(reg_nos))})
+        """
+        cursor.execute(query, tuple(emails) + tuple(reg_nos))
+        existing = cursor.fetchall()
+        return ({row[0].lower() for row in existing}, {row[1] for row in existing})
+
+    @staticmethod
+    def _insert_rows(cursor, rows):
+        placeholders = '(' + ', '.join(['%s'] * len(StudentImporter.COLUMNS)) + ')'
+        query = (f"INSERT INTO students ({', '.join(StudentImporter.COLUMNS)}) "
+                 f"VALUES {', '.join([placeholders] * len(rows))}")
+        params = []
+        for _, values in rows:
+            params.extend(values)
+        cursor.execute(query, tuple(params))
+
+    def _import_chunk(self, chunk):
+        valid = []
+        for line, row in chunk:
+            values, error = self.validate_row(row)
+            if error:
+                self._fail(line, row, error)
+                continue
+            reg_no, email = values[0], values[2]
+            if email in self._seen_emails:
+                self._fail(line, row, f"Duplicate email in file: {email}")
+            elif reg_no in self._seen_reg_nos:
+                self._fail(line, row, f"Duplicate registration number in file: {reg_no}")
+            else:
+                self._seen_emails.add(email)
+                self._seen_reg_nos.add(reg_no)
+                valid.append((line, values))
+
+        if not valid:
+            return
+
+        conn = get_db_connection()
+        cursor = conn.cursor()
+        writable = []
+        try:
+            emails, reg_nos = self._fetch_duplicates(cursor, valid)
+            for line, values in valid:
+                if values[2] in emails:
+                    self.errors.append({'row': line, 'reg_no': values[0], 'email': values[2],
+                                        'error': f"Student with email {values[2]} already exists"})
+                elif values[0] in reg_nos:
+                    self.errors.append({'row': line, 'reg_no': values[0], 'email': values[2],
+                                        'error': f"Student with registration number {values[0]} already exists"})
+                else:
+                    writable.append((line, values))
+
+            if writable and not self.dry_run:
+                try:
+                    self._insert_rows(cursor, writable)
+                    conn.commit()
+                    self.inserted += len(writable)
+                except Error as e:
+                    conn.rollback()
+                    if e.errno != errorcode.ER_DUP_ENTRY:
+                        raise
+                    # A concurrent writer took some keys after the lookup;
+                    # fall back to row-by-row so only the clashing rows fail
+                    for line, values in writable:
+                        try:
+                            self._insert_rows(cursor, [(line, values)])
+                            conn.commit()
+                            self.inserted += 1
+                        except Error as row_error:
+                            conn.rollback()
+                            self.errors.append({'row': line, 'reg_no': values[0], 'email': values[2],
+                                                'error': f"Database error: {row_error}"})
+            elif self.dry_run:
+                self.inserted += len(writable)
+        finally:
+            cursor.close()
+            conn.close()
+            if writable and not self.dry_run:
+                invalidate_roster()
+
+    def import_rows(self, rows):
+        """
+        Import an iterable of (line number, row dict) pairs
+
+        Args:
+            rows (iterable): Pairs as produced by iter_file()
+
+        Returns:
+            dict: total, inserted, failed, errors and seconds
+        """
+        started = time.perf_counter()
+        chunk = []
+        for line, row in rows:
+            self.total += 1
+            chunk.append((line, row))
+            if len(chunk) >= self.chunk_size:
+                self._import_chunk(chunk)
+                chunk = []
+        if chunk:
+            self._import_chunk(chunk)
+        self.seconds += time.perf_counter() - started
+
+        logger.info(f"Student import completed: {self.inserted} inserted, {len(self.errors)} failed "
+                    f"of {self.total} rows in {self.seconds:.2f}s{' (dry run)' if self.dry_run else ''}")
+        return self.result()
+
+    def import_file(self, path):
+        """
+        Import a CSV or XLSX file
+
+        Args:
+            path (str): File whose header row names the student columns
+
+        Returns:
+            dict: total, inserted, failed, errors and seconds
+        """
+        return self.import_rows(self.iter_file(path))
+
+    def result(self):
+        """Summary of everything imported so far"""
+        return {
+            'total': self.total,
+            'inserted': self.inserted,
+            'failed': len(self.errors),
+            'errors': sorted(self.errors, key=lambda error: error['row']),
+            'seconds': round(self.seconds, 3)
+        }
+
+    def write_error_report(self, path):
+        """
+        Write the per-row errors as CSV
+
+        Returns:
+            int: Number of rows written
+        """
+        errors = self.result()['errors']
+        with open(path, 'w', newline='', encoding='utf-8') as f:
+            writer = csv.DictWriter(f, fieldnames=['row', 'reg_no', 'email', 'error'])
+            writer.writeheader()
+            writer.writerows(errors)
+        return len(errors)
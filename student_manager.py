@@ -5,10 +5,15 @@ Handles all student-related operations including auto-addition
 
 from datetime import date
 from mysql.connector import Error
-import re
 from db_config import get_db_connection
+from pagination import DEFAULT_PAGE_SIZE, decode_cursor, split_page
+from student_importer import StudentImporter
+from cache import copy_rows, invalidate_roster, roster_cache
 from logger_config import logger
 
+# Per-call roster messages; sample with [logging] sample_rates
+roster_logger = logger.getChild('students')
+
 class StudentManager:
     """Manages student records and operations"""
     
@@ -23,8 +28,7 @@ class StudentManager:
         Returns:
             bool: True if valid, False otherwise
         """
-        pattern = r'^[a-zA-Z0-9._%+-]+@[a-zA-Z0-9.-]+\.[a-zA-Z]{2,}$'
-        return re.match(pattern, email) is not None
+        return StudentImporter.EMAIL_PATTERN.match(email) is not None
     
     @staticmethod
     def add_student(name, email, reg_no=None, phone=None, cgpa=None, join_date=None):
@@ -81,7 +85,8 @@ class StudentManager:
             conn.commit()
             
             student_id = cursor.lastrowid
-            logger.info(f"Successfully added student: {name} (ID: {student_id}, Email: {email})")
+            invalidate_roster()
+            roster_logger.info(f"Successfully added student: {name} (ID: {student_id}, Email: {email})")
             
             cursor.close()
             conn.close()
@@ -100,32 +105,51 @@ class StudentManager:
         """
         Add multiple students at once
         
+        Rows are validated, checked for duplicates and inserted in chunks by
+        StudentImporter rather than one add_student call per row. Legacy
+        (name, email) pairs still go through add_student, as they always
+        have, since StudentImporter requires a reg_no.
+        
         Args:
-            students_list (list): List of tuples [(name, email), (name, email), ...]
+            students_list (list): List of dicts with the students columns
+                (reg_no, name, email, phone, board, marks, cgpa, join_date),
+                tuples (name, email, reg_no, phone) or (name, email) pairs
             
         Returns:
             tuple: (success_count: int, failed_count: int, messages: list)
         """
-        success_count = 0
-        failed_count = 0
+        rows = []
         messages = []
-        
-        for student in students_list:
-            if len(student) != 2:
-                failed_count += 1
+        legacy_added = 0
+        for position, student in enumerate(students_list, start=1):
+            if isinstance(student, (tuple, list)) and len(student) == 2:
+                name, email = student
+                success, message, student_id = StudentManager.add_student(name, email)
+                if success:
+                    legacy_added += 1
+                messages.append(message)
+                continue
+            if isinstance(student, (tuple, list)) and len(student) == 4:
+                student = dict(zip(['name', 'email', 'reg_no', 'phone'], student))
+            if not isinstance(student, dict):
                 messages.append(f"Invalid student data format: {student}")
                 continue
-            
-            name, email = student
-            success, message, student_id = StudentManager.add_student(name, email)
-            
-            if success:
-                success_count += 1
-            else:
-                failed_count += 1
-            
-            messages.append(message)
+            rows.append((position, student))
         
+        result = {'inserted': 0, 'errors': []}
+        if rows:
+            importer = StudentImporter()
+            result = importer.import_rows(rows)
+        
+        failed_positions = {error['row'] for error in result['errors']}
+        for error in result['errors']:
+            messages.append(f"Row {error['row']}: {error['error']}")
+        for position, student in rows:
+            if position not in failed_positions:
+                messages.append(f"Student '{student.get('name')}' added successfully")
+        
+        success_count = result['inserted'] + legacy_added
+        failed_count = len(students_list) - success_count
         logger.info(f"Bulk student import completed: {success_count} successful, {failed_count} failed")
         return (success_count, failed_count, messages)
     
@@ -134,9 +158,17 @@ class StudentManager:
         """
         Get all students from database
         
+        Served from the roster cache; the database is only queried after
+        the roster changes or the cached copy expires.
+        
         Returns:
             list: List of student records as dictionaries
         """
+        students = roster_cache.get_or_load('all', StudentManager._query_all_students)
+        return copy_rows(students) if students is not None else []
+    
+    @staticmethod
+    def _query_all_students():
         try:
             conn = get_db_connection()
             cursor = conn.cursor(dictionary=True)
@@ -147,15 +179,68 @@ class StudentManager:
             cursor.close()
             conn.close()
             
-            logger.info(f"Retrieved {len(students)} students from database")
+            roster_logger.info(f"Retrieved {len(students)} students from database")
             return students
             
         except Error as e:
             logger.error(f"Database error while retrieving students: {e}")
-            return []
+            return None
         except Exception as e:
             logger.error(f"Unexpected error while retrieving students: {e}")
-            return []
+            return None
+    
+    @staticmethod
+    def get_students_page(limit=DEFAULT_PAGE_SIZE, after=None):
+        """
+        Get one page of students ordered by name, using keyset pagination
+        
+        Seeks on idx_name with (name, id) as the key, so each page costs
+        the same no matter how deep into the list it is. Pages are served
+        from the roster cache until the roster changes.
+        
+        Args:
+            limit (int): Page size
+            after (str, optional): Cursor returned with the previous page
+            
+        Returns:
+            tuple: (students: list, next_cursor: str or None)
+            
+        Raises:
+            InvalidCursorError: If after is not a valid cursor
+        """
+        query = "SELECT id, name, email, reg_no, phone, cgpa, join_date, created_at FROM students"
+        params = []
+        
+        if after:
+            name, student_id = decode_cursor(after, 2)
+            query += " WHERE name > %s OR (name = %s AND id > %s)"
+            params.extend([name, name, student_id])
+        
+        query += " ORDER BY name, id LIMIT %s"
+        params.append(limit + 1)
+        
+        def load():
+            try:
+                conn = get_db_connection()
+                cursor = conn.cursor(dictionary=True)
+                
+                cursor.execute(query, tuple(params))
+                students = cursor.fetchall()
+                
+                cursor.close()
+                conn.close()
+                
+                return split_page(students, limit, lambda student: [student['name'], student['id']])
+                
+            except Error as e:
+                logger.error(f"Database error while retrieving students page: {e}")
+                return None
+        
+        page = roster_cache.get_or_load(('page', limit, after), load)
+        if page is None:
+            return ([], None)
+        students, next_cursor = page
+        return (copy_rows(students), next_cursor)
     
     @staticmethod
     def get_student_by_id(student_id):
@@ -0,0 +1,248 @@
+"""
+Table Versions Module
+Conditional GET support (ETag / Last-Modified / 304) for the read APIs
+
+Every write to students, faculty or attendance bumps a counter in the
+table_versions table (see table_versions_setup.sql). A read endpoint
+decorated with @conditional(...) first reads the counters it depends on
+and answers 304 Not Modified without running its own queries when the
+client already holds that version. Counters are cached per process for
+[cache] versions_ttl seconds and dropped by this process's own writes, so
+a revalidation usually needs no database access. Reading them means
+primary-key lookups for 'students', 'faculty' and single dates, but
+'attendance' as a whole is a sum over every per-date counter.
+"""
+
+import hashlib
+import threading
+from datetime import date, datetime, timezone
+from functools import wraps
+from flask import make_response, request
+from mysql.connector import Error, errorcode
+from db_config import get_db_connection
+from cache import invalidate_faculty, invalidate_roster, versions_cache
+from serialization import ETAG_SUFFIXES
+from logger_config import logger
+
+ATTENDANCE = 'attendance'
+
+# In-process caches to drop when another process is seen changing a table
+_INVALIDATORS = {
+    'students': invalidate_roster,
+    'faculty': invalidate_faculty,
+}
+
+_last_seen = {}
+_last_seen_lock = threading.Lock()
+_unavailable_logged = False
+
+
+def attendance_key(value):
+    """
+    Version name for one date of attendance
+
+    Args:
+        value (date or str): Date, or a YYYY-MM-DD string
+
+    Returns:
+        str or None: 'attendance:YYYY-MM-DD', or None if value is not a date
+    """
+    if isinstance(value, datetime):
+        value = value.date()
+    if not isinstance(value, date):
+        try:
+            value = datetime.strptime(str(value), '%Y-%m-%d').date()
+        except ValueError:
+            return None
+    return f"{ATTENDANCE}:{value.isoformat()}"
+
+
+def get_versions(names):
+    """
+    Read version counters, from the versions cache when fresh
+
+    'attendance' (without a date) stands for all attendance and is derived
+    from the per-date counters.
+
+    Args:
+        names (iterable): Version names
+
+    Returns:
+        dict or None: name -> (version, updated_at), or None if the
+            table_versions table is not available
+    """
+    names = tuple(sorted(set(names)))
+    if not names:
+        return {}
+    return versions_cache.get_or_load(names, lambda: _read_versions(names))
+
+
+def _read_versions(names):
+    global _unavailable_logged
+
+    exact = [name for name in names if name != ATTENDANCE]
+    parts = []
+    params = []
+    if exact:
+        parts.append(f"SELECT name, version, updated_at FROM table_versions "
+                     f"WHERE name IN ({', '.join(['%s'] * len(exact))})")
+        params.extend(exact)
+    if ATTENDANCE in names:
+        # Counters never decrease, so the sum changes on every attendance write
+        parts.append("SELECT %s, CAST(SUM(version) AS UNSIGNED), MAX(updated_at) "
+                     "FROM table_versions WHERE name LIKE %s")
+        params.extend([ATTENDANCE, f"{ATTENDANCE}:%"])
+
+    try:
+        conn = get_db_connection()
+        cursor = conn.cursor()
+        try:
+            cursor.execute(' UNION ALL '.join(parts), tuple(params))
+            rows = cursor.fetchall()
+        finally:
+            cursor.close()
+            conn.close()
+    except Error as e:
+        if not _unavailable_logged:
+            logger.warning(f"Table versions unavailable, conditional GET disabled: {e}")
+            _unavailable_logged = True
+        return None
+
+    versions = {name: (0, None) for name in names}
+    for name, version, updated_at in rows:
+        versions[name] = (int(version or 0), updated_at)
+    _note_changes(versions)
+    return versions
+
+
+def bump_attendance_versions(cursor, start_date=None, end_date=None):
+    """
+    Bump the version of every date with attendance
+
+    For bulk changes that affect attendance-derived responses without
+    going through the triggers, such as aggregate rebuilds and archival.
+    Does nothing if table_versions_setup.sql has not been run.
+
+    Args:
+        cursor: Cursor inside the caller's transaction
+        start_date (date, optional): Only bump dates from this day
+        end_date (date, optional): Only bump dates up to this day
+    """
+    if start_date is not None or end_date is not None:
+        # Every date that ever had attendance has a row; names sort by date
+        query = ("UPDATE table_versions SET version = version + 1 "
+                 "WHERE name BETWEEN %s AND %s")
+        params = (attendance_key(start_date) if start_date else f"{ATTENDANCE}:",
+                  attendance_key(end_date) if end_date else f"{ATTENDANCE}:~")
+    else:
+        query = """
+            INSERT INTO table_versions (name, version)
+            SELECT DISTINCT CONCAT('attendance:', date), 1 FROM attendance
+            ON DUPLICATE KEY UPDATE version = version + 1
+        """
+        params = ()
+    try:
+        cursor.execute(query, params)
+    except Error as e:
+        if e.errno != errorcode.ER_NO_SUCH_TABLE:
+            raise
+
+
+def _note_changes(versions):
+    """
+    Drop this process's caches for tables that changed since they were last
+    checked, including writes made by other processes
+    """
+    changed = []
+    with _last_seen_lock:
+        for name, (version, _) in versions.items():
+            previous = _last_seen.get(name)
+            _last_seen[name] = version
+            if previous != version and name in _INVALIDATORS:
+                changed.append(name)
+    for name in changed:
+        _INVALIDATORS[name]()
+
+
+def make_validators(versions):
+    """
+    Build the ETag and Last-Modified for a request from version counters
+
+    The ETag also covers the request path and query string, so different
+    pages of the same table never share a tag.
+
+    Returns:
+        tuple: (etag: str, last_modified: datetime or None)
+    """
+    digest = hashlib.sha1(request.full_path.encode('utf-8'))
+    for name in sorted(versions):
+        digest.update(f"|{name}={versions[name][0]}".encode('utf-8'))
+    modified = [updated_at for _, updated_at in versions.values() if updated_at]
+    # TIMESTAMP values come back in the server's local time
+    last_modified = max(modified).astimezone(timezone.utc).replace(microsecond=0) if modified else None
+    return digest.hexdigest()[:32], last_modified
+
+
+def _matching_etag(etag):
+    """
+    Return the client's current tag if its copy is up to date, else None
+
+    If-Modified-Since alone never validates: Last-Modified only has
+    one-second resolution, so a write in the same second as the client's
+    copy would otherwise be answered with 304.
+    """
+    if request.if_none_match:
+        # Compressed representations carry a suffixed tag (see serialization.py)
+        for suffix in ('', *ETAG_SUFFIXES.values()):
+            if request.if_none_match.contains(etag + suffix):
+                return etag + suffix
+    return None
+
+
+def conditional(*tables, date_from=None):
+    """
+    Decorate a read view with ETag / Last-Modified validation
+
+    Args:
+        *tables (str): Version names the response depends on
+            ('students', 'faculty', 'attendance')
+        date_from (callable, optional): Given the view's keyword arguments,
+            returns the date the response covers; attendance is then
+            versioned for that date only. Responses for values that are not
+            a date are served without validators.
+
+    Returns:
+        callable: Decorator
+    """
+    def decorator(view):
+        @wraps(view)
+        def wrapper(*args, **kwargs):
+            names = list(tables)
+            if date_from is not None:
+                key = attendance_key(date_from(kwargs))
+                if key is None:
+                    return view(*args, **kwargs)
+                names.append(key)
+
+            versions = get_versions(names)
+            if versions is None:
+                return view(*args, **kwargs)
+
+            etag, last_modified = make_validators(versions)
+            current = _matching_etag(etag)
+            if current:
+                response = make_response('', 304)
+                etag = current
+            else:
+                response = make_response(view(*args, **kwargs))
+                if response.status_code != 200:
+                    return response
+
+            response.set_etag(etag)
+            if last_modified:
+                response.last_modified = last_modified
+            # Let the browser keep the body but revalidate it on every use
+            response.headers['Cache-Control'] = 'no-cache'
+            return response
+        return wrapper
+    return decorator
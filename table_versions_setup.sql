@@ -0,0 +1,89 @@
+-- Table Versions Setup
+-- Version counters behind the ETag / Last-Modified headers of the read APIs.
+-- Run after attendance_system_setup.sql:
+--   python run_setup.py table_versions_setup.sql
+USE attendance_system;
+
+-- One row per versioned resource: 'students', 'faculty', and
+-- 'attendance:YYYY-MM-DD' for each date that has attendance. Counters only
+-- ever go up and rows are never deleted, so a version seen once is never
+-- reused for different data.
+CREATE TABLE IF NOT EXISTS table_versions (
+    name VARCHAR(64) PRIMARY KEY,
+    version BIGINT UNSIGNED NOT NULL DEFAULT 1,
+    updated_at TIMESTAMP(6) DEFAULT CURRENT_TIMESTAMP(6) ON UPDATE CURRENT_TIMESTAMP(6)
+) ENGINE=InnoDB;
+
+-- Triggers bump the counters in the same transaction as the write, so a
+-- reader never sees new data under an old version. They are single
+-- statements so this file also runs through run_setup.py.
+DROP TRIGGER IF EXISTS trg_versions_attendance_insert;
+-- Bulk loads that SET @skip_attendance_aggregates = 1 bump versions once
+-- afterwards (see AttendanceStats.rebuild) instead of once per row.
+CREATE TRIGGER trg_versions_attendance_insert AFTER INSERT ON attendance
+FOR EACH ROW
+    INSERT INTO table_versions (name, version)
+    SELECT CONCAT('attendance:', NEW.date), 1
+    FROM DUAL
+    WHERE @skip_attendance_aggregates IS NULL
+    ON DUPLICATE KEY UPDATE version = version + 1;
+
+-- Upserts that rewrite a mark with the same values leave the version alone
+DROP TRIGGER IF EXISTS trg_versions_attendance_update;
+CREATE TRIGGER trg_versions_attendance_update AFTER UPDATE ON attendance
+FOR EACH ROW
+    INSERT INTO table_versions (name, version)
+    SELECT CONCAT('attendance:', changed.date), 1
+    FROM (SELECT OLD.date AS date UNION SELECT NEW.date) AS changed
+    WHERE NOT (OLD.status <=> NEW.status AND OLD.subject <=> NEW.subject
+               AND OLD.faculty_id <=> NEW.faculty_id AND OLD.student_id <=> NEW.student_id
+               AND OLD.date <=> NEW.date AND OLD.period <=> NEW.period)
+    ON DUPLICATE KEY UPDATE version = version + 1;
+
+DROP TRIGGER IF EXISTS trg_versions_attendance_delete;
+CREATE TRIGGER trg_versions_attendance_delete AFTER DELETE ON attendance
+FOR EACH ROW
+    INSERT INTO table_versions (name, version) VALUES (CONCAT('attendance:', OLD.date), 1)
+    ON DUPLICATE KEY UPDATE version = version + 1;
+
+DROP TRIGGER IF EXISTS trg_versions_students_insert;
+CREATE TRIGGER trg_versions_students_insert AFTER INSERT ON students
+FOR EACH ROW
+    INSERT INTO table_versions (name, version) VALUES ('students', 1)
+    ON DUPLICATE KEY UPDATE version = version + 1;
+
+DROP TRIGGER IF EXISTS trg_versions_students_update;
+CREATE TRIGGER trg_versions_students_update AFTER UPDATE ON students
+FOR EACH ROW
+    INSERT INTO table_versions (name, version) VALUES ('students', 1)
+    ON DUPLICATE KEY UPDATE version = version + 1;
+
+DROP TRIGGER IF EXISTS trg_versions_students_delete;
+CREATE TRIGGER trg_versions_students_delete AFTER DELETE ON students
+FOR EACH ROW
+    INSERT INTO table_versions (name, version) VALUES ('students', 1)
+    ON DUPLICATE KEY UPDATE version = version + 1;
+
+DROP TRIGGER IF EXISTS trg_versions_faculty_insert;
+CREATE TRIGGER trg_versions_faculty_insert AFTER INSERT ON faculty
+FOR EACH ROW
+    INSERT INTO table_versions (name, version) VALUES ('faculty', 1)
+    ON DUPLICATE KEY UPDATE version = version + 1;
+
+DROP TRIGGER IF EXISTS trg_versions_faculty_update;
+CREATE TRIGGER trg_versions_faculty_update AFTER UPDATE ON faculty
+FOR EACH ROW
+    INSERT INTO table_versions (name, version) VALUES ('faculty', 1)
+    ON DUPLICATE KEY UPDATE version = version + 1;
+
+DROP TRIGGER IF EXISTS trg_versions_faculty_delete;
+CREATE TRIGGER trg_versions_faculty_delete AFTER DELETE ON faculty
+FOR EACH ROW
+    INSERT INTO table_versions (name, version) VALUES ('faculty', 1)
+    ON DUPLICATE KEY UPDATE version = version + 1;
+
+-- Start every existing date and table at version 1
+INSERT IGNORE INTO table_versions (name, version)
+SELECT DISTINCT CONCAT('attendance:', date), 1 FROM attendance;
+
+INSERT IGNORE INTO table_versions (name, version) VALUES ('students', 1), ('faculty', 1);
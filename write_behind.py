@@ -0,0 +1,410 @@
+"""
+Write-Behind Module
+Journals attendance marks locally and flushes them to MySQL in batches
+"""
+
+import atexit
+import glob
+import json
+import os
+import threading
+import time
+from datetime import date
+from mysql.connector import Error, InterfaceError, OperationalError, errorcode
+from attendance_manager import AttendanceManager
+from connection_pool import PoolExhaustedError
+from db_config import DatabaseConfig
+from logger_config import logger
+
+# Errors worth retrying the same batch for; anything else is blamed on the data
+TRANSIENT_ERRNOS = {
+    errorcode.ER_LOCK_DEADLOCK, errorcode.ER_LOCK_WAIT_TIMEOUT,
+    errorcode.CR_CONNECTION_ERROR, errorcode.CR_CONN_HOST_ERROR,
+    errorcode.CR_SERVER_GONE_ERROR, errorcode.CR_SERVER_LOST,
+}
+
+
+def is_transient_error(error):
+    """
+    Check whether a failed flush should be retried unchanged
+
+    Args:
+        error (Exception): Error raised while writing a batch
+
+    Returns:
+        bool: True for lost connections, deadlocks, lock timeouts and an
+            exhausted pool; False for errors caused by the records themselves
+    """
+    if isinstance(error, (PoolExhaustedError, InterfaceError, OperationalError)):
+        return True
+    if isinstance(error, Error):
+        return error.errno in TRANSIENT_ERRNOS
+    return isinstance(error, OSError)
+
+
+def _pid_alive(pid):
+    """Check whether a process with the given ID is still running"""
+    if os.name == 'nt':
+        import ctypes
+        PROCESS_QUERY_LIMITED_INFORMATION = 0x1000
+        STILL_ACTIVE = 259
+        kernel32 = ctypes.windll.kernel32
+        handle = kernel32.OpenProcess(PROCESS_QUERY_LIMITED_INFORMATION, False, pid)
+        if not handle:
+            return False
+        try:
+            exit_code = ctypes.c_ulong()
+            kernel32.GetExitCodeProcess(handle, ctypes.byref(exit_code))
+            return exit_code.value == STILL_ACTIVE
+        finally:
+            kernel32.CloseHandle(handle)
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except PermissionError:
+        return True
+    return True
+
+
+class AttendanceJournal:
+    """
+    Append-only journal of accepted attendance marks
+
+    Each line is a JSON object {"seq": n, "record": {...}}. The sequence
+    number of the last record written to MySQL is kept in a separate
+    checkpoint file, so entries after it are replayed on startup.
+    """
+
+    def __init__(self, path, fsync=True):
+        self.path = path
+        self.checkpoint_path = path + '.checkpoint'
+        self.fsync = fsync
+        self.last_seq = 0
+        self.flushed_seq = self._read_checkpoint()
+        self._file = open(self.path, 'a+', encoding='utf-8')
+
+        for seq, _ in self._read_entries():
+            self.last_seq = max(self.last_seq, seq)
+        self.last_seq = max(self.last_seq, self.flushed_seq)
+
+    def _read_checkpoint(self):
+        try:
+            with open(self.checkpoint_path, 'r', encoding='utf-8') as f:
+                return int(f.read().strip() or 0)
+        except (OSError, ValueError):
+            return 0
+
+    def _read_entries(self):
+        try:
+            with open(self.path, 'r', encoding='utf-8') as f:
+                for line in f:
+                    try:
+                        entry = json.loads(line)
+                    except ValueError:
+                        # A torn final line from a crash mid-write was never acknowledged
+                        logger.warning(f"Skipping unreadable journal line in {self.path}")
+                        continue
+                    yield entry['seq'], entry['record']
+        except FileNotFoundError:
+            return
+
+    def append(self, records):
+        """
+        Durably append records to the journal
+
+        Args:
+            records (list): JSON-serializable attendance records
+
+        Returns:
+            list: Sequence numbers assigned to the records
+        """
+        seqs = []
+        lines = []
+        for record in records:
+            self.last_seq += 1
+            seqs.append(self.last_seq)
+            lines.append(json.dumps({'seq': self.last_seq, 'record': record}) + '\n')
+
+        self._file.write(''.join(lines))
+        self._file.flush()
+        if self.fsync:
+            os.fsync(self._file.fileno())
+        return seqs
+
+    def pending(self):
+        """
+        Get journaled records not yet written to MySQL
+
+        Returns:
+            list: (seq, record) tuples in journal order
+        """
+        return [(seq, record) for seq, record in self._read_entries() if seq > self.flushed_seq]
+
+    def mark_flushed(self, seq):
+        """Record that every entry up to seq has been committed to MySQL"""
+        tmp_path = self.checkpoint_path + '.tmp'
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            f.write(str(seq))
+            f.flush()
+            if self.fsync:
+                os.fsync(f.fileno())
+        os.replace(tmp_path, self.checkpoint_path)
+        self.flushed_seq = seq
+
+        # Everything has been written: start a fresh journal so it never grows unbounded
+        if self.flushed_seq >= self.last_seq:
+            self._file.seek(0)
+            self._file.truncate()
+            self._file.flush()
+
+    def close(self):
+        """Close the journal file"""
+        self._file.close()
+
+    def remove(self):
+        """Delete the journal and its checkpoint"""
+        self.close()
+        for path in (self.path, self.checkpoint_path):
+            try:
+                os.remove(path)
+            except FileNotFoundError:
+                pass
+
+
+class WriteBehindQueue:
+    """
+    Write-behind queue for attendance marks
+
+    submit() validates records, appends them to this process's journal and
+    returns; a background thread groups queued records into
+    AttendanceManager.mark_attendance_batch calls every flush_interval_ms
+    milliseconds or as soon as flush_max_records are waiting. Journals left
+    behind by processes that are no longer running are replayed on start().
+
+    Student and faculty IDs are only checked when the batch is flushed, so
+    rows rejected there are logged rather than returned to the caller. A
+    batch that fails on a lost connection or deadlock is retried as is; one
+    that fails for any other reason is written record by record, so a bad
+    record is rejected without holding up the ones queued after it.
+    """
+
+    def __init__(self, journal_base, flush_interval_ms=200, flush_max_records=500, fsync=True):
+        self.journal_base = journal_base
+        self.flush_interval = flush_interval_ms / 1000.0
+        self.flush_max_records = flush_max_records
+        self.fsync = fsync
+        self.pid = os.getpid()
+
+        self._journal = None
+        self._buffer = []  # (seq, record) in journal order
+        self._lock = threading.Lock()
+        self._wakeup = threading.Condition(self._lock)
+        self._flush_lock = threading.Lock()
+        self._stopping = False
+        self._thread = None
+
+        self.stats = {'submitted': 0, 'flushed': 0, 'rejected': 0, 'flushes': 0, 'retries': 0}
+
+    def start(self):
+        """Open the journal, replay unflushed entries and start the flusher thread"""
+        self._journal = AttendanceJournal(f"{self.journal_base}.{self.pid}", fsync=self.fsync)
+        self._buffer.extend(self._journal.pending())
+        self._adopt_orphaned_journals()
+
+        if self._buffer:
+            logger.info(f"Replaying {len(self._buffer)} unflushed attendance marks from journal")
+
+        self._thread = threading.Thread(target=self._run, name='attendance-write-behind', daemon=True)
+        self._thread.start()
+        logger.info(f"Write-behind attendance queue started (journal: {self._journal.path})")
+
+    def _adopt_orphaned_journals(self):
+        """Move pending entries from journals of dead processes into ours"""
+        for path in glob.glob(f"{self.journal_base}.*"):
+            suffix = path[len(self.journal_base) + 1:]
+            if not suffix.isdigit() or int(suffix) == self.pid or _pid_alive(int(suffix)):
+                continue
+
+            orphan = AttendanceJournal(path, fsync=False)
+            records = [record for _, record in orphan.pending()]
+            if records:
+                seqs = self._journal.append(records)
+                self._buffer.extend(zip(seqs, records))
+                logger.info(f"Adopted {len(records)} unflushed attendance marks from {path}")
+            orphan.remove()
+
+    def submit(self, records):
+        """
+        Accept attendance records for asynchronous writing
+
+        Args:
+            records (list): Records as accepted by AttendanceManager.mark_attendance_batch
+
+        Returns:
+            tuple: (accepted_count: int, results: list) with one
+                {'student_id', 'success', 'message'} per record
+        """
+        accepted = []
+        results = []
+        for record in records:
+            row, error = AttendanceManager.validate_batch_record(record)
+            if error:
+                student_id = record.get('student_id') if isinstance(record, dict) else None
+                results.append({'student_id': student_id, 'success': False, 'message': error})
+                continue
+            row['date'] = row['date'].isoformat() if isinstance(row['date'], date) else row['date']
+            accepted.append(row)
+            results.append({'student_id': row['student_id'], 'success': True,
+                            'message': f"Attendance queued for student {row['student_id']} (Period {row['period']})"})
+
+        if accepted:
+            with self._lock:
+                seqs = self._journal.append(accepted)
+                self._buffer.extend(zip(seqs, accepted))
+                self.stats['submitted'] += len(accepted)
+                if len(self._buffer) >= self.flush_max_records:
+                    self._wakeup.notify()
+
+        return (len(accepted), results)
+
+    def _run(self):
+        while True:
+            with self._lock:
+                if not self._stopping and len(self._buffer) < self.flush_max_records:
+                    self._wakeup.wait(self.flush_interval)
+                stopping = self._stopping
+            self.flush()
+            if stopping:
+                return
+
+    def flush(self):
+        """
+        Write queued records to MySQL
+
+        Returns:
+            int: Number of records taken off the queue
+        """
+        with self._flush_lock:
+            with self._lock:
+                batch = self._buffer[:self.flush_max_records * 4]
+            if not batch:
+                return 0
+
+            try:
+                _, _, results = AttendanceManager.mark_attendance_batch(
+                    [record for _, record in batch], chunk_size=self.flush_max_records, raise_errors=True)
+            except Exception as e:
+                if is_transient_error(e):
+                    # Keep the batch queued and journaled; the next tick retries it
+                    self._retry_later(e)
+                    return 0
+                # One bad record fails the whole transaction: write them one
+                # by one so only the offending records are rejected
+                logger.warning(f"Write-behind batch failed ({e}); writing its {len(batch)} records individually")
+                batch, results = self._write_individually(batch)
+                if not batch:
+                    return 0
+
+            for (seq, record), result in zip(batch, results):
+                if not result['success']:
+                    logger.warning(f"Write-behind mark rejected (journal seq {seq}): {result['message']}")
+
+            success_count = sum(1 for result in results if result['success'])
+            with self._lock:
+                del self._buffer[:len(batch)]
+                self._journal.mark_flushed(batch[-1][0])
+                self.stats['flushed'] += success_count
+                self.stats['rejected'] += len(results) - success_count
+                self.stats['flushes'] += 1
+
+            return len(batch)
+
+    def _retry_later(self, error):
+        self.stats['retries'] += 1
+        logger.error(f"Write-behind flush failed, will retry: {error}")
+        time.sleep(min(self.flush_interval * 5, 5))
+
+    def _write_individually(self, batch):
+        """
+        Write batch records one per transaction
+
+        Stops at the first transient error, leaving that record and the
+        rest queued for the next flush.
+
+        Returns:
+            tuple: (processed (seq, record) prefix of batch, one result per processed record)
+        """
+        results = []
+        for seq, record in batch:
+            try:
+                _, _, (result,) = AttendanceManager.mark_attendance_batch([record], raise_errors=True)
+            except Exception as e:
+                if is_transient_error(e):
+                    self._retry_later(e)
+                    break
+                result = {'student_id': record.get('student_id'), 'success': False,
+                          'outcome': None, 'message': f"Database error: {e}"}
+            results.append(result)
+        return batch[:len(results)], results
+
+    def pending_count(self):
+        """Number of accepted records not yet written to MySQL"""
+        with self._lock:
+            return len(self._buffer)
+
+    def stop(self, timeout=10):
+        """Flush remaining records and stop the flusher thread"""
+        if self._thread is None:
+            return
+        with self._lock:
+            self._stopping = True
+            self._wakeup.notify()
+        self._thread.join(timeout)
+        self._thread = None
+        self._journal.close()
+        logger.info("Write-behind attendance queue stopped")
+
+
+_queue = None
+_queue_disabled = False
+_queue_lock = threading.Lock()
+
+
+def get_write_behind_queue():
+    """
+    Get this process's write-behind queue if enabled in config.ini
+
+    Returns:
+        WriteBehindQueue or None: Running queue, or None when [write_behind]
+            enabled is false
+    """
+    global _queue, _queue_disabled
+
+    if _queue is not None and _queue.pid == os.getpid():
+        return _queue
+    if _queue_disabled:
+        # Read config.ini once, not on every request
+        return None
+
+    config = DatabaseConfig.read_config()
+    if not config.getboolean('write_behind', 'enabled', fallback=False):
+        _queue_disabled = True
+        return None
+
+    with _queue_lock:
+        if _queue is None or _queue.pid != os.getpid():
+            journal_base = config.get('write_behind', 'journal', fallback='attendance_journal')
+            if not os.path.isabs(journal_base):
+                journal_base = os.path.join(os.path.dirname(os.path.abspath(__file__)), journal_base)
+            queue = WriteBehindQueue(
+                journal_base,
+                flush_interval_ms=config.getint('write_behind', 'flush_interval_ms', fallback=200),
+                flush_max_records=config.getint('write_behind', 'flush_max_records', fallback=500),
+                fsync=config.getboolean('write_behind', 'fsync', fallback=True)
+            )
+            queue.start()
+            atexit.register(queue.stop)
+            _queue = queue
+
+    return _queue